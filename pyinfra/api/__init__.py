@@ -19,7 +19,7 @@ from .exceptions import (  # noqa: F401
     OperationTypeError,
     OperationValueError,
 )
-from .facts import FactBase, ShortFactBase  # noqa: F401 # pragma: no cover
+from .facts import FactBase, FactStats, ShortFactBase  # noqa: F401 # pragma: no cover
 from .host import Host  # noqa: F401 # pragma: no cover
 from .inventory import Inventory  # noqa: F401 # pragma: no cover
 from .operation import operation  # noqa: F401 # pragma: no cover
@@ -20,7 +20,7 @@ from typing_extensions import TypedDict
 from pyinfra import context
 from pyinfra.api.exceptions import ArgumentTypeError
 from pyinfra.api.state import State
-from pyinfra.api.util import raise_if_bad_type
+from pyinfra.api.util import memoize, raise_if_bad_type
 
 if TYPE_CHECKING:
     from pyinfra.api.config import Config
@@ -171,6 +171,7 @@ class MetaArguments(TypedDict):
     _ignore_errors: bool
     _continue_on_error: bool
     _if: List[Callable[[], bool]]
+    _depends_on: Optional[List[Any]]
 
 
 meta_argument_meta: dict[str, ArgumentMeta] = {
@@ -194,6 +195,13 @@ meta_argument_meta: dict[str, ArgumentMeta] = {
         "Only run this operation if these functions returns True",
         default=lambda _: [],
     ),
+    "_depends_on": ArgumentMeta(
+        (
+            "Operations (results) this operation depends on, when executing operations at once "
+            "with ``CONCURRENT_OPS`` this only waits for these rather than all earlier ones."
+        ),
+        default=lambda _: None,
+    ),
 }
 
 
@@ -210,7 +218,7 @@ class ExecutionArguments(TypedDict):
 
 execution_argument_meta: dict[str, ArgumentMeta] = {
     "_parallel": ArgumentMeta(
-        "Run this operation in batches of hosts.",
+        "Run this operation on at most this many hosts at once.",
         default=lambda config: config.PARALLEL,
     ),
     "_run_once": ArgumentMeta(
@@ -278,6 +286,46 @@ __argument_docs__ = {
 }
 
 
+# Argument value types that check_type fully validates from the type alone, so are only
+# checked once per argument (see pop_global_arguments).
+SCALAR_ARGUMENT_TYPES = (bool, int, float, str, type(None))
+
+
+@memoize
+def get_argument_specs() -> list[tuple[str, Any, ArgumentMeta]]:
+    """
+    Returns the ``(key, type, ArgumentMeta)`` of every global argument, resolving the type
+    hints once rather than on every ``pop_global_arguments`` call.
+    """
+
+    return [
+        (key, type_, all_argument_meta[key])
+        for key, type_ in get_type_hints(AllArguments).items()
+    ]
+
+
+# (argument key, value type) pairs that have already passed type checking
+valid_argument_types: set[tuple[str, type]] = set()
+
+
+def _check_argument_type(key: str, type_: Any, value: Any) -> None:
+    value_type = type(value)
+    is_scalar = value_type in SCALAR_ARGUMENT_TYPES
+
+    if is_scalar and (key, value_type) in valid_argument_types:
+        return
+
+    raise_if_bad_type(
+        value,
+        type_,
+        ArgumentTypeError,
+        f"Invalid argument `{key}`:",
+    )
+
+    if is_scalar:
+        valid_argument_types.add((key, value_type))
+
+
 def pop_global_arguments(
     kwargs: dict[str, Any],
     state: Optional["State"] = None,
@@ -302,20 +350,23 @@ def pop_global_arguments(
 
     meta_kwargs: dict[str, Any] = host.current_deploy_kwargs or {}  # type: ignore[assignment]
 
+    argument_specs = get_argument_specs()
+    if keys_to_check:
+        argument_specs = [spec for spec in argument_specs if spec[0] in keys_to_check]
+
+    # Read all the arguments from the layered host data in one go
+    host_arguments = host.data.get_keys([key for key, _, _ in argument_specs])
+
     arguments: dict[str, Any] = {}
     found_keys: list[str] = []
 
-    for key, type_ in get_type_hints(AllArguments).items():
-        if keys_to_check and key not in keys_to_check:
-            continue
-
-        argument_meta = all_argument_meta[key]
+    for key, type_, argument_meta in argument_specs:
         handler = argument_meta.handler
-        default: Any = argument_meta.default(config)
 
-        host_default = getattr(host.data, key, default_sentinel)
-        if host_default is not default_sentinel:
-            default = host_default
+        if key in host_arguments:
+            default: Any = host_arguments[key]
+        else:
+            default = argument_meta.default(config)
 
         if key in kwargs:
             found_keys.append(key)
@@ -327,12 +378,7 @@ def pop_global_arguments(
             value = handler(config, value)
 
         if value != default:
-            raise_if_bad_type(
-                value,
-                type_,
-                ArgumentTypeError,
-                f"Invalid argument `{key}`:",
-            )
+            _check_argument_type(key, type_, value)
 
         # TODO: why is type failing here?
         arguments[key] = value  # type: ignore
@@ -62,6 +62,7 @@ class PyinfraOperation(Generic[P], Protocol):
         _ignore_errors: bool = False,
         _continue_on_error: bool = False,
         _if: Optional[List[Callable[[], bool]]] = None,
+        _depends_on: Optional[List["OperationMeta"]] = None,
         #
         # ExecutionArguments
         #
@@ -0,0 +1,157 @@
+"""
+Execute consecutive shell commands of an operation as a single remote script, see
+``Config.PIPELINE_COMMANDS``.
+
+Each command runs in its own subshell followed by a marker on stdout (with the command exit
+code) and stderr, which are used to split the output & exit codes back out per command.
+The script stops after the first failed command unless ``_continue_on_error`` is set, exactly
+as when executing the commands one by one.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+from uuid import uuid4
+
+from pyinfra.connectors.util import CommandOutput, OutputLine
+
+from .command import PyinfraCommand, StringCommand
+
+if TYPE_CHECKING:
+    from .arguments import ConnectorArguments
+
+
+def _get_pipeline_arguments(
+    command: PyinfraCommand,
+    connector_arguments: "ConnectorArguments",
+) -> Optional["ConnectorArguments"]:
+    if not isinstance(command, StringCommand):
+        return None
+
+    command_arguments = connector_arguments.copy()
+    command_arguments.update(command.connector_arguments)
+
+    # Input is written to the whole script, so cannot be attributed to a single command
+    if command_arguments.get("_stdin"):
+        return None
+
+    return command_arguments
+
+
+def iter_command_batches(
+    commands: Iterable[PyinfraCommand],
+    connector_arguments: "ConnectorArguments",
+) -> Iterator[list[PyinfraCommand]]:
+    """
+    Groups consecutive shell commands with the same connector arguments into batches that can
+    be executed as a single script, other commands (file uploads, Python functions) are
+    yielded alone.
+
+    Note this reads the next command from the operation before the batch is executed.
+    """
+
+    batch: list[PyinfraCommand] = []
+    batch_arguments: Optional["ConnectorArguments"] = None
+
+    for command in commands:
+        command_arguments = _get_pipeline_arguments(command, connector_arguments)
+
+        if batch and (command_arguments is None or command_arguments != batch_arguments):
+            yield batch
+            batch = []
+
+        if command_arguments is None:
+            yield [command]
+            continue
+
+        batch.append(command)
+        batch_arguments = command_arguments
+
+    if batch:
+        yield batch
+
+
+class CommandPipeline:
+    """
+    Combines shell commands into a single script and splits the script output back into the
+    result of each command.
+    """
+
+    def __init__(
+        self,
+        commands: list[StringCommand],
+        success_exit_codes: Optional[Iterable[int]] = None,
+        continue_on_error: bool = False,
+    ):
+        self.commands = commands
+        self.success_exit_codes = list(success_exit_codes or [0])
+        self.continue_on_error = continue_on_error
+        self.marker = f"__pyinfra_command_{uuid4().hex}"
+
+        script_bits: list = []
+
+        for command in commands:
+            script_bits.extend(
+                [
+                    StringCommand("(", command, ")", _separator="\n"),
+                    "__pyinfra_status=$?",
+                    f'echo "{self.marker} $__pyinfra_status"',
+                    f'echo "{self.marker}" >&2',
+                ],
+            )
+
+            if not continue_on_error:
+                exit_codes = "|".join(str(code) for code in self.success_exit_codes)
+                script_bits.append(
+                    f"case $__pyinfra_status in {exit_codes}) ;; *) exit $__pyinfra_status;; esac",
+                )
+
+        # Run in a subshell so any _chdir/_env prefix applies to the whole script
+        self.command = StringCommand("(", *script_bits, ")", _separator="\n")
+
+    def get_results(self, output: Iterable[OutputLine]) -> list[tuple[bool, CommandOutput]]:
+        """
+        Returns the status & output of each command that was executed.
+        """
+
+        command_lines: list[list[OutputLine]] = [[] for _ in self.commands]
+        exit_codes: list[Optional[int]] = [None for _ in self.commands]
+        buffer_indexes = {"stdout": 0, "stderr": 0}
+        last_index = len(self.commands) - 1
+
+        for line in output:
+            # PTY output lines end with \r
+            value = line.line.rstrip("\r")
+            # Output without a trailing newline ends up on the same line as the marker
+            value, marker, marker_value = value.partition(self.marker)
+
+            if value or not marker:
+                if marker:
+                    line = OutputLine(line.buffer_name, value)
+                index = min(buffer_indexes.get(line.buffer_name, 0), last_index)
+                command_lines[index].append(line)
+
+            if not marker:
+                continue
+
+            if marker_value.startswith(" "):
+                index = buffer_indexes["stdout"]
+                if index <= last_index:
+                    exit_codes[index] = int(marker_value)
+                buffer_indexes["stdout"] += 1
+            else:
+                buffer_indexes["stderr"] += 1
+
+        results = []
+
+        for exit_code, lines in zip(exit_codes, command_lines):
+            status = exit_code in self.success_exit_codes
+            command_output = CommandOutput(lines)
+            command_output.exit_code = exit_code
+            results.append((status, command_output))
+
+            # Either the script stopped here (error, timeout) or it stops after this failure
+            if exit_code is None or (not status and not self.continue_on_error):
+                break
+
+        return results
@@ -0,0 +1,187 @@
+"""
+Adaptive concurrency for the state greenlet pool, see ``Config.ADAPTIVE_PARALLEL``.
+
+Each stage (connecting, loading facts & preparing operations, executing operations) has its own
+AIMD (additive increase, multiplicative decrease) controller. Every window of completed
+connections/commands the controller compares their latency to the lowest latency seen for the
+same operation, along with the CPU usage of this process and any connection errors:
+
++ Connection errors halve the concurrency
++ Latency over ``LATENCY_TOLERANCE`` times the lowest, or this process using all of a CPU
+  core, reduce the concurrency by a quarter
++ Otherwise, if the pool was full during the window, the concurrency is increased a step
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from statistics import median
+from time import perf_counter, process_time
+from typing import Optional
+
+from gevent.event import Event
+from gevent.pool import Pool, PoolFull
+
+CONNECT_STAGE = "connect"
+FACTS_STAGE = "facts"
+EXECUTE_STAGE = "execute"
+STAGES = (CONNECT_STAGE, FACTS_STAGE, EXECUTE_STAGE)
+
+MIN_WINDOW_SAMPLES = 10
+LATENCY_TOLERANCE = 2.0
+CPU_SATURATION = 0.9
+# CPU usage is ignored over windows shorter than this (seconds) as it is too noisy
+MIN_CPU_WINDOW_TIME = 0.5
+ERROR_DECREASE_FACTOR = 0.5
+DECREASE_FACTOR = 0.75
+
+
+class ConcurrencyController:
+    """
+    Controls the concurrency of a single stage.
+    """
+
+    def __init__(self, stage: str, initial: int, maximum: int, minimum: int = 1):
+        self.stage = stage
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.limit = min(max(initial, minimum), self.maximum)
+        self.peak_limit = self.limit
+        # Increase in steps of a quarter of the initial concurrency
+        self.step = max(1, self.limit // 4)
+
+        self.samples = 0
+        self.errors = 0
+
+        # Lowest latency seen for each sample key (ie operation hash)
+        self.min_latencies: dict[Optional[str], float] = {}
+        self._reset_window()
+
+    def _reset_window(self) -> None:
+        self.window_latency_ratios: list[float] = []
+        self.window_errors = 0
+        # Whether the pool was full (so more concurrency would help) during this window
+        self.window_limited = False
+        self.window_start = perf_counter()
+        self.window_cpu_start = process_time()
+
+    def add_sample(self, latency: float, key: Optional[str] = None, error: bool = False) -> None:
+        """
+        Record a completed connection/command taking ``latency`` seconds.
+        """
+
+        self.samples += 1
+
+        if error:
+            self.errors += 1
+            self.window_errors += 1
+        else:
+            min_latency = self.min_latencies.get(key)
+            if min_latency is None or latency < min_latency:
+                self.min_latencies[key] = min_latency = latency
+            self.window_latency_ratios.append(latency / min_latency if min_latency else 1.0)
+
+        window_samples = len(self.window_latency_ratios) + self.window_errors
+        if window_samples >= max(MIN_WINDOW_SAMPLES, self.limit // 2):
+            wall_time = perf_counter() - self.window_start
+            cpu_usage = 0.0
+            if wall_time >= MIN_CPU_WINDOW_TIME:
+                cpu_usage = (process_time() - self.window_cpu_start) / wall_time
+            latency_ratio = (
+                median(self.window_latency_ratios) if self.window_latency_ratios else 1.0
+            )
+            self.update(latency_ratio, self.window_errors, cpu_usage, self.window_limited)
+            self._reset_window()
+
+    def update(self, latency_ratio: float, errors: int, cpu_usage: float, limited: bool) -> None:
+        """
+        Adjust the concurrency limit from the results of a window.
+        """
+
+        if errors:
+            limit = int(self.limit * ERROR_DECREASE_FACTOR)
+        elif latency_ratio > LATENCY_TOLERANCE or cpu_usage >= CPU_SATURATION:
+            limit = int(self.limit * DECREASE_FACTOR)
+        elif limited:
+            limit = self.limit + self.step
+        else:
+            return
+
+        self.limit = min(max(limit, self.minimum), self.maximum)
+        self.peak_limit = max(self.peak_limit, self.limit)
+
+
+class AdaptivePool(Pool):
+    """
+    A greenlet pool limited to the concurrency of the current stage's controller (if any), on
+    top of the pool size.
+    """
+
+    def __init__(self, size: int, controllers: Optional[dict[str, ConcurrencyController]] = None):
+        super().__init__(size)
+        self.controllers = controllers or {}
+        self.current_stage: Optional[str] = None
+        self._discarded = Event()
+
+    @contextmanager
+    def use_stage(self, stage: str):
+        previous_stage = self.current_stage
+        self.current_stage = stage
+        try:
+            yield
+        finally:
+            self.current_stage = previous_stage
+
+    def get_controller(self) -> Optional[ConcurrencyController]:
+        if self.current_stage is None:
+            return None
+        return self.controllers.get(self.current_stage)
+
+    def add_sample(self, latency: float, key: Optional[str] = None, error: bool = False) -> None:
+        controller = self.get_controller()
+        if controller:
+            controller.add_sample(latency, key=key, error=error)
+
+    def get_limits(self) -> dict[str, int]:
+        """
+        Returns the concurrency limit of each stage that has run.
+        """
+
+        return {
+            stage: controller.limit
+            for stage, controller in self.controllers.items()
+            if controller.samples
+        }
+
+    def free_count(self):
+        free_count = super().free_count()
+        controller = self.get_controller()
+        if controller:
+            free_count = min(free_count, max(0, controller.limit - len(self)))
+        return free_count
+
+    def full(self):
+        full = super().full()
+        # Callers check this before adding, so the pool was limiting them
+        controller = self.get_controller()
+        if full and controller:
+            controller.window_limited = True
+        return full
+
+    def add(self, greenlet, blocking=True, timeout=None):
+        controller = self.get_controller()
+
+        if controller:
+            while len(self) >= controller.limit:
+                controller.window_limited = True
+                if not blocking:
+                    raise PoolFull()
+                self._discarded.clear()
+                if not self._discarded.wait(timeout=timeout):
+                    raise PoolFull()
+
+        super().add(greenlet, blocking=blocking, timeout=timeout)
+
+    def _discard(self, greenlet):
+        super()._discard(greenlet)
+        self._discarded.set()
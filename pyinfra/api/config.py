@@ -12,6 +12,10 @@ from .exceptions import PyinfraError
 class ConfigDefaults:
     # % of hosts which have to fail for all operations to stop
     FAIL_PERCENT: Optional[int] = None
+    # Stop starting operations as soon as over FAIL_PERCENT (or any, if not set) of hosts fail,
+    # rather than once all hosts complete the operation, and optionally cancel running ones.
+    FAIL_FAST: bool = False
+    FAIL_FAST_CANCEL: bool = False
     # Seconds to timeout SSH connections
     CONNECT_TIMEOUT: int = 10
     # Temporary directory (on the remote side) to use for caching any files/downloads, the default
@@ -19,8 +23,32 @@ class ConfigDefaults:
     # variable, falling back to DEFAULT_TEMP_DIR if not set.
     TEMP_DIR: Optional[str] = None
     DEFAULT_TEMP_DIR: str = "/tmp"
+    # SQLite database file used to persist facts with a ``cache_ttl`` between runs (disabled
+    # when None).
+    FACT_CACHE: Optional[str] = None
+    # SQLite database files to record every fact loaded before executing operations to, and to
+    # replay recorded facts from instead of connecting to hosts (both disabled when None).
+    FACT_RECORD: Optional[str] = None
+    FACT_REPLAY: Optional[str] = None
+    # SQLite database file used to store fingerprints of operations that made no changes, these
+    # are skipped on later runs while their arguments and the facts they read are unchanged.
+    PLAN_CACHE: Optional[str] = None
+    # Check operations for changes once per group of hosts with the same operation arguments,
+    # host data & facts read by the operation, rather than calling it for every host.
+    GROUP_EQUIVALENT_HOSTS: bool = False
+    # Execute up to this many operations at once on each host, operations called with
+    # _depends_on only wait for the operations they depend on (implies not waiting for all
+    # hosts between operations).
+    CONCURRENT_OPS: int = 0
+    # Execute consecutive shell commands of each operation as a single script
+    PIPELINE_COMMANDS: bool = False
+    # Upload a helper script to answer batched facts that support it (see api/fact_agent.py)
+    FACT_AGENT: bool = False
     # Gevent pool size (defaults to #of target hosts)
     PARALLEL: int = 0
+    # Adjust the number of hosts connected to/executed on at once, up to PARALLEL, as the run
+    # progresses based on command latency, CPU usage & connection errors.
+    ADAPTIVE_PARALLEL: bool = False
     # Specify the required pyinfra version (using PEP 440 setuptools specifier)
     REQUIRE_PYINFRA_VERSION: Optional[str] = None
     # Specify any required packages (either using PEP 440 or a requirements file)
@@ -4,6 +4,8 @@ import gevent
 
 from pyinfra.progress import progress_spinner
 
+from .concurrency import CONNECT_STAGE
+
 if TYPE_CHECKING:
     from pyinfra.api.state import State
 
@@ -22,12 +24,13 @@ def connect_all(state: "State"):
         if state.is_host_in_limit(host)  # these are the hosts to activate ("initially connect to")
     ]
 
-    greenlet_to_host = {state.pool.spawn(host.connect): host for host in hosts}
+    with state.pool.use_stage(CONNECT_STAGE):
+        greenlet_to_host = {state.pool.spawn(host.connect): host for host in hosts}
 
-    with progress_spinner(greenlet_to_host.values()) as progress:
-        for greenlet in gevent.iwait(greenlet_to_host.keys()):
-            host = greenlet_to_host[greenlet]
-            progress(host)
+        with progress_spinner(greenlet_to_host.values()) as progress:
+            for greenlet in gevent.iwait(greenlet_to_host.keys()):
+                host = greenlet_to_host[greenlet]
+                progress(host)
 
     # Get/set the results
     failed_hosts = set()
@@ -46,5 +49,12 @@ def connect_all(state: "State"):
 
 
 def disconnect_all(state: "State"):
+    # Shard processes disconnect from their own hosts
+    for shard in state.shards:
+        shard.close()
+    state.shards = []
+
     for host in state.activated_hosts:  # only hosts we connected to please!
-        host.disconnect()  # normally a noop
+        # Hosts are activated without connecting when replaying facts, see Config.FACT_REPLAY
+        if host.connected:
+            host.disconnect()  # normally a noop
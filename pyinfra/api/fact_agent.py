@@ -0,0 +1,206 @@
+"""
+The fact agent is a small Python script uploaded to hosts (when ``Config.FACT_AGENT`` is enabled)
+that answers many fact queries in a single process. Facts that set an ``agent_handler`` are sent
+to the agent when loaded in batches (see ``pyinfra.api.facts.get_host_facts``) instead of running
+their own shell commands, saving a fork/exec of ``stat``/``sha1sum``/etc per fact.
+
+Agent handlers produce exactly the same output as the fact commands they replace, so facts
+process the output as normal. Hosts without Python fall back to the fact commands.
+"""
+
+from __future__ import annotations
+
+import json
+from inspect import getfullargspec
+from io import StringIO
+from typing import TYPE_CHECKING, Optional
+
+from pyinfra import logger
+
+from .command import QuoteString, StringCommand
+
+if TYPE_CHECKING:
+    from .facts import FactBase
+    from .host import Host
+    from .state import State
+
+
+AGENT_SCRIPT = r'''
+import grp
+import hashlib
+import io
+import json
+import os
+import pwd
+import stat
+import sys
+
+
+def _get_name(getter, id_):
+    try:
+        return getter(id_)[0]
+    except KeyError:
+        return str(id_)
+
+
+def stat_path(path):
+    try:
+        path_stat = os.lstat(path)
+    except OSError:
+        return
+
+    name = "'{0}'".format(path)
+    if stat.S_ISLNK(path_stat.st_mode):
+        name = "{0} -> '{1}'".format(name, os.readlink(path))
+
+    print(
+        "user={0} group={1} mode={2} atime={3} mtime={4} ctime={5} size={6} {7}".format(
+            _get_name(pwd.getpwuid, path_stat.st_uid),
+            _get_name(grp.getgrgid, path_stat.st_gid),
+            stat.filemode(path_stat.st_mode),
+            int(path_stat.st_atime),
+            int(path_stat.st_mtime),
+            int(path_stat.st_ctime),
+            path_stat.st_size,
+            name,
+        ),
+    )
+
+
+def hash_path(algorithm, path):
+    if not os.path.exists(path):
+        return
+
+    try:
+        digest = hashlib.new(algorithm)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(65536), b""):
+                digest.update(chunk)
+    except (OSError, ValueError):
+        return
+
+    print("{0}  {1}".format(digest.hexdigest(), path))
+
+
+def for_each_path(handler):
+    def handle_paths(*paths):
+        for path in paths:
+            print("--")
+            handler(path)
+
+    return handle_paths
+
+
+def make_hash_handler(algorithm):
+    return lambda path: hash_path(algorithm, path)
+
+
+HANDLERS = {
+    "stat": stat_path,
+    "stat_paths": for_each_path(stat_path),
+    "sha1": make_hash_handler("sha1"),
+    "sha1_paths": for_each_path(make_hash_handler("sha1")),
+    "sha256": make_hash_handler("sha256"),
+    "md5": make_hash_handler("md5"),
+}
+
+
+def main(marker):
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", errors="surrogateescape")
+
+    # Each query is a JSON list of [index, handler, *args], output for each query follows the
+    # same marker protocol as batched fact commands.
+    for line in sys.stdin:
+        query = json.loads(line)
+        index, handler, args = query[0], query[1], query[2:]
+
+        for stream in (sys.stdout, sys.stderr):
+            stream.write("{0} {1}\n".format(marker, index))
+            stream.flush()
+
+        exit_code = 0
+        try:
+            HANDLERS[handler](*args)
+        except Exception as e:
+            sys.stderr.write("{0}\n".format(e))
+            exit_code = 1
+
+        sys.stdout.write("{0} {1} {2}\n".format(marker, index, exit_code))
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+
+main(sys.argv[1])
+'''
+
+AGENT_QUERIES_DELIMITER = "PYINFRA_FACT_AGENT_EOF"
+
+
+def get_fact_agent_path(state: "State", host: "Host") -> Optional[str]:
+    """
+    Returns the path of the fact agent on the host, uploading it on first use. Returns ``None``
+    if the agent is disabled or the host cannot run it.
+    """
+
+    if not state.config.FACT_AGENT:
+        return None
+
+    if "fact_agent_path" in host.connector_data:
+        return host.connector_data["fact_agent_path"]
+
+    agent_path: Optional[str] = None
+
+    status, _ = host.run_shell_command("command -v python3")
+    if status:
+        # Named by the script hash, so a different pyinfra version uploads a new agent
+        remote_filename = host.get_temp_filename(f"fact-agent-{AGENT_SCRIPT}")
+        try:
+            if host.put_file(StringIO(AGENT_SCRIPT), remote_filename):
+                agent_path = remote_filename
+        except Exception as e:
+            logger.debug("Could not upload fact agent to %s: %s", host.name, e)
+
+    if not agent_path:
+        logger.debug("Fact agent not available on %s, using fact commands", host.name)
+
+    host.connector_data["fact_agent_path"] = agent_path
+    return agent_path
+
+
+def make_agent_query(fact: "FactBase", fact_kwargs: dict) -> list:
+    """
+    Returns the agent handler & arguments for a fact, arguments are passed in the order of the
+    fact ``command`` arguments with any lists (ie ``paths``) expanded.
+    """
+
+    query = [fact.agent_handler]
+
+    if not callable(fact.command):
+        return query
+
+    for key in getfullargspec(fact.command).args:
+        if key == "self" or key not in fact_kwargs:
+            continue
+
+        value = fact_kwargs[key]
+        if isinstance(value, (list, tuple)):
+            query.extend(value)
+        else:
+            query.append(value)
+
+    return query
+
+
+def make_agent_command(
+    agent_path: str,
+    marker: str,
+    queries: list[tuple[int, list]],
+) -> StringCommand:
+    query_lines = "\n".join(json.dumps([i, *query]) for i, query in queries)
+
+    return StringCommand(
+        "python3",
+        QuoteString(agent_path),
+        marker,
+        f"<<'{AGENT_QUERIES_DELIMITER}'\n{query_lines}\n{AGENT_QUERIES_DELIMITER}",
+    )
@@ -0,0 +1,94 @@
+"""
+Persistent, file based storage for fact data. Used to keep facts that rarely change (those
+with a ``cache_ttl`` set) between pyinfra runs, see ``Config.FACT_CACHE``.
+
+Fact data is pickled and stored in an SQLite database keyed by host name, fact name and the
+fact hash (which includes the fact & executor arguments).
+"""
+
+from __future__ import annotations
+
+import pickle
+import sqlite3
+from os import makedirs, path
+from time import time
+from typing import Any, Optional
+
+from pyinfra import logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts (
+    host TEXT NOT NULL,
+    fact TEXT NOT NULL,
+    fact_hash TEXT NOT NULL,
+    created REAL NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (host, fact, fact_hash)
+)
+"""
+
+
+class FactStore:
+    """
+    Stores fact data in an SQLite database file.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+        dirname = path.dirname(filename)
+        if dirname:
+            makedirs(dirname, exist_ok=True)
+
+        # Autocommit, this is a cache so we trade durability for speed
+        self.connection = sqlite3.connect(filename, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute(SCHEMA)
+
+    def get(
+        self,
+        host_name: str,
+        fact_name: str,
+        fact_hash: str,
+        max_age: Optional[int] = None,
+    ) -> tuple[bool, Any]:
+        """
+        Returns a ``(found, data)`` tuple for this fact, ignoring data older than ``max_age``.
+        """
+
+        row = self.connection.execute(
+            "SELECT created, data FROM facts WHERE host = ? AND fact = ? AND fact_hash = ?",
+            (host_name, fact_name, fact_hash),
+        ).fetchone()
+
+        if row is None:
+            return False, None
+
+        created, data = row
+        if max_age is not None and time() - created > max_age:
+            return False, None
+
+        try:
+            return True, pickle.loads(data)
+        except Exception as e:
+            logger.debug("Ignoring unreadable stored fact %s on %s: %s", fact_name, host_name, e)
+            return False, None
+
+    def set(self, host_name: str, fact_name: str, fact_hash: str, data: Any) -> None:
+        try:
+            pickled_data = pickle.dumps(data)
+        except Exception as e:
+            logger.debug("Cannot store fact %s on %s: %s", fact_name, host_name, e)
+            return
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO facts VALUES (?, ?, ?, ?, ?)",
+            (host_name, fact_name, fact_hash, time(), pickled_data),
+        )
+
+    def clear(self) -> None:
+        self.connection.execute("DELETE FROM facts")
+
+    def close(self) -> None:
+        self.connection.close()
@@ -11,27 +11,33 @@ other host B while I operate on this host A).
 from __future__ import annotations
 
 import re
+from collections import defaultdict
+from dataclasses import dataclass
 from inspect import getcallargs
+from itertools import chain
 from socket import error as socket_error, timeout as timeout_error
+from time import perf_counter, process_time
 from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
     Generic,
     Iterable,
+    Iterator,
     Optional,
     Type,
     TypeVar,
     Union,
     cast,
 )
+from uuid import uuid4
 
 import click
 import gevent
 from paramiko import SSHException
 
 from pyinfra import logger
-from pyinfra.api import StringCommand
+from pyinfra.api import QuoteString, StringCommand
 from pyinfra.api.arguments import pop_global_arguments
 from pyinfra.api.util import (
     get_kwargs_str,
@@ -40,11 +46,13 @@ from pyinfra.api.util import (
     make_hash,
     print_host_combined_output,
 )
-from pyinfra.connectors.util import CommandOutput
+from pyinfra.connectors.util import CommandOutput, OutputLine
 from pyinfra.context import ctx_host, ctx_state
 from pyinfra.progress import progress_spinner
 
 from .arguments import CONNECTOR_ARGUMENT_KEYS
+from .concurrency import FACTS_STAGE
+from .fact_agent import get_fact_agent_path, make_agent_command, make_agent_query
 
 if TYPE_CHECKING:
     from pyinfra.api.host import Host
@@ -57,7 +65,9 @@ SU_REGEXES = (
 )
 
 
-T = TypeVar("T")
+# Facts only produce values of T, so a fact can be used where a wider type is expected, ie
+# updating a dict with a fact returning a dict of narrower values
+T = TypeVar("T", covariant=True)
 
 
 class FactBase(Generic[T]):
@@ -69,6 +79,18 @@ class FactBase(Generic[T]):
 
     requires_command: Optional[str] = None
 
+    # Alternative commands, in order of preference, the fact command can use. When the commands
+    # available on the host are known ``preferred_command`` is set to the first one present before
+    # calling ``command``, so the fact can avoid chaining fallbacks.
+    preferred_commands: Optional[list[str]] = None
+    preferred_command: Optional[str] = None
+
+    # Fact agent handler producing the same output as ``command``, see pyinfra.api.fact_agent
+    agent_handler: Optional[str] = None
+
+    # Seconds to keep this fact in the persistent fact store between runs, see Config.FACT_CACHE
+    cache_ttl: Optional[int] = None
+
     command: Union[str, Callable]
 
     def __init_subclass__(cls) -> None:
@@ -88,6 +110,14 @@ class FactBase(Generic[T]):
         # NOTE: TypeVar does not support a default, so we have to cast this str -> T
         return cast(T, "\n".join(output))
 
+    def process_stream(self, output: Iterator[str]) -> T:
+        """
+        Facts with large outputs can override this to process lines as they are read from
+        the host, instead of ``process`` being called with all of the buffered output.
+        """
+
+        return self.process(list(output))
+
     def process_pipeline(self, args, output):
         return {arg: self.process([output[i]]) for i, arg in enumerate(args)}
 
@@ -106,6 +136,51 @@ class ShortFactBase(Generic[T]):
         return data
 
 
+@dataclass
+class FactStats:
+    """
+    Timings and output sizes of a fact loaded from a host, passed to the ``fact_end`` callback.
+    Facts loaded in a batch share the wall time of the single command that loaded them.
+    """
+
+    name: str
+    kwargs: dict
+    # Seconds spent waiting on the remote command
+    wall_time: float = 0
+    # Number of facts loaded by the same remote command
+    batch_size: int = 1
+    exit_code: Optional[int] = None
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+    # CPU seconds spent in process/process_stream, for streamed facts this includes the time
+    # spent reading output as it is processed.
+    process_time: float = 0
+
+
+def _get_lines_bytes(lines: Iterable[str]) -> int:
+    # Lines are stored without their newline characters
+    return sum(len(line.encode("utf-8", "replace")) + 1 for line in lines)
+
+
+def _count_stdout_bytes(lines: Iterator[str], stats: FactStats) -> Iterator[str]:
+    for line in lines:
+        stats.stdout_bytes += _get_lines_bytes((line,))
+        yield line
+
+
+def _end_fact_stats(
+    state: "State",
+    host: "Host",
+    stats: FactStats,
+    output: CommandOutput,
+) -> None:
+    stats.exit_code = output.exit_code
+    # Streamed stdout is counted as it is read, see _get_fact
+    stats.stdout_bytes += _get_lines_bytes(output.stdout_lines)
+    stats.stderr_bytes += _get_lines_bytes(output.stderr_lines)
+    state.trigger_callbacks("fact_end", host, stats)
+
+
 def get_short_facts(state: "State", host: "Host", short_fact, **kwargs):
     fact_data = get_fact(state, host, short_fact.fact, **kwargs)
     return short_fact().process_data(fact_data)
@@ -182,33 +257,43 @@ def get_facts(state: "State", *args, **kwargs):
             with ctx_host.use(host):
                 return get_fact(state, host, *args, **kwargs)
 
-    greenlet_to_host = {
-        state.pool.spawn(get_fact_with_context, state, host, *args, **kwargs): host
-        for host in state.inventory.iter_active_hosts()
-    }
-
     results = {}
 
-    with progress_spinner(greenlet_to_host.values()) as progress:
-        for greenlet in gevent.iwait(greenlet_to_host.keys()):
-            host = greenlet_to_host[greenlet]
-            results[host] = greenlet.get()
-            progress(host)
+    with state.pool.use_stage(FACTS_STAGE):
+        greenlet_to_host = {
+            state.pool.spawn(get_fact_with_context, state, host, *args, **kwargs): host
+            for host in state.inventory.iter_active_hosts()
+        }
+
+        with progress_spinner(greenlet_to_host.values()) as progress:
+            for greenlet in gevent.iwait(greenlet_to_host.keys()):
+                host = greenlet_to_host[greenlet]
+                results[host] = greenlet.get()
+                progress(host)
 
     return results
 
 
+def _track_fact(host: "Host", cls, args, kwargs, data) -> None:
+    # Record the facts read while checking an operation for changes, see
+    # ``StateOperationHostData.prepared_fact_hosts`` and ``pyinfra.api.plan_store``.
+    if ctx_host.isset():
+        op_facts = ctx_host.get().current_op_facts
+        if op_facts is not None:
+            op_facts.append((host, cls, args, kwargs, data))
+
+
 def get_fact(
     state: "State",
     host: "Host",
-    cls: type[FactBase],
+    cls: type[Union[FactBase, ShortFactBase]],
     args: Optional[Any] = None,
     kwargs: Optional[Any] = None,
     ensure_hosts: Optional[Any] = None,
     apply_failed_hosts: bool = True,
 ) -> Any:
     if issubclass(cls, ShortFactBase):
-        return get_short_facts(
+        data = get_short_facts(
             state,
             host,
             cls,
@@ -217,16 +302,19 @@ def get_fact(
             ensure_hosts=ensure_hosts,
             apply_failed_hosts=apply_failed_hosts,
         )
+    else:
+        data = _get_fact(
+            state,
+            host,
+            cls,
+            args,
+            kwargs,
+            ensure_hosts,
+            apply_failed_hosts,
+        )
 
-    return _get_fact(
-        state,
-        host,
-        cls,
-        args,
-        kwargs,
-        ensure_hosts,
-        apply_failed_hosts,
-    )
+    _track_fact(host, cls, args, kwargs, data)
+    return data
 
 
 def _get_fact(
@@ -243,6 +331,13 @@ def _get_fact(
 
     fact_kwargs, executor_kwargs = _handle_fact_kwargs(state, host, cls, args, kwargs)
 
+    # Facts are cached per host until a command is executed on it, see: Host.reset_fact_cache
+    fact_hash = make_hash((cls, fact_kwargs, executor_kwargs))
+    is_cached, data = _get_cached_fact(state, host, cls, fact_hash)
+    if is_cached:
+        logger.debug("Using cached fact: %s (%s)", name, get_kwargs_str(fact_kwargs))
+        return data
+
     kwargs_str = get_kwargs_str(fact_kwargs)
     logger.debug(
         "Getting fact: %s (%s) (ensure_hosts: %r)",
@@ -257,38 +352,66 @@ def _get_fact(
             raise_exceptions=True,
         )
 
-    ignore_errors = (
-        host.current_op_global_arguments["_ignore_errors"]
-        if host.in_op and host.current_op_global_arguments
-        else state.config.IGNORE_ERRORS
-    )
-
     # Facts can override the shell (winrm powershell vs cmd support)
     if fact.shell_executable:
         executor_kwargs["_shell_executable"] = fact.shell_executable
 
-    command = _make_command(fact.command, fact_kwargs)
-    requires_command = _make_command(fact.requires_command, fact_kwargs)
-    if requires_command:
-        command = StringCommand(
-            # Command doesn't exist, return 0 *or* run & return fact command
-            "!",
-            "command",
-            "-v",
-            requires_command,
-            ">/dev/null",
-            "||",
-            command,
-        )
+    available_commands = _get_available_commands(state, host, fact, executor_kwargs)
+    command = _make_fact_command(fact, fact_kwargs, available_commands)
 
     status = False
     output = CommandOutput([])
 
+    # The fact requires a command the host doesn't have, same as the command -v check
+    if command is None:
+        logger.debug("Skipping fact %s (%s), missing required command", name, kwargs_str)
+        return _handle_fact_output(
+            state,
+            host,
+            fact,
+            fact_hash,
+            fact_kwargs,
+            kwargs,
+            executor_kwargs,
+            True,
+            output,
+            apply_failed_hosts,
+        )
+
+    stats = FactStats(name, fact_kwargs)
+
+    # Facts that process their output as a stream are passed stdout lines as they are read
+    stream_result: list[Any] = []
+    stream_errors: list[Exception] = []
+    stream_kwargs = {}
+
+    if _is_streaming_fact(fact):
+
+        def stdout_handler(lines: Iterator[str]) -> None:
+            stream_result.clear()
+            lines = _count_stdout_bytes(lines, stats)
+            # Like process, only called when there is output
+            for first_line in lines:
+                process_start = process_time()
+                try:
+                    stream_result.append(fact.process_stream(chain((first_line,), lines)))
+                except Exception as e:
+                    stream_errors.append(e)
+                stats.process_time += process_time() - process_start
+                break
+
+        stream_kwargs["stdout_handler"] = stdout_handler
+
+    state.trigger_callbacks("fact_start", host, name, fact_kwargs)
+    start_time = perf_counter()
+
     try:
         status, output = host.run_shell_command(
             command,
             print_output=state.print_fact_output,
             print_input=state.print_fact_input,
+            latency_key=name,
+            **stream_kwargs,
             **executor_kwargs,
         )
     except (timeout_error, socket_error, SSHException) as e:
@@ -298,13 +421,231 @@ def _get_fact(
             timeout=executor_kwargs["_timeout"],
         )
 
+    stats.wall_time = perf_counter() - start_time
+
+    if stream_errors:
+        _end_fact_stats(state, host, stats, output)
+        raise stream_errors[0]
+
+    return _handle_fact_output(
+        state,
+        host,
+        fact,
+        fact_hash,
+        fact_kwargs,
+        kwargs,
+        executor_kwargs,
+        status,
+        output,
+        apply_failed_hosts,
+        stream_result=stream_result,
+        stats=stats,
+    )
+
+
+def _is_streaming_fact(fact: FactBase) -> bool:
+    return type(fact).process_stream is not FactBase.process_stream
+
+
+def _get_cached_fact(
+    state: "State",
+    host: "Host",
+    cls: type[FactBase],
+    fact_hash: str,
+) -> tuple[bool, Any]:
+    if fact_hash in host.fact_cache:
+        return True, host.fact_cache[fact_hash]
+
+    # Facts are only ever read from the recording when replaying, never loaded from the host
+    if state.fact_replay:
+        is_stored, data = state.fact_replay.get(host.name, cls.name, fact_hash)
+        if not is_stored:
+            logger.warning(
+                "%sFact %s not found in replayed facts, using default",
+                host.print_prefix,
+                cls.name,
+            )
+            data = cls().default()
+        host.fact_cache[fact_hash] = data
+        return True, data
+
+    # Stored facts may be out of date once commands have been executed on the host
+    if cls.cache_ttl and state.fact_store and not host.executed_command_count:
+        is_stored, data = state.fact_store.get(
+            host.name,
+            cls.name,
+            fact_hash,
+            max_age=cls.cache_ttl,
+        )
+        if is_stored:
+            host.fact_cache[fact_hash] = data
+            _record_fact(state, host, cls.name, fact_hash, data)
+            return True, data
+
+    return False, None
+
+
+def _set_cached_fact(
+    state: "State",
+    host: "Host",
+    fact: FactBase,
+    fact_hash: str,
+    data: Any,
+) -> None:
+    host.fact_cache[fact_hash] = data
+    _record_fact(state, host, fact.name, fact_hash, data)
+
+    if fact.cache_ttl and state.fact_store:
+        state.fact_store.set(host.name, fact.name, fact_hash, data)
+
+
+def _record_fact(state: "State", host: "Host", fact_name: str, fact_hash: str, data: Any) -> None:
+    # Only facts loaded before executing operations are recorded, see Config.FACT_RECORD
+    if state.fact_recorder and not state.is_executing:
+        state.fact_recorder.set(host.name, fact_name, fact_hash, data)
+
+
+def _get_known_commands() -> list[str]:
+    commands: set[str] = set()
+    fact_classes: list[type[FactBase]] = [FactBase]
+
+    while fact_classes:
+        fact_cls = fact_classes.pop()
+        fact_classes.extend(fact_cls.__subclasses__())
+
+        if isinstance(fact_cls.requires_command, str):
+            commands.add(fact_cls.requires_command)
+        if fact_cls.preferred_commands:
+            commands.update(command.split()[0] for command in fact_cls.preferred_commands)
+
+    return sorted(commands)
+
+
+def _get_available_commands(
+    state: "State",
+    host: "Host",
+    fact: FactBase,
+    executor_kwargs: dict,
+) -> Optional[dict[str, bool]]:
+    """
+    Returns a map of command -> present on the host for every command used by the loaded facts,
+    probed with a single remote command. Returns ``None`` when this is unknown, in which case
+    facts check for (or chain) commands remotely.
+    """
+
+    if not (fact.requires_command or fact.preferred_commands) or fact.shell_executable:
+        return None
+
+    # Operations may install commands, so only probe before executing anything
+    if state.is_executing:
+        return None
+
+    probe_kwargs = {
+        key: value
+        for key, value in executor_kwargs.items()
+        if key not in ("_stdin", "_success_exit_codes")
+    }
+    probe_hash = make_hash(probe_kwargs)
+
+    if probe_hash not in host.available_commands:
+        commands = _get_known_commands()
+        available_commands: Optional[dict[str, bool]] = None
+
+        try:
+            status, output = host.run_shell_command(
+                StringCommand(
+                    "for command in",
+                    *[QuoteString(command) for command in commands],
+                    '; do command -v "$command" >/dev/null && echo "$command" || true; done',
+                ),
+                print_output=state.print_fact_output,
+                print_input=state.print_fact_input,
+                latency_key="available commands",
+                **probe_kwargs,
+            )
+        except (timeout_error, socket_error, SSHException) as e:
+            logger.debug("Could not probe available commands on %s: %s", host.name, e)
+            return None
+
+        if status:
+            present_commands = set(output.stdout_lines)
+            available_commands = {command: command in present_commands for command in commands}
+
+        host.available_commands[probe_hash] = available_commands
+
+    return host.available_commands[probe_hash]
+
+
+def _make_fact_command(
+    fact: FactBase,
+    fact_kwargs: dict,
+    available_commands: Optional[dict[str, bool]] = None,
+) -> Optional[Union[str, StringCommand]]:
+    if available_commands is not None and fact.preferred_commands:
+        for preferred_command in fact.preferred_commands:
+            if available_commands.get(preferred_command.split()[0]):
+                fact.preferred_command = preferred_command
+                break
+
+    command = _make_command(fact.command, fact_kwargs)
+    requires_command = _make_command(fact.requires_command, fact_kwargs)
+
+    if requires_command and available_commands is not None:
+        is_available = available_commands.get(requires_command)
+        if is_available is False:
+            return None
+        if is_available:
+            return command
+
+    if requires_command:
+        command = StringCommand(
+            # Command doesn't exist, return 0 *or* run & return fact command
+            "!",
+            "command",
+            "-v",
+            requires_command,
+            ">/dev/null",
+            "||",
+            command,
+        )
+    return command
+
+
+def _handle_fact_output(
+    state: "State",
+    host: "Host",
+    fact: FactBase,
+    fact_hash: str,
+    fact_kwargs: dict,
+    kwargs: Optional[dict],
+    executor_kwargs: dict,
+    status: bool,
+    output: CommandOutput,
+    apply_failed_hosts: bool,
+    stream_result: Optional[list[Any]] = None,
+    stats: Optional[FactStats] = None,
+) -> Any:
+    name = fact.name
+
+    ignore_errors = (
+        host.current_op_global_arguments["_ignore_errors"]
+        if host.in_op and host.current_op_global_arguments
+        else state.config.IGNORE_ERRORS
+    )
+
     stdout_lines, stderr_lines = output.stdout_lines, output.stderr_lines
 
     data = fact.default()
 
     if status:
-        if stdout_lines:
+        process_start = process_time()
+        # Output already processed as it was read, see FactBase.process_stream
+        if stream_result:
+            data = stream_result[0]
+        elif stdout_lines:
             data = fact.process(stdout_lines)
+        if stats:
+            stats.process_time += process_time() - process_start
     elif stderr_lines:
         # If we have error output and that error is sudo or su stating the user
         # does not exist, do not fail but instead return the default fact value.
@@ -328,6 +669,8 @@ def _get_fact(
             logger.info(log_message)
         else:
             logger.debug(log_message)
+
+        _set_cached_fact(state, host, fact, fact_hash, data)
     else:
         if not state.print_fact_output:
             print_host_combined_output(host, output)
@@ -338,6 +681,9 @@ def _get_fact(
             description=("could not load fact: {0} {1}").format(name, get_kwargs_str(fact_kwargs)),
         )
 
+    if stats:
+        _end_fact_stats(state, host, stats, output)
+
     # Check we've not failed
     if not status and not ignore_errors and apply_failed_hosts:
         state.fail_hosts({host})
@@ -345,6 +691,234 @@ def _get_fact(
     return data
 
 
+def _get_fact_batches(
+    state: "State",
+    host: "Host",
+    facts: list[tuple[type[Union[FactBase, ShortFactBase]], Optional[dict]]],
+) -> list[list[tuple[int, FactBase, dict, dict, str]]]:
+    batches: dict[str, list[tuple[int, FactBase, dict, dict, str]]] = defaultdict(list)
+
+    for i, (cls, kwargs) in enumerate(facts):
+        fact_cls = cls.fact if issubclass(cls, ShortFactBase) else cls
+        fact_kwargs, executor_kwargs = _handle_fact_kwargs(state, host, fact_cls, None, kwargs)
+        fact_hash = make_hash((fact_cls, fact_kwargs, executor_kwargs))
+
+        if (
+            _get_cached_fact(state, host, fact_cls, fact_hash)[0]
+            # Facts overriding the shell (ie powershell) or taking stdin must run alone
+            or fact_cls.shell_executable
+            or executor_kwargs.get("_stdin")
+        ):
+            continue
+
+        batches[make_hash(executor_kwargs)].append(
+            (i, fact_cls(), fact_kwargs, executor_kwargs, fact_hash),
+        )
+
+    # Single facts gain nothing from batching
+    return [batch for batch in batches.values() if len(batch) > 1]
+
+
+def get_host_facts(
+    state: "State",
+    host: "Host",
+    facts: Iterable[tuple[type[Union[FactBase, ShortFactBase]], Optional[dict]]],
+    apply_failed_hosts: bool = True,
+) -> list[Any]:
+    """
+    Load a list of ``(fact_cls, kwargs)`` facts for a single host. Any uncached facts that share
+    the same executor arguments are executed together as one remote command, with the output
+    split back out to each fact. Anything that cannot be batched is loaded individually.
+    """
+
+    facts = list(facts)
+    results: dict[int, Any] = {}
+
+    for batch in _get_fact_batches(state, host, facts):
+        batch_outputs = _run_fact_batch(state, host, batch)
+        if batch_outputs is None:
+            continue
+
+        for (i, fact, fact_kwargs, executor_kwargs, fact_hash), (status, output, stats) in zip(
+            batch,
+            batch_outputs,
+        ):
+            cls, kwargs = facts[i]
+            data = _handle_fact_output(
+                state,
+                host,
+                fact,
+                fact_hash,
+                fact_kwargs,
+                kwargs,
+                executor_kwargs,
+                status,
+                output,
+                apply_failed_hosts,
+                stats=stats,
+            )
+            if issubclass(cls, ShortFactBase):
+                data = cls().process_data(data)
+            results[i] = data
+            _track_fact(host, cls, None, kwargs, data)
+
+    # Anything left is either cached now or loaded one by one
+    for i, (cls, kwargs) in enumerate(facts):
+        if i not in results:
+            results[i] = get_fact(
+                state,
+                host,
+                cls,
+                kwargs=kwargs,
+                apply_failed_hosts=apply_failed_hosts,
+            )
+
+    return [results[i] for i in range(len(facts))]
+
+
+def prefetch_host_facts(
+    state: "State",
+    host: "Host",
+    facts: Iterable[tuple[type[Union[FactBase, ShortFactBase]], Optional[dict]]],
+) -> None:
+    """
+    Batch load a list of ``(fact_cls, kwargs)`` facts into the host fact cache. Unlike
+    ``get_host_facts`` failures are ignored here, any fact that could not be loaded will be
+    loaded (and any error handled) as normal when it is actually requested.
+    """
+
+    for batch in _get_fact_batches(state, host, list(facts)):
+        batch_outputs = _run_fact_batch(state, host, batch)
+        if batch_outputs is None:
+            continue
+
+        for (_, fact, _, _, fact_hash), (status, output, stats) in zip(batch, batch_outputs):
+            if status:
+                process_start = process_time()
+                stdout_lines = output.stdout_lines
+                data = fact.process(stdout_lines) if stdout_lines else fact.default()
+                stats.process_time += process_time() - process_start
+                _set_cached_fact(state, host, fact, fact_hash, data)
+
+            _end_fact_stats(state, host, stats, output)
+
+
+def _run_fact_batch(
+    state: "State",
+    host: "Host",
+    batch: list[tuple[int, FactBase, dict, dict, str]],
+) -> Optional[list[tuple[bool, CommandOutput, FactStats]]]:
+    # Each fact runs in a subshell between marker lines; start markers are written to both
+    # stdout and stderr, the end marker (with the subshell exit code) to stdout only.
+    marker = f"PYINFRA_FACT_{uuid4().hex}"
+    executor_kwargs = batch[0][3]
+
+    if not host.connected:
+        host.connect(
+            reason="to load facts: {0}".format(", ".join(fact.name for _, fact, *_ in batch)),
+            raise_exceptions=True,
+        )
+
+    agent_path = get_fact_agent_path(state, host)
+    agent_queries: list[tuple[int, list]] = []
+
+    batch_stats = [
+        FactStats(fact.name, fact_kwargs, batch_size=len(batch))
+        for _, fact, fact_kwargs, _, _ in batch
+    ]
+
+    command_bits: list[Union[str, StringCommand]] = []
+    for i, (_, fact, fact_kwargs, _, _) in enumerate(batch):
+        command = _make_fact_command(fact, fact_kwargs)
+        # Without any available commands to check, the fact command is always made
+        assert command is not None
+
+        # Facts the agent can answer are all sent to a single agent process below
+        if agent_path and fact.agent_handler and not fact.requires_command:
+            agent_queries.append((i, make_agent_query(fact, fact_kwargs)))
+            continue
+
+        command_bits.extend(
+            [
+                f"echo {marker} {i}; echo {marker} {i} >&2",
+                "(",
+                command,
+                ")",
+                f'echo "{marker} {i} $?"',
+            ],
+        )
+
+    if agent_path and agent_queries:
+        command_bits.append(make_agent_command(agent_path, marker, agent_queries))
+
+    for stats in batch_stats:
+        state.trigger_callbacks("fact_start", host, stats.name, stats.kwargs)
+    start_time = perf_counter()
+
+    output: Optional[CommandOutput] = None
+    try:
+        status, output = host.run_shell_command(
+            StringCommand(*command_bits, _separator="\n"),
+            print_output=state.print_fact_output,
+            print_input=state.print_fact_input,
+            latency_key=",".join(sorted(stats.name for stats in batch_stats)),
+            **executor_kwargs,
+        )
+    except (timeout_error, socket_error, SSHException) as e:
+        log_host_command_error(
+            host,
+            e,
+            timeout=executor_kwargs["_timeout"],
+        )
+
+    wall_time = perf_counter() - start_time
+    for stats in batch_stats:
+        stats.wall_time = wall_time
+
+    if output is None:
+        return [(False, CommandOutput([]), stats) for stats in batch_stats]
+
+    # The batch itself failed (ie sudo/su errors), let each fact load & handle errors alone
+    if not status:
+        for stats in batch_stats:
+            _end_fact_stats(state, host, stats, CommandOutput([], exit_code=output.exit_code))
+        return None
+
+    fact_lines: list[list[OutputLine]] = [[] for _ in batch]
+    exit_codes: dict[int, int] = {}
+    current_index: dict[str, Optional[int]] = {"stdout": None, "stderr": None}
+
+    for line in output:
+        index = current_index.get(line.buffer_name)
+        prefix, found_marker, marker_args = line.line.partition(marker)
+
+        if not found_marker:
+            if index is not None:
+                fact_lines[index].append(line)
+            continue
+
+        # Output not ending with a newline shares a line with the next marker
+        if prefix and index is not None:
+            fact_lines[index].append(OutputLine(line.buffer_name, prefix))
+
+        marker_index, *exit_code = marker_args.split()
+        if exit_code:
+            exit_codes[int(marker_index)] = int(exit_code[0])
+            current_index[line.buffer_name] = None
+        else:
+            current_index[line.buffer_name] = int(marker_index)
+
+    success_exit_codes = executor_kwargs.get("_success_exit_codes") or [0]
+    return [
+        (
+            exit_codes.get(i) in success_exit_codes,
+            CommandOutput(lines, exit_code=exit_codes.get(i)),
+            batch_stats[i],
+        )
+        for i, lines in enumerate(fact_lines)
+    ]
+
+
 def _get_fact_hash(state: "State", host: "Host", cls, args, kwargs):
     if issubclass(cls, ShortFactBase):
         cls = cls.fact
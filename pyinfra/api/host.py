@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
+from socket import error as socket_error, timeout as timeout_error
+from time import perf_counter
 from typing import (
     TYPE_CHECKING,
     Any,
     Callable,
     Generator,
+    Iterable,
     Optional,
     Type,
     TypeVar,
@@ -16,15 +19,25 @@ from typing import (
 from uuid import uuid4
 
 import click
+from gevent.lock import RLock
+from paramiko import SSHException
 from typing_extensions import Unpack
 
 from pyinfra import logger
 from pyinfra.connectors.base import BaseConnector
 from pyinfra.connectors.util import CommandOutput, remove_any_sudo_askpass_file
+from pyinfra.context import ctx_host
 
 from .connectors import get_execution_connector
 from .exceptions import ConnectError
-from .facts import FactBase, ShortFactBase, get_host_fact
+from .facts import (
+    FactBase,
+    ShortFactBase,
+    get_host_fact,
+    get_host_facts,
+    prefetch_host_facts,
+)
+from .plan_store import MISSING_DATA
 from .util import memoize, sha1_hash
 
 if TYPE_CHECKING:
@@ -33,7 +46,9 @@ if TYPE_CHECKING:
     from pyinfra.api.state import State
 
 
-def extract_callable_datas(datas: list[Union[Callable[..., Any], Any]]) -> Generator[Any, Any, Any]:
+def extract_callable_datas(
+    datas: Iterable[Union[Callable[..., Any], Any]],
+) -> Generator[Any, Any, Any]:
     for data in datas:
         # Support for dynamic data, ie @deploy wrapped data defaults where
         # the data is stored on the state temporarily.
@@ -49,6 +64,8 @@ class HostData:
     """
 
     override_datas: dict[str, Any]
+    # Cached merge of all the datas, see ``reset_cache``
+    flattened_data: Optional[dict[str, Any]]
 
     def __init__(self, host: "Host", *datas):
         self.__dict__["host"] = host
@@ -60,18 +77,50 @@ class HostData:
         parsed_datas.insert(0, self.override_datas)
 
         self.__dict__["datas"] = tuple(parsed_datas)
+        self.__dict__["flattened_data"] = None
+
+    def reset_cache(self) -> None:
+        """
+        Reset the merged data, called whenever one of the datas changes. Callable datas are
+        only called again after this.
+        """
+
+        self.__dict__["flattened_data"] = None
+
+    def _get_flattened_data(self) -> dict[str, Any]:
+        flattened_data = self.flattened_data
+        if flattened_data is None:
+            flattened_data = {}
+
+            # Merge in reverse such that the first datas override the last
+            for data in extract_callable_datas(reversed(self.datas)):
+                flattened_data.update(data)
+
+            self.__dict__["flattened_data"] = flattened_data
+
+        return flattened_data
+
+    def _track_read(self, key: Optional[str], value: Any) -> None:
+        # Record the data read while checking an operation for changes, see
+        # ``pyinfra.api.plan_store.get_operation_checks``.
+        if ctx_host.isset():
+            data_reads = ctx_host.get().current_op_data_reads
+            if data_reads is not None:
+                data_reads.append((self.host, key, value))
 
     def __getattr__(self, key: str):
-        for data in extract_callable_datas(self.datas):
-            try:
-                return data[key]
-            except KeyError:
-                pass
+        flattened_data = self._get_flattened_data()
+        if key in flattened_data:
+            value = flattened_data[key]
+            self._track_read(key, value)
+            return value
 
+        self._track_read(key, MISSING_DATA)
         raise AttributeError(f"Host `{self.host}` has no data `{key}`")
 
     def __setattr__(self, key: str, value: Any):
         self.override_datas[key] = value
+        self.reset_cache()
 
     def __str__(self):
         return str(self.datas)
@@ -79,17 +128,17 @@ class HostData:
     def get(self, key: str, default=None):
         return getattr(self, key, default)
 
-    def dict(self):
-        out = {}
-
-        # Copy and reverse data objects (such that the first items override
-        # the last, matching __getattr__ output).
-        datas = list(self.datas)
-        datas.reverse()
+    def get_keys(self, keys: Iterable[str]) -> dict[str, Any]:
+        """
+        Returns the value of each of ``keys`` present in the data.
+        """
 
-        for data in extract_callable_datas(datas):
-            out.update(data)
+        flattened_data = self._get_flattened_data()
+        return {key: flattened_data[key] for key in keys if key in flattened_data}
 
+    def dict(self):
+        out = dict(self._get_flattened_data())
+        self._track_read(None, out)
         return out
 
 
@@ -109,6 +158,14 @@ class Host:
     in_callback_op: bool = False
     current_op_hash: Optional[str] = None
     current_op_global_arguments: Optional["AllArguments"] = None
+    # Facts read while checking the current op for changes, as
+    # ``(fact_host, fact_cls, args, kwargs, data)`` tuples
+    current_op_facts: Optional[list[tuple]] = None
+    # Host data read while checking the current op for changes, as ``(host, key, value)``
+    current_op_data_reads: Optional[list[tuple]] = None
+
+    # Number of operation commands executed on this host, any of which may change its facts
+    executed_command_count: int = 0
 
     # Current context inside a @deploy function (op gen stage)
     in_deploy: bool = False
@@ -119,6 +176,8 @@ class Host:
     # Current context during operation execution
     executing_op_hash: Optional[str] = None
     nested_executing_op_hash: Optional[str] = None
+    # Held while running op functions & callbacks when executing ops concurrently
+    concurrent_op_lock: Optional[RLock] = None
 
     loop_position: list[int]
 
@@ -148,6 +207,11 @@ class Host:
 
         self.connector_data = {}
 
+        # Fact data cache, keyed by fact hash (see: pyinfra.api.facts)
+        self.fact_cache: dict[str, Any] = {}
+        # Commands present on the host by executor arguments hash, see: facts._get_fact
+        self.available_commands: dict[str, Optional[dict[str, bool]]] = {}
+
         # Append only list of operation hashes as called on this host, used to
         # generate a DAG to create the final operation order.
         self.op_hash_order: list[str] = []
@@ -167,8 +231,7 @@ class Host:
         self.state = state
         self.connector = self.connector_cls(state, self)
 
-        longest_name_len = max([len(host.name) for host in self.inventory])
-        padding_diff = longest_name_len - len(self.name)
+        padding_diff = self.inventory.longest_host_name_len - len(self.name)
         self.print_prefix_padding = "".join(" " for _ in range(0, padding_diff))
 
     def __str__(self):
@@ -274,6 +337,8 @@ class Host:
         self.current_deploy_name = name
         self.current_deploy_kwargs = kwargs
         self.current_deploy_data = data
+        if data or old_deploy_data:
+            self.data.reset_cache()
         logger.debug(
             "Starting deploy %s (args=%r, data=%r)",
             name,
@@ -288,6 +353,8 @@ class Host:
         self.current_deploy_name = old_deploy_name
         self.current_deploy_kwargs = old_deploy_kwargs
         self.current_deploy_data = old_deploy_data
+        if data or old_deploy_data:
+            self.data.reset_cache()
 
         logger.debug(
             "Reset deploy to %s (args=%r, data=%r)",
@@ -346,6 +413,28 @@ class Host:
         """
         return get_host_fact(self.state, self, name_or_cls, args=args, kwargs=kwargs)
 
+    def get_facts(self, facts: list[tuple[type[Union[FactBase, ShortFactBase]], dict]]) -> list:
+        """
+        Get a list of ``(fact_cls, kwargs)`` facts for this host, loading any uncached facts
+        together in a single command where possible.
+        """
+        return get_host_facts(self.state, self, facts)
+
+    def prefetch_facts(self, facts: list[tuple[type[Union[FactBase, ShortFactBase]], dict]]):
+        """
+        Load a list of ``(fact_cls, kwargs)`` facts into the fact cache for this host in a
+        single command, ignoring any errors.
+        """
+        prefetch_host_facts(self.state, self, facts)
+
+    def reset_fact_cache(self) -> None:
+        """
+        Clear any cached facts for this host, called whenever commands are executed on the
+        host as they may have changed the remote state.
+        """
+        self.fact_cache = {}
+        self.available_commands = {}
+
     # Connector proxy
     #
 
@@ -362,9 +451,12 @@ class Host:
         if not self.connected:
             self.state.trigger_callbacks("host_before_connect", self)
 
+            start_time = perf_counter()
             try:
                 self.connector.connect()
             except ConnectError as e:
+                self.state.pool.add_sample(perf_counter() - start_time, error=True)
+
                 if show_errors:
                     log_message = "{0}{1}".format(
                         self.print_prefix,
@@ -377,6 +469,8 @@ class Host:
                 if raise_exceptions:
                     raise
             else:
+                self.state.pool.add_sample(perf_counter() - start_time)
+
                 log_message = "{0}{1}".format(
                     self.print_prefix,
                     click.style("Connected", "green"),
@@ -407,12 +501,36 @@ class Host:
 
         self.state.trigger_callbacks("host_disconnect", self)
 
-    def run_shell_command(self, *args, **kwargs) -> tuple[bool, CommandOutput]:
+    def run_shell_command(
+        self,
+        *args,
+        latency_key: Optional[str] = None,
+        **kwargs,
+    ) -> tuple[bool, CommandOutput]:
         """
         Low level method to execute a shell command on the host via it's configured connector.
+
+        ``latency_key`` identifies commands with comparable latency (ie the fact name) for
+        the adaptive concurrency, defaulting to the executing operation.
         """
         self._check_state()
-        return self.connector.run_shell_command(*args, **kwargs)
+        # Connectors that cannot stream stdout to a handler return it buffered instead
+        if not self.connector.supports_stdout_handler:
+            kwargs.pop("stdout_handler", None)
+
+        # Latency is compared between runs of the same operation/fact, see api/concurrency.py
+        start_time = perf_counter()
+        try:
+            result = self.connector.run_shell_command(*args, **kwargs)
+        except (timeout_error, socket_error, SSHException):
+            self.state.pool.add_sample(perf_counter() - start_time, error=True)
+            raise
+
+        self.state.pool.add_sample(
+            perf_counter() - start_time,
+            key=latency_key or self.executing_op_hash,
+        )
+        return result
 
     def put_file(self, *args, **kwargs) -> bool:
         """
@@ -0,0 +1,54 @@
+"""
+Host equivalence grouping, enabled with ``Config.GROUP_EQUIVALENT_HOSTS``. Large inventories
+often contain many hosts with the same data & state, each of which calls every operation
+function to check for changes. Instead each operation records the host data & facts it read,
+and other hosts with the same operation arguments and the same values for those reuse the
+result without calling the operation function.
+
+Operation functions must only depend on their arguments, host data & facts for this to be
+correct (ie not ``host.name``), or declare any other inputs with ``local_inputs`` (as
+``files.template`` does with the rendered template).
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Optional
+
+from .plan_store import check_operation_checks
+
+if TYPE_CHECKING:
+    from .arguments import AllArguments
+    from .host import Host
+    from .state import State
+
+
+def get_equivalent_result(
+    state: "State",
+    host: "Host",
+    op_hash: str,
+    inputs_hash: str,
+    global_arguments: "AllArguments",
+) -> Optional[bool]:
+    """
+    Returns whether the operation yields commands on this host if an equivalent host has
+    already been checked, otherwise ``None``.
+    """
+
+    for checks, is_change in state.equivalent_op_results.get((op_hash, inputs_hash), []):
+        if check_operation_checks(host, checks, global_arguments):
+            return is_change
+    return None
+
+
+def add_equivalent_result(
+    state: "State",
+    op_hash: str,
+    inputs_hash: str,
+    checks: Optional[tuple[list, dict]],
+    is_change: bool,
+) -> None:
+    if checks is None:
+        return
+
+    results = state.equivalent_op_results.setdefault((op_hash, inputs_hash), [])
+    results.append((checks, is_change))
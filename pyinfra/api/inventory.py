@@ -138,6 +138,8 @@ class Inventory:
                     self.groups[group_name].append(host)
 
         self.hosts = hosts
+        # Used to align host output prefixes
+        self.longest_host_name_len = max((len(name) for name in hosts), default=0)
 
     def __len__(self) -> int:
         """
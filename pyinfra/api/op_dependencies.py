@@ -0,0 +1,111 @@
+"""
+Dependencies between the operations of a single host, used to execute independent operations
+at once, see ``Config.CONCURRENT_OPS``.
+
+By default an operation depends on every operation before it, so operations execute in order.
+Operations called with ``_depends_on`` only depend on the operations listed and any earlier
+operations that use the same resources: overlapping absolute paths, or the same package
+manager.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+
+if TYPE_CHECKING:
+    from .host import Host
+    from .state import State
+
+
+# Operations that hold a lock on the system package database, so can never run at once
+PACKAGE_OPERATION_MODULES = {
+    "pyinfra.operations.apk",
+    "pyinfra.operations.apt",
+    "pyinfra.operations.brew",
+    "pyinfra.operations.choco",
+    "pyinfra.operations.dnf",
+    "pyinfra.operations.pacman",
+    "pyinfra.operations.pkg",
+    "pyinfra.operations.pkgin",
+    "pyinfra.operations.snap",
+    "pyinfra.operations.xbps",
+    "pyinfra.operations.yum",
+    "pyinfra.operations.zypper",
+}
+PACKAGE_RESOURCE = "packages"
+
+
+def _add_path_resources(value: Any, resources: set[str]) -> None:
+    if isinstance(value, (list, tuple, set)):
+        for item in value:
+            _add_path_resources(item, resources)
+
+    elif isinstance(value, dict):
+        for item in value.values():
+            _add_path_resources(item, resources)
+
+    elif isinstance(value, str) and value.startswith("/"):
+        resources.add(value.rstrip("/") or "/")
+
+
+def get_operation_resources(func: Callable, args: tuple, kwargs: dict) -> frozenset[str]:
+    """
+    Returns the resources an operation may use on the host.
+    """
+
+    resources: set[str] = set()
+    _add_path_resources((args, kwargs), resources)
+
+    if func.__module__ in PACKAGE_OPERATION_MODULES:
+        resources.add(PACKAGE_RESOURCE)
+
+    return frozenset(resources)
+
+
+def _is_subpath(path: str, parent: str) -> bool:
+    return path == parent or path.startswith(parent if parent == "/" else f"{parent}/")
+
+
+def resources_overlap(resources: Iterable[str], other_resources: Iterable[str]) -> bool:
+    for resource in resources:
+        for other_resource in other_resources:
+            if _is_subpath(resource, other_resource) or _is_subpath(other_resource, resource):
+                return True
+    return False
+
+
+def get_host_op_dependencies(
+    state: "State",
+    host: "Host",
+    op_order: list[str],
+) -> dict[str, set[str]]:
+    """
+    Returns a dict of op hash -> op hashes that must be executed before it on this host.
+    """
+
+    host_ops = state.ops[host]
+    dependencies: dict[str, set[str]] = {}
+
+    for i, op_hash in enumerate(op_order):
+        previous_op_hashes = op_order[:i]
+
+        op_data = host_ops.get(op_hash)
+        depends_on = op_data.global_arguments.get("_depends_on") if op_data else None
+
+        if op_data is None or depends_on is None:
+            dependencies[op_hash] = set(previous_op_hashes)
+            continue
+
+        op_dependencies = {op_meta._hash for op_meta in depends_on}
+
+        for previous_op_hash in previous_op_hashes:
+            previous_op_data = host_ops.get(previous_op_hash)
+            if previous_op_data is None:
+                continue
+            if resources_overlap(op_data.resources, previous_op_data.resources):
+                op_dependencies.add(previous_op_hash)
+
+        # Ignore ops that are not before this one (nor executed on this host)
+        dependencies[op_hash] = op_dependencies.intersection(previous_op_hashes)
+
+    return dependencies
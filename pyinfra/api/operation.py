@@ -11,7 +11,7 @@ from functools import wraps
 from inspect import signature
 from io import StringIO
 from types import FunctionType
-from typing import Any, Callable, Generator, Iterator, Optional, cast
+from typing import Any, Callable, Generator, Iterator, Optional, Union, cast
 
 from typing_extensions import ParamSpec
 
@@ -24,7 +24,15 @@ from .arguments_typed import PyinfraOperation
 from .command import PyinfraCommand, StringCommand
 from .exceptions import OperationValueError, PyinfraError
 from .host import Host
+from .host_groups import add_equivalent_result, get_equivalent_result
+from .op_dependencies import get_operation_resources
 from .operations import run_host_op
+from .plan_store import (
+    check_operation_plan,
+    get_operation_checks,
+    get_operation_inputs_hash,
+    save_operation_plan,
+)
 from .state import State, StateOperationHostData, StateOperationMeta
 from .util import (
     get_call_location,
@@ -180,12 +188,22 @@ def operation(
     idempotent_notice: Optional[str] = None,
     is_deprecated: bool = False,
     deprecated_for: Optional[str] = None,
+    prefetch_facts: Optional[Union[list[tuple[type, dict]], Callable[..., list]]] = None,
+    local_inputs: Optional[Callable[..., list]] = None,
     _set_in_op: bool = True,
 ) -> Callable[[Callable[P, Generator]], PyinfraOperation[P]]:
     """
     Decorator that takes a simple module function and turn it into the internal
     operation representation that consists of a list of commands + options
     (sudo, (sudo|su)_user, env).
+
+    ``prefetch_facts`` declares the facts the operation will read, as a list of
+    ``(fact_cls, kwargs)`` or a function taking the operation arguments and returning
+    one. These are loaded in a single batch before the operation function runs.
+
+    ``local_inputs`` is a function taking the operation arguments and returning any local
+    values the commands depend on (ie rendered templates). These are included in the
+    fingerprint used by the plan cache & host equivalence grouping.
     """
 
     def decorator(f: Callable[P, Generator]) -> PyinfraOperation[P]:
@@ -193,6 +211,8 @@ def operation(
         f.idempotent_notice = idempotent_notice  # type: ignore[attr-defined]
         f.is_deprecated = is_deprecated  # type: ignore[attr-defined]
         f.deprecated_for = deprecated_for  # type: ignore[attr-defined]
+        f.prefetch_facts = prefetch_facts  # type: ignore[attr-defined]
+        f.local_inputs = local_inputs  # type: ignore[attr-defined]
         return _wrap_operation(f, _set_in_op=_set_in_op)
 
     return decorator
@@ -229,6 +249,8 @@ def _wrap_operation(func: Callable[P, Generator], _set_in_op: bool = True) -> Py
 
         # Ensure shared (between servers) operation meta, mutates state
         op_meta = ensure_shared_op_meta(state, op_hash, op_order, global_arguments, names)
+        op_meta.global_argument_keys.update(global_argument_keys)
+        op_meta.global_argument_keys.update(host.current_deploy_kwargs or {})
 
         # Attach normal args, if we're auto-naming this operation
         if add_args:
@@ -236,15 +258,8 @@ def _wrap_operation(func: Callable[P, Generator], _set_in_op: bool = True) -> Py
 
         # Check if we're actually running the operation on this host
         # Run once and we've already added meta for this op? Stop here.
-        if op_meta.global_arguments["_run_once"]:
-            has_run = False
-            for ops in state.ops.values():
-                if op_hash in ops:
-                    has_run = True
-                    break
-
-            if has_run:
-                return OperationMeta(op_hash, is_change=False)
+        if op_meta.global_arguments["_run_once"] and state.get_op_hosts(op_hash):
+            return OperationMeta(op_hash, is_change=False)
 
         # "Run" operation - here we make a generator that will yield out actual commands to execute
         # and, if we're diff-ing, we then iterate the generator now to determine if any changes
@@ -262,6 +277,12 @@ def _wrap_operation(func: Callable[P, Generator], _set_in_op: bool = True) -> Py
             host.current_op_global_arguments = global_arguments
 
             try:
+                prefetch_facts = getattr(func, "prefetch_facts", None)
+                if callable(prefetch_facts):
+                    prefetch_facts = prefetch_facts(*args, **kwargs)
+                if prefetch_facts:
+                    host.prefetch_facts(prefetch_facts)
+
                 for command in func(*args, **kwargs):
                     if isinstance(command, str):
                         command = StringCommand(command.strip())
@@ -272,11 +293,18 @@ def _wrap_operation(func: Callable[P, Generator], _set_in_op: bool = True) -> Py
                 host.current_op_global_arguments = None
 
         op_is_change = None
+        prepared_fact_hosts = None
         if state.should_check_for_changes():
-            op_is_change = False
-            for _ in command_generator():
-                op_is_change = True
-                break
+            op_is_change, prepared_fact_hosts = _check_for_changes(
+                state,
+                ctx_host.get(),
+                op_hash,
+                command_generator,
+                func,
+                args,
+                kwargs,
+                global_arguments,
+            )
         else:
             # If not calling the op function to check for change we still want to ensure the args
             # are valid, so use Signature.bind to trigger any TypeError.
@@ -293,8 +321,17 @@ def _wrap_operation(func: Callable[P, Generator], _set_in_op: bool = True) -> Py
         operation_meta = OperationMeta(op_hash, op_is_change)
 
         # Add the server-relevant commands
-        op_data = StateOperationHostData(command_generator, global_arguments, operation_meta)
-        state.set_op_data_for_host(host, op_hash, op_data)
+        op_data = StateOperationHostData(
+            command_generator,
+            global_arguments,
+            operation_meta,
+            prepared_fact_hosts=prepared_fact_hosts,
+        )
+        if state.config.CONCURRENT_OPS > 1:
+            op_data.resources = get_operation_resources(func, args, kwargs)
+        # Store the real host rather than the context proxy, which only resolves to this host
+        # while it is the current context host
+        state.set_op_data_for_host(ctx_host.get(), op_hash, op_data)
 
         # If we're already in the execution phase, execute this operation immediately
         if state.is_executing:
@@ -358,7 +395,7 @@ def solve_operation_consistency(names, state, host):
         op_hash = "{0}-{1}".format(op_hash, duplicate_op_count)
         duplicate_op_count += 1
 
-    host.op_hash_order.append(op_hash)
+    state.add_op_hash_for_host(host, op_hash)
     if duplicate_op_count:
         op_order.append(duplicate_op_count)
 
@@ -392,6 +429,61 @@ def ensure_shared_op_meta(
     return op_meta
 
 
+def _check_for_changes(
+    state: State,
+    host: Host,
+    op_hash: str,
+    command_generator: Callable[[], Iterator[PyinfraCommand]],
+    func: Callable,
+    args,
+    kwargs,
+    global_arguments: AllArguments,
+) -> tuple[bool, Optional[dict[Host, int]]]:
+    """
+    Check whether an operation will yield any commands on a host. For ops that don't, also
+    returns the hosts whose facts were read (see ``StateOperationHostData``).
+    """
+
+    inputs_hash = None
+    if state.plan_store or state.config.GROUP_EQUIVALENT_HOSTS:
+        inputs_hash = get_operation_inputs_hash(state, func, args, kwargs, global_arguments)
+
+    if inputs_hash and state.plan_store:
+        if check_operation_plan(state, host, op_hash, inputs_hash, global_arguments):
+            logger.debug("Operation %s unchanged since last run on %s", op_hash, host)
+            return False, {host: host.executed_command_count}
+
+    if inputs_hash and state.config.GROUP_EQUIVALENT_HOSTS:
+        is_change = get_equivalent_result(state, host, op_hash, inputs_hash, global_arguments)
+        if is_change is not None:
+            logger.debug("Operation %s checked on an equivalent host to %s", op_hash, host)
+            return is_change, None if is_change else {host: host.executed_command_count}
+
+    is_change = False
+    op_facts: list[tuple] = []
+    data_reads: list[tuple] = []
+    host.current_op_facts = op_facts
+    host.current_op_data_reads = data_reads
+    try:
+        for _ in command_generator():
+            is_change = True
+            break
+    finally:
+        host.current_op_facts = None
+        host.current_op_data_reads = None
+
+    if inputs_hash:
+        checks = get_operation_checks(host, op_facts, data_reads)
+        if state.config.GROUP_EQUIVALENT_HOSTS:
+            add_equivalent_result(state, op_hash, inputs_hash, checks, is_change)
+        if state.plan_store and not is_change:
+            save_operation_plan(state, host, op_hash, inputs_hash, checks)
+
+    if is_change:
+        return True, None
+    return False, {fact_host: fact_host.executed_command_count for fact_host, *_ in op_facts}
+
+
 def execute_immediately(state, host, op_hash):
     op_meta = state.get_op_meta(op_hash)
     op_data = state.get_op_data_for_host(host, op_hash)
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
 import traceback
+from contextlib import contextmanager
 from itertools import product
 from socket import error as socket_error, timeout as timeout_error
-from typing import TYPE_CHECKING, Optional, cast
+from typing import TYPE_CHECKING, Generator, Iterable, Optional, cast
 
 import click
 import gevent
+from gevent.lock import RLock
 from paramiko import SSHException
 
 from pyinfra import logger
@@ -16,10 +18,14 @@ from pyinfra.progress import progress_spinner
 
 from .arguments import CONNECTOR_ARGUMENT_KEYS, ConnectorArguments
 from .command import FunctionCommand, PyinfraCommand, StringCommand
+from .command_pipeline import CommandPipeline, iter_command_batches
+from .concurrency import EXECUTE_STAGE
 from .exceptions import PyinfraError
+from .op_dependencies import get_host_op_dependencies
 from .util import (
     format_exception,
     log_error_or_warning,
+    log_fail_fast,
     log_host_command_error,
     log_operation_start,
     print_host_combined_output,
@@ -27,23 +33,32 @@ from .util import (
 
 if TYPE_CHECKING:
     from .inventory import Host
-    from .state import State
+    from .state import State, StateOperationHostData
 
 
 # Run a single host operation
 #
 
 
-def run_host_op(state: "State", host: "Host", op_hash: str) -> Optional[bool]:
+def run_host_op(
+    state: "State",
+    host: "Host",
+    op_hash: str,
+    concurrent: bool = False,
+) -> Optional[bool]:
     state.trigger_callbacks("operation_host_start", host, op_hash)
 
-    if op_hash not in state.ops[host]:
+    if host not in state.get_op_hosts(op_hash):
         logger.info("{0}{1}".format(host.print_prefix, click.style("Skipped", "blue")))
         return True
 
     op_meta = state.get_op_meta(op_hash)
     logger.debug("Starting operation %r on %s", op_meta.names, host)
 
+    # Concurrent ops only set the executing op while holding the host lock
+    if concurrent:
+        return _run_host_op(state, host, op_hash, concurrent=True)
+
     if host.executing_op_hash is None:
         host.executing_op_hash = op_hash
     else:
@@ -58,7 +73,195 @@ def run_host_op(state: "State", host: "Host", op_hash: str) -> Optional[bool]:
             host.executing_op_hash = None
 
 
-def _run_host_op(state: "State", host: "Host", op_hash: str) -> Optional[bool]:
+def _get_op_commands(op_data: "StateOperationHostData") -> Iterable[PyinfraCommand]:
+    """
+    Ops that yielded no commands when prepared are still no-ops if no commands have been
+    executed since on the hosts whose facts they read, so skip generating them again.
+    """
+
+    fact_hosts = op_data.prepared_fact_hosts
+    if fact_hosts is not None and all(
+        fact_host.executed_command_count == count for fact_host, count in fact_hosts.items()
+    ):
+        return []
+    return op_data.command_generator()
+
+
+@contextmanager
+def _lock_host_op(host: "Host", op_hash: str, lock: bool = True):
+    """
+    Concurrent ops on the same host (see ``_run_concurrent_host_ops``) run the op function and
+    Python callbacks holding the host lock, with this op set as the executing op.
+    """
+
+    if not lock:
+        yield
+        return
+
+    assert host.concurrent_op_lock is not None
+    with host.concurrent_op_lock:
+        executing_op_hash = host.executing_op_hash
+        host.executing_op_hash = op_hash
+        try:
+            yield
+        finally:
+            host.executing_op_hash = executing_op_hash
+
+
+def _iter_locked_op_commands(
+    host: "Host",
+    op_hash: str,
+    commands: Iterable[PyinfraCommand],
+) -> Generator[PyinfraCommand, None, None]:
+    """
+    Advance the op command generator holding the host lock, restoring the op context (used by
+    any facts the op reads) it had the last time it was advanced.
+    """
+
+    commands_iter = iter(commands)
+    op_context: tuple = (False, None, None)
+
+    def swap_op_context(new_op_context: tuple) -> tuple:
+        old_op_context = (host.in_op, host.current_op_hash, host.current_op_global_arguments)
+        host.in_op, host.current_op_hash, host.current_op_global_arguments = new_op_context
+        return old_op_context
+
+    try:
+        while True:
+            with _lock_host_op(host, op_hash):
+                swap_op_context(op_context)
+                try:
+                    command = next(commands_iter, None)
+                finally:
+                    op_context = swap_op_context((False, None, None))
+
+            if command is None:
+                return
+            yield command
+    finally:
+        # Stop the op function now, rather than when garbage collected outside of the lock
+        close = getattr(commands_iter, "close", None)
+        if close:
+            with _lock_host_op(host, op_hash):
+                swap_op_context(op_context)
+                try:
+                    close()
+                finally:
+                    swap_op_context((False, None, None))
+
+
+def _execute_command(
+    state: "State",
+    host: "Host",
+    command: PyinfraCommand,
+    base_connector_arguments: ConnectorArguments,
+    all_combined_output_lines: list[OutputLine],
+    timeout: int,
+) -> bool:
+    status = False
+
+    connector_arguments = base_connector_arguments.copy()
+    connector_arguments.update(command.connector_arguments)
+
+    if not isinstance(command, PyinfraCommand):
+        raise TypeError("{0} is an invalid pyinfra command!".format(command))
+
+    if isinstance(command, FunctionCommand):
+        try:
+            status = command.execute(state, host, connector_arguments)
+        except Exception as e:
+            # Custom functions could do anything, so expect anything!
+            logger.warning(traceback.format_exc())
+            host.log_styled(
+                f"Unexpected error in Python callback: {format_exception(e)}",
+                fg="red",
+                log_func=logger.warning,
+            )
+
+    elif isinstance(command, StringCommand):
+        combined_output_lines = CommandOutput([])
+        try:
+            status, combined_output_lines = command.execute(
+                state,
+                host,
+                connector_arguments,
+            )
+        except (timeout_error, socket_error, SSHException) as e:
+            log_host_command_error(host, e, timeout=timeout)
+        all_combined_output_lines.extend(combined_output_lines)
+        # If we failed and have not already printed the stderr, print it
+        if status is False and not state.print_output:
+            print_host_combined_output(host, combined_output_lines)
+
+    else:
+        try:
+            status = command.execute(state, host, connector_arguments)
+        except (timeout_error, socket_error, SSHException, IOError) as e:
+            log_host_command_error(host, e, timeout=timeout)
+
+    return status
+
+
+def _execute_pipelined_commands(
+    state: "State",
+    host: "Host",
+    commands: list[StringCommand],
+    base_connector_arguments: ConnectorArguments,
+    all_combined_output_lines: list[OutputLine],
+    timeout: int,
+    continue_on_error: bool,
+) -> list[bool]:
+    """
+    Execute shell commands as a single script, returning the status of each command executed.
+    """
+
+    connector_arguments = base_connector_arguments.copy()
+    connector_arguments.update(commands[0].connector_arguments)
+
+    pipeline = CommandPipeline(
+        commands,
+        success_exit_codes=connector_arguments.get("_success_exit_codes"),
+        continue_on_error=continue_on_error,
+    )
+
+    combined_output_lines = CommandOutput([])
+    try:
+        # Output is printed below, once the script markers are removed
+        _, combined_output_lines = host.run_shell_command(
+            pipeline.command,
+            print_output=False,
+            print_input=state.print_input,
+            **connector_arguments,
+        )
+    except (timeout_error, socket_error, SSHException) as e:
+        log_host_command_error(host, e, timeout=timeout)
+
+    statuses = []
+
+    for status, command_output in pipeline.get_results(combined_output_lines):
+        all_combined_output_lines.extend(command_output)
+
+        if state.print_output:
+            for line in command_output:
+                output_line = line.line
+                if line.buffer_name == "stderr":
+                    output_line = click.style(output_line, "red")
+                click.echo(f"{host.print_prefix}{output_line}", err=True)
+        # If we failed and have not already printed the stderr, print it
+        elif status is False:
+            print_host_combined_output(host, command_output)
+
+        statuses.append(status)
+
+    return statuses
+
+
+def _run_host_op(
+    state: "State",
+    host: "Host",
+    op_hash: str,
+    concurrent: bool = False,
+) -> Optional[bool]:
     op_data = state.get_op_data_for_host(host, op_hash)
     global_arguments = op_data.global_arguments
 
@@ -74,69 +277,92 @@ def _run_host_op(state: "State", host: "Host", op_hash: str) -> Optional[bool]:
     )
 
     did_error = False
+    did_cancel = False
     executed_commands = 0
     commands = []
     all_combined_output_lines: list[OutputLine] = []
 
-    for command in op_data.command_generator():
-        commands.append(command)
-
-        status = False
-
-        connector_arguments = base_connector_arguments.copy()
-        connector_arguments.update(command.connector_arguments)
+    op_commands = _get_op_commands(op_data)
+    if concurrent:
+        op_commands = _iter_locked_op_commands(host, op_hash, op_commands)
 
-        if not isinstance(command, PyinfraCommand):
-            raise TypeError("{0} is an invalid pyinfra command!".format(command))
+    if state.config.PIPELINE_COMMANDS:
+        command_batches = iter_command_batches(op_commands, base_connector_arguments)
+    else:
+        command_batches = ([command] for command in op_commands)
 
-        if isinstance(command, FunctionCommand):
-            try:
-                status = command.execute(state, host, connector_arguments)
-            except Exception as e:
-                # Custom functions could do anything, so expect anything!
-                logger.warning(traceback.format_exc())
-                host.log_styled(
-                    f"Unexpected error in Python callback: {format_exception(e)}",
-                    fg="red",
-                    log_func=logger.warning,
-                )
+    for command_batch in command_batches:
+        # Cancel at this point between commands once failing fast, see State.check_fail_fast
+        if state.failing_fast and state.config.FAIL_FAST_CANCEL:
+            did_cancel = True
+            break
 
-        elif isinstance(command, StringCommand):
-            combined_output_lines = CommandOutput([])
-            try:
-                status, combined_output_lines = command.execute(
+        if len(command_batch) > 1:
+            statuses = _execute_pipelined_commands(
+                state,
+                host,
+                cast(list[StringCommand], command_batch),
+                base_connector_arguments,
+                all_combined_output_lines,
+                timeout,
+                continue_on_error,
+            )
+        else:
+            command = command_batch[0]
+            lock = concurrent and isinstance(command, FunctionCommand)
+            with _lock_host_op(host, op_hash, lock=lock):
+                status = _execute_command(
                     state,
                     host,
-                    connector_arguments,
+                    command,
+                    base_connector_arguments,
+                    all_combined_output_lines,
+                    timeout,
                 )
-            except (timeout_error, socket_error, SSHException) as e:
-                log_host_command_error(host, e, timeout=timeout)
-            all_combined_output_lines.extend(combined_output_lines)
-            # If we failed and have not already printed the stderr, print it
-            if status is False and not state.print_output:
-                print_host_combined_output(host, combined_output_lines)
+            statuses = [status]
 
-        else:
-            try:
-                status = command.execute(state, host, connector_arguments)
-            except (timeout_error, socket_error, SSHException, IOError) as e:
-                log_host_command_error(host, e, timeout=timeout)
+        commands.extend(command_batch[: len(statuses)])
+
+        for status in statuses:
+            # Any executed command may have changed the remote state, so flush cached facts
+            # before the generator continues (and potentially reads facts again).
+            host.reset_fact_cache()
+            host.executed_command_count += 1
+
+            if status is False:
+                did_error = True
+            else:
+                executed_commands += 1
 
         # Break the loop to trigger a failure
-        if status is False:
-            did_error = True
-            if continue_on_error is True:
-                continue
+        if did_error and continue_on_error is not True:
             break
 
-        executed_commands += 1
+    if isinstance(op_commands, Generator):
+        op_commands.close()
 
     # Handle results
     #
 
-    op_success = return_status = not did_error
     host_results = state.get_results_for_host(host)
 
+    if did_cancel:
+        if executed_commands:
+            host_results.partial_ops += 1
+
+        logger.warning(
+            "{0}{1} after {2} commands".format(
+                host.print_prefix,
+                click.style("Cancelled", "yellow"),
+                executed_commands,
+            ),
+        )
+        state.interrupted_hosts.add(host)
+        op_data.operation_meta.set_complete(False, commands, all_combined_output_lines)
+        return False
+
+    op_success = return_status = not did_error
+
     if did_error is False:
         host_results.ops += 1
         host_results.success_ops += 1
@@ -184,14 +410,90 @@ def _run_host_op_with_context(state: "State", host: "Host", op_hash: str):
         return run_host_op(state, host, op_hash)
 
 
+def _run_concurrent_host_ops(state: "State", host: "Host", progress=None):
+    """
+    Run all ops for a single server, executing up to ``Config.CONCURRENT_OPS`` ops at once
+    once the ops they depend on have completed.
+    """
+
+    op_order = state.get_op_order()
+    dependencies = get_host_op_dependencies(state, host, op_order)
+
+    host.concurrent_op_lock = RLock()
+
+    # Spawned outside of the state pool, which is already used by the host greenlets
+    running: dict[gevent.Greenlet, str] = {}
+    pending_op_hashes = list(op_order)
+    complete_op_hashes: set[str] = set()
+    failed_op_hash: Optional[str] = None
+
+    def run_op(op_hash: str):
+        with ctx_host.use(host):
+            return run_host_op(state, host, op_hash, concurrent=True)
+
+    def complete_greenlet(greenlet: gevent.Greenlet) -> None:
+        nonlocal failed_op_hash
+
+        op_hash = running.pop(greenlet)
+        complete_op_hashes.add(op_hash)
+
+        # Trigger CLI progress if provided
+        if progress:
+            progress((host, op_hash))
+
+        if greenlet.get() is False and failed_op_hash is None:
+            failed_op_hash = op_hash
+
+    try:
+        while pending_op_hashes or running:
+            if state.failing_fast and pending_op_hashes:
+                state.cancelled_hosts.add(host)
+                pending_op_hashes = []
+
+            # Stop scheduling ops after any failure and wait for the running ones
+            if failed_op_hash is None:
+                for op_hash in list(pending_op_hashes):
+                    if len(running) >= state.config.CONCURRENT_OPS:
+                        break
+                    if not dependencies[op_hash].issubset(complete_op_hashes):
+                        continue
+
+                    pending_op_hashes.remove(op_hash)
+                    log_operation_start(state.get_op_meta(op_hash))
+                    running[gevent.spawn(run_op, op_hash)] = op_hash
+
+            if not running:
+                break
+
+            for greenlet in gevent.wait(list(running.keys()), count=1):
+                complete_greenlet(cast(gevent.Greenlet, greenlet))
+    finally:
+        host.concurrent_op_lock = None
+
+    if failed_op_hash is not None:
+        raise PyinfraError(
+            "Error in operation {0} on {1}".format(
+                ", ".join(state.get_op_meta(failed_op_hash).names),
+                host,
+            ),
+        )
+
+
 def _run_host_ops(state: "State", host: "Host", progress=None):
     """
     Run all ops for a single server.
     """
 
+    if state.config.CONCURRENT_OPS > 1:
+        return _run_concurrent_host_ops(state, host, progress=progress)
+
     logger.debug("Running all ops on %s", host)
 
     for op_hash in state.get_op_order():
+        if state.failing_fast:
+            state.cancelled_hosts.add(host)
+            return
+
         op_meta = state.get_op_meta(op_hash)
         log_operation_start(op_meta)
 
@@ -215,7 +517,9 @@ def _run_serial_ops(state: "State"):
     Run all ops for all servers, one server at a time.
     """
 
-    for host in list(state.inventory.iter_active_hosts()):
+    hosts = list(state.inventory.iter_active_hosts())
+
+    for i, host in enumerate(hosts):
         host_operations = product([host], state.get_op_order())
         with progress_spinner(host_operations) as progress:
             try:
@@ -225,6 +529,9 @@ def _run_serial_ops(state: "State"):
                     progress=progress,
                 )
             except PyinfraError:
+                if state.check_fail_fast({host}, []):
+                    state.cancelled_hosts.update(hosts[i + 1 :])
+                    log_fail_fast(state)
                 state.fail_hosts({host})
 
 
@@ -233,24 +540,44 @@ def _run_no_wait_ops(state: "State"):
     Run all ops for all servers at once.
     """
 
+    failed_hosts = set()
+
     hosts_operations = product(state.inventory.iter_active_hosts(), state.get_op_order())
     with progress_spinner(hosts_operations) as progress:
         # Spawn greenlet for each host to run *all* ops
         if state.pool is None:
             raise PyinfraError("No pool found on state.")
-        greenlets = [
-            state.pool.spawn(
-                _run_host_ops,
-                state,
-                host,
-                progress=progress,
-            )
-            for host in state.inventory.iter_active_hosts()
-        ]
-        gevent.joinall(greenlets)
+        with state.pool.use_stage(EXECUTE_STAGE):
+            greenlet_to_host = {
+                state.pool.spawn(
+                    _run_host_ops,
+                    state,
+                    host,
+                    progress=progress,
+                ): host
+                for host in state.inventory.iter_active_hosts()
+            }
+
+            running_hosts = set(greenlet_to_host.values())
+
+            for greenlet in gevent.iwait(list(greenlet_to_host.keys())):
+                host = greenlet_to_host[greenlet]
+                running_hosts.discard(host)
+
+                try:
+                    greenlet.get()
+                except PyinfraError:
+                    failed_hosts.add(host)
+                    state.check_fail_fast(failed_hosts, running_hosts)
+
+    if state.failing_fast:
+        log_fail_fast(state)
+
+    # Now all the hosts are complete, fail any failures
+    state.fail_hosts(failed_hosts)
 
 
-def _run_single_op(state: "State", op_hash: str):
+def _run_single_op(state: "State", op_hash: str, log_start: bool = True):
     """
     Run a single operation for all servers. Can be configured to run in serial.
     """
@@ -258,51 +585,72 @@ def _run_single_op(state: "State", op_hash: str):
     state.trigger_callbacks("operation_start", op_hash)
 
     op_meta = state.get_op_meta(op_hash)
-    log_operation_start(op_meta)
+    if log_start:
+        log_operation_start(op_meta)
 
     failed_hosts = set()
 
     if op_meta.global_arguments["_serial"]:
-        with progress_spinner(state.inventory.iter_active_hosts()) as progress:
+        hosts = list(state.inventory.iter_active_hosts())
+
+        with progress_spinner(hosts) as progress:
             # For each host, run the op
-            for host in state.inventory.iter_active_hosts():
+            for i, host in enumerate(hosts):
                 result = _run_host_op_with_context(state, host, op_hash)
                 progress(host)
 
                 if not result:
                     failed_hosts.add(host)
+                    if state.check_fail_fast(failed_hosts, []):
+                        state.cancelled_hosts.update(hosts[i + 1 :])
+                        break
 
     else:
-        # Start with the whole inventory in one batch
-        batches = [list(state.inventory.iter_active_hosts())]
-
-        # If parallel set break up the inventory into a series of batches
-        parallel = op_meta.global_arguments["_parallel"]
-        if parallel:
-            hosts = list(state.inventory.iter_active_hosts())
-            batches = [hosts[i : i + parallel] for i in range(0, len(hosts), parallel)]
-
-        for batch in batches:
-            with progress_spinner(batch) as progress:
-                # Spawn greenlet for each host
-                if state.pool is None:
-                    raise PyinfraError("No pool found on state.")
-                greenlet_to_host = {
-                    state.pool.spawn(_run_host_op_with_context, state, host, op_hash): host
-                    for host in batch
-                }
-
-                # Trigger CLI progress as hosts complete if provided
-                for greenlet in gevent.iwait(greenlet_to_host.keys()):
-                    host = greenlet_to_host[greenlet]
+        hosts = list(state.inventory.iter_active_hosts())
+
+        # If parallel set only run the op on this many hosts at once, starting the next host
+        # as soon as any completes.
+        parallel = op_meta.global_arguments["_parallel"] or len(hosts)
+
+        with progress_spinner(hosts) as progress:
+            if state.pool is None:
+                raise PyinfraError("No pool found on state.")
+
+            greenlet_to_host: dict[gevent.Greenlet, "Host"] = {}
+
+            def complete_greenlets(greenlets: Iterable[gevent.Greenlet]) -> None:
+                for greenlet in greenlets:
+                    host = greenlet_to_host.pop(greenlet)
+                    # Trigger CLI progress as hosts complete if provided
                     progress(host)
 
-                # Get all the results
-                for greenlet, host in greenlet_to_host.items():
                     if not greenlet.get():
                         failed_hosts.add(host)
+                        state.check_fail_fast(failed_hosts, greenlet_to_host.values())
+
+            with state.pool.use_stage(EXECUTE_STAGE):
+                for i, host in enumerate(hosts):
+                    # Wait for a host to complete, checking for failures, before the next
+                    while greenlet_to_host and (
+                        len(greenlet_to_host) >= parallel or state.pool.full()
+                    ):
+                        complete_greenlets(gevent.wait(list(greenlet_to_host.keys()), count=1))
+
+                    # Stop starting hosts once failing fast, see State.check_fail_fast
+                    if state.failing_fast:
+                        state.cancelled_hosts.update(hosts[i:])
+                        break
+
+                    # Spawn greenlet for each host
+                    greenlet = state.pool.spawn(_run_host_op_with_context, state, host, op_hash)
+                    greenlet_to_host[greenlet] = host
+
+                complete_greenlets(gevent.iwait(list(greenlet_to_host.keys())))
+
+    if state.failing_fast:
+        log_fail_fast(state)
 
-    # Now all the batches/hosts are complete, fail any failures
+    # Now all the hosts are complete, fail any failures
     state.fail_hosts(failed_hosts)
 
     state.trigger_callbacks("operation_end", op_hash)
@@ -325,8 +673,9 @@ def run_ops(state: "State", serial: bool = False, no_wait: bool = False):
         # Run all ops, but server by server
         if serial:
             _run_serial_ops(state)
-        # Run all the ops on each server in parallel (not waiting at each operation)
-        elif no_wait:
+        # Run all the ops on each server in parallel (not waiting at each operation), concurrent
+        # ops on a host also imply not waiting for other hosts.
+        elif no_wait or state.config.CONCURRENT_OPS > 1:
             _run_no_wait_ops(state)
         # Default: run all ops in order, waiting at each for all servers to complete
         else:
@@ -0,0 +1,318 @@
+"""
+Persistent, file based storage of operation fingerprints used for incremental deploys, see
+``Config.PLAN_CACHE``.
+
+When an operation makes no changes on a host a fingerprint of its inputs (the operation
+arguments, the local ``src`` file and any ``local_inputs``, ie rendered templates) is stored
+along with the facts & host data it read. On the next run an operation with the same
+fingerprint is skipped without calling the operation function, as long as the facts & data
+it read are unchanged. The facts for all of a host's stored operations are revalidated
+together, in a single batched command.
+"""
+
+from __future__ import annotations
+
+import pickle
+import sqlite3
+from importlib import import_module
+from inspect import signature
+from os import makedirs, path
+from time import time
+from typing import TYPE_CHECKING, Callable, Optional
+
+from pyinfra import __version__, logger
+
+from .util import get_file_path, get_file_sha1, sha1_hash
+
+# Stands in for host data keys that are not set
+MISSING_DATA = "_PYINFRA_MISSING_DATA"
+
+if TYPE_CHECKING:
+    from .arguments import AllArguments
+    from .host import Host
+    from .state import State
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    host TEXT NOT NULL,
+    op_hash TEXT NOT NULL,
+    created REAL NOT NULL,
+    inputs_hash TEXT NOT NULL,
+    checks BLOB NOT NULL,
+    PRIMARY KEY (host, op_hash)
+)
+"""
+
+
+class PlanStore:
+    """
+    Stores operation fingerprints in an SQLite database file.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+        dirname = path.dirname(filename)
+        if dirname:
+            makedirs(dirname, exist_ok=True)
+
+        # Autocommit, this is a cache so we trade durability for speed
+        self.connection = sqlite3.connect(filename, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute(SCHEMA)
+
+        # Stored plans by host name, loaded on first use
+        self.host_plans: dict[str, dict[str, tuple[str, tuple[list, dict]]]] = {}
+        # Hosts whose stored plan facts have been loaded
+        self.revalidated_host_names: set[str] = set()
+
+    def get_host_plans(self, host_name: str) -> dict[str, tuple[str, tuple[list, dict]]]:
+        """
+        Returns a dict of op hash -> ``(inputs_hash, (facts, data))`` stored for this host.
+        """
+
+        if host_name not in self.host_plans:
+            plans = {}
+
+            for op_hash, inputs_hash, checks in self.connection.execute(
+                "SELECT op_hash, inputs_hash, checks FROM plans WHERE host = ?",
+                (host_name,),
+            ):
+                try:
+                    plans[op_hash] = (inputs_hash, pickle.loads(checks))
+                except Exception as e:
+                    logger.debug(
+                        "Ignoring unreadable stored plan %s on %s: %s",
+                        op_hash,
+                        host_name,
+                        e,
+                    )
+
+            self.host_plans[host_name] = plans
+
+        return self.host_plans[host_name]
+
+    def set(self, host_name: str, op_hash: str, inputs_hash: str, checks: tuple) -> None:
+        try:
+            pickled_checks = pickle.dumps(checks)
+        except Exception as e:
+            logger.debug("Cannot store plan %s on %s: %s", op_hash, host_name, e)
+            return
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?)",
+            (host_name, op_hash, time(), inputs_hash, pickled_checks),
+        )
+
+    def delete(self, host_name: str, op_hash: str) -> None:
+        self.connection.execute(
+            "DELETE FROM plans WHERE host = ? AND op_hash = ?",
+            (host_name, op_hash),
+        )
+
+    def clear(self) -> None:
+        self.connection.execute("DELETE FROM plans")
+        self.host_plans = {}
+        self.revalidated_host_names = set()
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def _get_local_inputs(state: "State", func: Callable, args: tuple, kwargs: dict) -> Optional[list]:
+    get_local_inputs = getattr(func, "local_inputs", None)
+    if get_local_inputs:
+        return get_local_inputs(*args, **kwargs)
+
+    # By default only the local source file (ie files.put, server.script) is fingerprinted
+    src = signature(func).bind_partial(*args, **kwargs).arguments.get("src")
+    if not isinstance(src, str):
+        return []
+
+    filename = get_file_path(state, src) if state.cwd else src
+    # Local directory contents are not fingerprinted (ie files.sync)
+    if path.isdir(filename):
+        return None
+    if path.isfile(filename):
+        return [get_file_sha1(filename)]
+    return []
+
+
+def get_operation_inputs_hash(
+    state: "State",
+    func: Callable,
+    args: tuple,
+    kwargs: dict,
+    global_arguments: "AllArguments",
+) -> Optional[str]:
+    """
+    Returns a hash of the operation function, its arguments and local inputs (the ``src`` file
+    or the operation ``local_inputs``), or ``None`` if the operation cannot be fingerprinted.
+    The pyinfra version is included as operation logic may change between versions.
+    """
+
+    try:
+        local_inputs = _get_local_inputs(state, func, args, kwargs)
+    except Exception as e:
+        # Leave any errors to the operation function
+        logger.debug("Cannot fingerprint operation inputs: %s", e)
+        return None
+
+    if local_inputs is None:
+        return None
+
+    # Unlike ``make_hash`` this must differentiate between boolean/None arguments. Objects
+    # without a stable repr (functions, IO objects) never match a previous run. The op hash
+    # only identifies the position of the operation, so include the function called.
+    return sha1_hash(
+        repr(
+            (
+                __version__,
+                func.__module__,
+                func.__qualname__,
+                args,
+                sorted(kwargs.items()),
+                global_arguments,
+                local_inputs,
+            ),
+        ),
+    )
+
+
+def _get_fact_cls(fact_name: str):
+    module_name, _, cls_name = fact_name.rpartition(".")
+    try:
+        return getattr(import_module(module_name), cls_name)
+    except (ImportError, AttributeError):
+        return None
+
+
+def _make_fact_name(cls) -> str:
+    return f"{cls.__module__}.{cls.__name__}"
+
+
+def get_operation_checks(
+    host: "Host",
+    facts: list,
+    data_reads: list,
+) -> Optional[tuple[list, dict]]:
+    """
+    Returns the ``(facts, data)`` an operation read on this host that can be checked again
+    with ``check_operation_checks``, or ``None`` if the operation read anything that cannot
+    (other hosts' facts or data, positional fact arguments).
+
+    Args:
+        host (``pyinfra.api.Host`` obj): the host the operation was generated for
+        facts (list): ``(fact_host, fact_cls, args, kwargs, data)`` facts the op read
+        data_reads (list): ``(data_host, key, value)`` host data the op read
+    """
+
+    plan_facts = {}
+    for fact_host, cls, fact_args, fact_kwargs, data in facts:
+        fact_name = _make_fact_name(cls)
+        if fact_host is not host or fact_args or _get_fact_cls(fact_name) is not cls:
+            return None
+
+        fact_kwargs = fact_kwargs or {}
+        plan_facts[(fact_name, repr(fact_kwargs))] = (fact_name, fact_kwargs, data)
+
+    plan_data = {}
+    for data_host, key, value in data_reads:
+        if data_host is not host:
+            return None
+        plan_data[key] = value
+
+    return list(plan_facts.values()), plan_data
+
+
+def check_operation_checks(
+    host: "Host",
+    checks: tuple[list, dict],
+    global_arguments: "AllArguments",
+) -> bool:
+    """
+    Returns whether the facts & data from ``get_operation_checks`` are unchanged on this host.
+    """
+
+    plan_facts, plan_data = checks
+
+    for key, value in plan_data.items():
+        # A None key is a read of all the host data (``HostData.dict``)
+        current_value = host.data.dict() if key is None else host.data.get(key, MISSING_DATA)
+        if current_value != value:
+            return False
+
+    facts = [(_get_fact_cls(fact_name), fact_kwargs) for fact_name, fact_kwargs, _ in plan_facts]
+    if any(cls is None for cls, _ in facts):
+        return False
+
+    # Facts are read with the operation arguments (ie _sudo), as when the op function runs
+    host.current_op_global_arguments = global_arguments
+    try:
+        # Load any uncached facts in a single command
+        if len(facts) > 1:
+            host.prefetch_facts(facts)
+
+        for (cls, fact_kwargs), (_, _, data) in zip(facts, plan_facts):
+            if host.get_fact(cls, **fact_kwargs) != data:
+                return False
+    finally:
+        host.current_op_global_arguments = None
+
+    return True
+
+
+def check_operation_plan(
+    state: "State",
+    host: "Host",
+    op_hash: str,
+    inputs_hash: str,
+    global_arguments: "AllArguments",
+) -> bool:
+    """
+    Returns whether an operation with these inputs previously made no changes on this host and
+    the facts & host data it read are unchanged.
+    """
+
+    assert state.plan_store is not None
+    plans = state.plan_store.get_host_plans(host.name)
+
+    # Revalidate the facts for every stored operation on this host at once
+    if host.name not in state.plan_store.revalidated_host_names:
+        state.plan_store.revalidated_host_names.add(host.name)
+        facts = {}
+        for _, (plan_facts, _) in plans.values():
+            for fact_name, fact_kwargs, _ in plan_facts:
+                cls = _get_fact_cls(fact_name)
+                if cls:
+                    facts[(fact_name, repr(fact_kwargs))] = (cls, fact_kwargs)
+        if facts:
+            host.prefetch_facts(list(facts.values()))
+
+    plan = plans.get(op_hash)
+    if plan is None or plan[0] != inputs_hash:
+        return False
+
+    return check_operation_checks(host, plan[1], global_arguments)
+
+
+def save_operation_plan(
+    state: "State",
+    host: "Host",
+    op_hash: str,
+    inputs_hash: str,
+    checks: Optional[tuple[list, dict]],
+) -> None:
+    """
+    Store the fingerprint of an operation that made no changes on this host, along with the
+    checks from ``get_operation_checks``.
+    """
+
+    assert state.plan_store is not None
+
+    if checks is None:
+        state.plan_store.delete(host.name, op_hash)
+    else:
+        state.plan_store.set(host.name, op_hash, inputs_hash, checks)
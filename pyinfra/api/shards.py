@@ -0,0 +1,496 @@
+"""
+Sharded deploys split the inventory across several worker processes, each with its own gevent
+loop & connections. Connecting to hosts and preparing operations is CPU bound once there are
+thousands of hosts, so spreading this over processes uses more than one core.
+
+Operation command generators are closures over the deploy code and cannot be sent between
+processes, so each worker also executes the operations for its own hosts. The parent process
+holds the merged operation order & metadata and tells the workers which operation to run next,
+so the execution order is the same as a single process deploy.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import pickle
+import traceback
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from pyinfra import logger
+from pyinfra.context import ctx_state
+
+from .exceptions import OperationValueError, PyinfraError
+from .fact_store import FactStore
+from .operation import OperationMeta
+from .operations import _run_host_ops, _run_no_wait_ops, _run_single_op
+from .plan_store import PlanStore
+from .state import StateOperationHostData, StateOperationMeta
+from .util import log_operation_start
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+    from multiprocessing.process import BaseProcess
+
+    from .inventory import Host
+    from .state import State
+
+
+RESULT_KEYS = ("ops", "success_ops", "error_ops", "ignored_error_ops", "partial_ops")
+
+
+class Shard:
+    """
+    A worker process and the hosts it connects to, prepares & executes operations for.
+    """
+
+    def __init__(self, hosts: list["Host"], process: "BaseProcess", connection: "Connection"):
+        self.hosts = hosts
+        self.process = process
+        self.connection = connection
+        # Op hashes this shard has prepared, populated from the worker summary
+        self.op_hashes: set[str] = set()
+        # Set once the worker has errored or exited & closed its end of the connection
+        self.exited = False
+
+    def send(self, command: str, *args) -> None:
+        self.connection.send((command, args))
+
+    def receive(self) -> Any:
+        try:
+            status, data = self.connection.recv()
+        except EOFError:
+            self.exited = True
+            raise PyinfraError(f"Shard process {self.process.pid} exited unexpectedly")
+
+        if status == "error":
+            self.exited = True
+            raise PyinfraError(f"Error in shard process {self.process.pid}:\n{data}")
+        return data
+
+    def close(self) -> None:
+        if not self.exited and self.process.is_alive():
+            try:
+                self.send("exit")
+                self.receive()
+            except (OSError, PyinfraError):
+                pass
+        self.process.join()
+        self.connection.close()
+
+
+def _picklable(value):
+    try:
+        pickle.dumps(value)
+    except Exception:
+        return repr(value)
+    return value
+
+
+def _get_summary(state: "State", hosts: list["Host"]) -> dict:
+    summary: dict[str, Any] = {
+        "activated_hosts": [host.name for host in hosts if host in state.activated_hosts],
+        "failed_hosts": [host.name for host in hosts if host in state.failed_hosts],
+        "hosts": {},
+        "op_meta": {},
+    }
+
+    for host in hosts:
+        host_meta = state.get_meta_for_host(host)
+        summary["hosts"][host.name] = {
+            "op_hash_order": host.op_hash_order,
+            "ops": [
+                (
+                    op_hash,
+                    op_data.operation_meta._maybe_is_change,
+                    {key: _picklable(value) for key, value in op_data.global_arguments.items()},
+                    op_data.parent_op_hash,
+                )
+                for op_hash, op_data in state.ops[host].items()
+            ],
+            "meta": (host_meta.ops, host_meta.ops_change, host_meta.ops_no_change),
+        }
+
+    for op_hash, op_meta in state.op_meta.items():
+        summary["op_meta"][op_hash] = (
+            op_meta.op_order,
+            op_meta.names,
+            op_meta.args,
+            op_meta.global_arguments,
+            op_meta.global_argument_keys,
+        )
+
+    return summary
+
+
+def _get_run_results(state: "State", hosts: list["Host"], op_hashes: list[str]) -> dict:
+    op_results = []
+
+    for host in hosts:
+        for op_hash in op_hashes:
+            op_data = state.ops[host].get(op_hash)
+            if op_data is None or not op_data.operation_meta.is_complete():
+                continue
+
+            operation_meta = op_data.operation_meta
+            op_results.append(
+                (
+                    host.name,
+                    op_hash,
+                    operation_meta._success,
+                    [str(command) for command in operation_meta._commands or []],
+                    operation_meta._combined_output_lines,
+                ),
+            )
+
+    return {
+        "op_results": op_results,
+        "failed_hosts": [host.name for host in hosts if host in state.failed_hosts],
+        "host_results": {
+            host.name: {key: getattr(state.get_results_for_host(host), key) for key in RESULT_KEYS}
+            for host in hosts
+        },
+    }
+
+
+def _run_worker_command(state: "State", hosts: list["Host"], command: str, args) -> dict:
+    op_hashes = [args[0]] if command == "run_op" else state.get_op_order()
+
+    with ctx_state.use(state):
+        try:
+            if command == "run_op":
+                # The parent process logs the operation start once for all shards
+                _run_single_op(state, args[0], log_start=False)
+
+            elif command == "run_host_ops":
+                host = state.inventory.get_host(args[0])
+                try:
+                    _run_host_ops(state, host)
+                except PyinfraError:
+                    state.fail_hosts({host})
+
+            elif command == "run_no_wait":
+                _run_no_wait_ops(state)
+
+        except PyinfraError:
+            # All of this shard's hosts have failed, the parent checks the remaining hosts
+            if state.active_hosts:
+                raise
+
+    return _get_run_results(state, hosts, op_hashes)
+
+
+def _run_worker(
+    state: "State",
+    hosts: list["Host"],
+    connection: "Connection",
+    connect: Callable[["State"], None],
+    prepare: Callable[["State"], None],
+) -> None:
+    # Other shards are only known to the parent process
+    state.shards = []
+    # SQLite connections cannot be shared with the parent process
+    for attr in ("fact_store", "fact_recorder", "fact_replay"):
+        fact_store = getattr(state, attr)
+        if fact_store:
+            setattr(state, attr, FactStore(fact_store.filename))
+    if state.plan_store:
+        state.plan_store = PlanStore(state.plan_store.filename)
+    # The parent checks the failed percentage over all hosts
+    state.config.FAIL_PERCENT = None
+    state.config.FAIL_FAST = state.config.FAIL_FAST_CANCEL = False
+
+    def run():
+        limit_hosts = state.limit_hosts
+        state.limit_hosts = hosts
+        try:
+            connect(state)
+        except PyinfraError:
+            # No hosts remaining, the parent raises this for all shards
+            if state.active_hosts:
+                raise
+        finally:
+            state.limit_hosts = limit_hosts
+
+        if state.active_hosts:
+            prepare(state)
+        connection.send(("ok", _get_summary(state, hosts)))
+
+        while True:
+            command, args = connection.recv()
+
+            if command == "drop_ops":
+                for host_name, op_hash in args[0]:
+                    state.remove_op_data_for_host(state.inventory.get_host(host_name), op_hash)
+                connection.send(("ok", None))
+                continue
+
+            if command == "exit":
+                from .connect import disconnect_all
+
+                disconnect_all(state)
+                connection.send(("ok", None))
+                return
+
+            state.is_executing = True
+            connection.send(("ok", _run_worker_command(state, hosts, command, args)))
+
+    try:
+        run()
+    except (EOFError, KeyboardInterrupt):
+        pass
+    except BaseException:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def _merge_summary(state: "State", shard: Shard, summary: dict) -> None:
+    for op_hash, op_meta_summary in summary["op_meta"].items():
+        op_order, names, args, global_arguments, global_argument_keys = op_meta_summary
+        op_meta = state.op_meta.get(op_hash)
+        if op_meta is None:
+            op_meta = state.op_meta[op_hash] = StateOperationMeta(op_order)
+            op_meta.global_arguments = global_arguments
+        elif op_meta.global_arguments != global_arguments:
+            raise OperationValueError(
+                "Operation {0} has different execution arguments across hosts".format(
+                    ", ".join(names),
+                ),
+            )
+
+        op_meta.names.update(names)
+        op_meta.global_argument_keys.update(global_argument_keys)
+        for arg in args:
+            if arg not in op_meta.args:
+                op_meta.args.append(arg)
+
+        shard.op_hashes.add(op_hash)
+
+    for host_name, host_summary in summary["hosts"].items():
+        host = state.inventory.get_host(host_name)
+        for op_hash in host_summary["op_hash_order"]:
+            state.add_op_hash_for_host(host, op_hash)
+
+        for op_hash, is_change, global_arguments, parent_op_hash in host_summary["ops"]:
+            state.set_op_data_for_host(
+                host,
+                op_hash,
+                StateOperationHostData(
+                    command_generator=_make_shard_command_generator(host, op_hash),
+                    global_arguments=global_arguments,
+                    operation_meta=OperationMeta(op_hash, is_change),
+                    parent_op_hash=parent_op_hash,
+                ),
+            )
+
+        host_meta = state.get_meta_for_host(host)
+        host_meta.ops, host_meta.ops_change, host_meta.ops_no_change = host_summary["meta"]
+
+
+def _drop_run_once_ops(state: "State") -> None:
+    """
+    Each shard runs ``_run_once`` operations on its first host, keep only the first in the
+    inventory and tell the other shards to drop theirs.
+    """
+
+    drop_ops: dict[Shard, list[tuple[str, str]]] = {}
+
+    for op_hash, op_meta in state.op_meta.items():
+        if not op_meta.global_arguments["_run_once"]:
+            continue
+
+        op_hosts = state.get_op_hosts(op_hash)
+        hosts = [host for host in state.inventory if host in op_hosts]
+        for host in hosts[1:]:
+            op_data = state.remove_op_data_for_host(host, op_hash)
+
+            host_meta = state.get_meta_for_host(host)
+            host_meta.ops -= 1
+            if op_data.operation_meta._maybe_is_change:
+                host_meta.ops_change -= 1
+            else:
+                host_meta.ops_no_change -= 1
+
+            shard = next(shard for shard in state.shards if host in shard.hosts)
+            drop_ops.setdefault(shard, []).append((host.name, op_hash))
+
+    for shard, ops in drop_ops.items():
+        shard.send("drop_ops", ops)
+        shard.receive()
+
+
+def _make_shard_command_generator(host: "Host", op_hash: str):
+    def command_generator():
+        raise PyinfraError(
+            f"Operation {op_hash} on {host} can only be executed by its shard process",
+        )
+        yield
+
+    return command_generator
+
+
+def prepare_shards(
+    state: "State",
+    connect: Callable[["State"], None],
+    prepare: Callable[["State"], None],
+    processes: int,
+) -> list[Shard]:
+    """
+    Split the hosts in the state limit over ``processes`` worker processes which each connect to
+    & prepare operations for their hosts, then merge the results back into the state.
+
+    Args:
+        state (``pyinfra.api.State`` obj): the deploy state
+        connect (function): connects to hosts in the state limit, ie ``connect_all``
+        prepare (function): adds operations to the state
+        processes (int): the number of worker processes to start
+    """
+
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        raise PyinfraError("Sharded deploys require the fork multiprocessing start method")
+
+    hosts = [host for host in state.inventory if state.is_host_in_limit(host)]
+    shard_hosts = [hosts[i::processes] for i in range(processes)]
+
+    for worker_hosts in shard_hosts:
+        if not worker_hosts:
+            continue
+
+        parent_connection, worker_connection = context.Pipe()
+        # Pipes made from gevent patched sockets are non-blocking
+        for connection in (parent_connection, worker_connection):
+            os.set_blocking(connection.fileno(), True)
+        process = context.Process(
+            target=_run_worker,
+            args=(state, worker_hosts, worker_connection, connect, prepare),
+            daemon=True,
+        )
+        process.start()
+        worker_connection.close()
+
+        state.shards.append(Shard(worker_hosts, process, parent_connection))
+
+    logger.debug("Started %i shard processes", len(state.shards))
+
+    failed_hosts: set["Host"] = set()
+
+    for shard in state.shards:
+        summary = shard.receive()
+
+        for host_name in summary["activated_hosts"]:
+            state.activate_host(state.inventory.get_host(host_name))
+        failed_hosts.update(state.inventory.get_host(name) for name in summary["failed_hosts"])
+
+        _merge_summary(state, shard, summary)
+
+    _drop_run_once_ops(state)
+
+    # Each worker fails hosts that fail to connect, check FAIL_PERCENT for all of them
+    state.fail_hosts(failed_hosts, activated_count=len(hosts))
+
+    return state.shards
+
+
+def _run_shard_commands(shards: list[Shard], command: str, *args, sequential: bool = False):
+    if sequential:
+        results = []
+        for shard in shards:
+            shard.send(command, *args)
+            results.append(shard.receive())
+        return results
+
+    for shard in shards:
+        shard.send(command, *args)
+    return [shard.receive() for shard in shards]
+
+
+def _apply_run_results(state: "State", run_results: list[dict]) -> None:
+    failed_hosts: set["Host"] = set()
+
+    for results in run_results:
+        for host_name, op_hash, success, commands, combined_output_lines in results["op_results"]:
+            op_data = state.ops[state.inventory.get_host(host_name)].get(op_hash)
+            # Nested operations only exist in the shard processes
+            if op_data is not None and not op_data.operation_meta.is_complete():
+                op_data.operation_meta.set_complete(success, commands, combined_output_lines)
+
+        for host_name, host_results in results["host_results"].items():
+            results_for_host = state.get_results_for_host(state.inventory.get_host(host_name))
+            for key, value in host_results.items():
+                setattr(results_for_host, key, value)
+
+        failed_hosts.update(state.inventory.get_host(name) for name in results["failed_hosts"])
+
+    state.fail_hosts(failed_hosts - state.failed_hosts)
+
+
+def _get_active_shards(state: "State", op_hash: Optional[str] = None) -> list[Shard]:
+    return [
+        shard
+        for shard in state.shards
+        if any(host in state.active_hosts for host in shard.hosts)
+        and (op_hash is None or op_hash in shard.op_hashes)
+    ]
+
+
+def _is_sequential_op(state: "State", op_hash: str) -> bool:
+    """
+    Serial & batched parallel operations must not run on hosts in several shards at once.
+    ``_parallel`` defaults to the (per process) pool size, so only a value passed to the
+    operation that is lower than the number of hosts limits the operation itself.
+    """
+
+    op_meta = state.get_op_meta(op_hash)
+    parallel = op_meta.global_arguments["_parallel"]
+    return bool(
+        op_meta.global_arguments["_serial"]
+        or (
+            "_parallel" in op_meta.global_argument_keys
+            and parallel
+            and parallel < len(state.get_op_hosts(op_hash))
+        ),
+    )
+
+
+def run_shard_ops(state: "State", serial: bool = False, no_wait: bool = False):
+    """
+    Runs all operations across all shards, see ``pyinfra.api.operations.run_ops``.
+
+    Args:
+        state (``pyinfra.api.State`` obj): the deploy state to execute
+        serial (boolean): whether to run operations host by host
+        no_wait (boolean): whether to wait for all hosts between operations
+    """
+
+    state.is_executing = True
+
+    if serial:
+        for host in list(state.inventory.iter_active_hosts()):
+            shard = next(shard for shard in state.shards if host in shard.hosts)
+            _apply_run_results(state, _run_shard_commands([shard], "run_host_ops", host.name))
+
+    elif no_wait or state.config.CONCURRENT_OPS > 1:
+        _apply_run_results(state, _run_shard_commands(_get_active_shards(state), "run_no_wait"))
+
+    else:
+        for op_hash in state.get_op_order():
+            state.trigger_callbacks("operation_start", op_hash)
+
+            op_meta = state.get_op_meta(op_hash)
+            log_operation_start(op_meta)
+
+            shards = _get_active_shards(state, op_hash)
+            _apply_run_results(
+                state,
+                _run_shard_commands(
+                    shards,
+                    "run_op",
+                    op_hash,
+                    sequential=_is_sequential_op(state, op_hash),
+                ),
+            )
+
+            state.trigger_callbacks("operation_end", op_hash)
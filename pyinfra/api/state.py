@@ -12,15 +12,20 @@ from paramiko import PKey
 
 from pyinfra import logger
 
+from .concurrency import STAGES, AdaptivePool, ConcurrencyController
 from .config import Config
 from .exceptions import PyinfraError
+from .fact_store import FactStore
+from .plan_store import PlanStore
 
 if TYPE_CHECKING:
     from pyinfra.api.arguments import AllArguments
     from pyinfra.api.command import PyinfraCommand
+    from pyinfra.api.facts import FactStats
     from pyinfra.api.host import Host
     from pyinfra.api.inventory import Inventory
     from pyinfra.api.operation import OperationMeta
+    from pyinfra.api.shards import Shard
 
 
 # Work out the max parallel we can achieve with the open files limit of the user/process,
@@ -81,6 +86,17 @@ class BaseStateCallback:
     def operation_end(state: "State", op_hash):
         pass
 
+    # Fact callbacks
+    #
+
+    @staticmethod
+    def fact_start(state: "State", host: "Host", fact_name: str, fact_kwargs: dict):
+        pass
+
+    @staticmethod
+    def fact_end(state: "State", host: "Host", fact_stats: "FactStats"):
+        pass
+
 
 class StateStage(IntEnum):
     # Setup - collect inventory & data
@@ -100,12 +116,15 @@ class StateOperationMeta:
     args: list[str]
     op_order: tuple[int, ...]
     global_arguments: "AllArguments"
+    # Execution arguments passed to the operation (or its deploy) rather than the defaults
+    global_argument_keys: set[str]
 
     def __init__(self, op_order: tuple[int, ...]):
         self.op_order = op_order
         self.names = set()
         self.args = []
         self.global_arguments = {}  # type: ignore
+        self.global_argument_keys = set()
 
 
 @dataclass
@@ -114,6 +133,12 @@ class StateOperationHostData:
     global_arguments: "AllArguments"
     operation_meta: "OperationMeta"
     parent_op_hash: Optional[str] = None
+    # Set when the op yielded no commands when prepared: the hosts whose facts it read mapped
+    # to their executed command count at the time. While these are unchanged the op is a no-op
+    # and the command generator is not run again.
+    prepared_fact_hosts: Optional[dict["Host", int]] = None
+    # Resources (paths, package manager) the op uses, see api/op_dependencies.py
+    resources: frozenset[str] = frozenset()
 
 
 class StateHostMeta:
@@ -148,7 +173,18 @@ class State:
     config: "Config"
 
     # Main gevent pool
-    pool: "Pool"
+    pool: AdaptivePool
+
+    # Persistent fact storage, when enabled via config.FACT_CACHE
+    fact_store: Optional[FactStore] = None
+    # Fact snapshots, when enabled via config.FACT_RECORD/config.FACT_REPLAY
+    fact_recorder: Optional[FactStore] = None
+    fact_replay: Optional[FactStore] = None
+    # Operation fingerprints for incremental deploys, when enabled via config.PLAN_CACHE
+    plan_store: Optional[PlanStore] = None
+
+    # Worker processes of a sharded deploy, see pyinfra.api.shards
+    shards: list["Shard"]
 
     # Current stage this state is in
     current_stage: StateStage = StateStage.Setup
@@ -175,6 +211,8 @@ class State:
     current_exec_filename: Optional[str] = None
     current_op_file_number: int = 0
     should_raise_failed_hosts: Optional[Callable[["State"], bool]] = None
+    # Stats of the facts loaded, collected by the --fact-stats callback
+    fact_stats: list[tuple["Host", "FactStats"]]
 
     def __init__(
         self,
@@ -208,13 +246,21 @@ class State:
         if config is None:
             config = Config()
 
-        if not config.PARALLEL:
-            # TODO: benchmark this
-            # In my own tests the optimum number of parallel SSH processes is
-            # ~20 per CPU core - no science here yet, needs benchmarking!
-            cpus = cpu_count()
-            ideal_parallel = cpus * 20
+        # In my own tests the optimum number of parallel SSH processes is
+        # ~20 per CPU core - no science here yet, see config.ADAPTIVE_PARALLEL!
+        ideal_parallel = cpu_count() * 20
+        concurrency_controllers: dict[str, ConcurrencyController] = {}
+
+        if config.ADAPTIVE_PARALLEL:
+            # Start from the ideal & adjust each stage up to PARALLEL, or all hosts
+            max_parallel = config.PARALLEL or min(len(inventory), MAX_PARALLEL)
+            concurrency_controllers = {
+                stage: ConcurrencyController(stage, ideal_parallel, max_parallel)
+                for stage in STAGES
+            }
+            config.PARALLEL = max_parallel
 
+        if not config.PARALLEL:
             config.PARALLEL = min(ideal_parallel, len(inventory), MAX_PARALLEL)
 
         # If explicitly set, just issue a warning
@@ -230,9 +276,11 @@ class State:
         #
 
         self.callback_handlers: list[BaseStateCallback] = []
+        self.shards = []
+        self.fact_stats = []
 
         # Setup greenlet pools
-        self.pool = Pool(config.PARALLEL)
+        self.pool = AdaptivePool(config.PARALLEL, concurrency_controllers)
         self.fact_pool = Pool(config.PARALLEL)
 
         # Private keys
@@ -242,6 +290,20 @@ class State:
         self.inventory = inventory
         self.config = config
 
+        if config.FACT_CACHE:
+            self.fact_store = FactStore(config.FACT_CACHE)
+
+        if config.FACT_RECORD:
+            self.fact_recorder = FactStore(config.FACT_RECORD)
+            # Each recording is a snapshot of a single run
+            self.fact_recorder.clear()
+
+        if config.FACT_REPLAY:
+            self.fact_replay = FactStore(config.FACT_REPLAY)
+
+        if config.PLAN_CACHE:
+            self.plan_store = PlanStore(config.PLAN_CACHE)
+
         # Hosts we've activated at any time
         self.activated_hosts: set["Host"] = set()
         # Active hosts that *haven't* failed yet
@@ -249,14 +311,31 @@ class State:
         # Hosts that have failed
         self.failed_hosts: set["Host"] = set()
 
+        # Set once over FAIL_PERCENT of hosts have failed with config.FAIL_FAST, along with the
+        # hosts operations were not started on & hosts that were mid-operation at the time.
+        self.failing_fast = False
+        self.cancelled_hosts: set["Host"] = set()
+        self.interrupted_hosts: set["Host"] = set()
+
         # Limit hosts changes dynamically to limit operations to a subset of hosts
         self.limit_hosts: list["Host"] = initial_limit
 
         # Op basics
         self.op_meta: dict[str, StateOperationMeta] = {}  # maps operation hash -> names/etc
 
+        # Operation DAG, maps operation hash -> hashes that must be executed before it, built
+        # from each host's op_hash_order as operations are added
+        self.op_dependencies: dict[str, set[str]] = {}
+        # Cached result of get_op_order, reset when operations are added
+        self.op_order: Optional[list[str]] = None
+
+        # Op change checks by (op hash, inputs hash), see config.GROUP_EQUIVALENT_HOSTS
+        self.equivalent_op_results: dict[tuple[str, str], list[tuple[tuple, bool]]] = {}
+
         # Op dict for each host
         self.ops: dict["Host", dict[str, StateOperationHostData]] = {host: {} for host in inventory}
+        # Hosts each op has been added for, maps operation hash -> hosts
+        self.op_hosts: dict[str, set["Host"]] = {}
 
         # Meta dict for each host
         self.meta: dict["Host", StateHostMeta] = {host: StateHostMeta() for host in inventory}
@@ -299,15 +378,25 @@ class State:
             func = getattr(handler, method_name)
             func(self, *args, **kwargs)
 
-    def get_op_order(self):
-        ts: TopologicalSorter = TopologicalSorter()
+    def add_op_hash_for_host(self, host: "Host", op_hash: str) -> None:
+        """
+        Append an operation hash to the host's ``op_hash_order`` and the operation DAG.
+        """
+
+        dependencies = self.op_dependencies.setdefault(op_hash, set())
+        if host.op_hash_order:
+            dependencies.add(host.op_hash_order[-1])
 
-        for host in self.inventory:
-            for i, op_hash in enumerate(host.op_hash_order):
-                if not i:
-                    ts.add(op_hash)
-                else:
-                    ts.add(op_hash, host.op_hash_order[i - 1])
+        host.op_hash_order.append(op_hash)
+        self.op_order = None
+
+    def get_op_order(self) -> list[str]:
+        if self.op_order is None:
+            self.op_order = self._solve_op_order()
+        return list(self.op_order)
+
+    def _solve_op_order(self) -> list[str]:
+        ts: TopologicalSorter = TopologicalSorter(self.op_dependencies)
 
         final_op_order = []
 
@@ -358,6 +447,18 @@ class State:
         op_data: StateOperationHostData,
     ):
         self.ops[host][op_hash] = op_data
+        self.op_hosts.setdefault(op_hash, set()).add(host)
+
+    def remove_op_data_for_host(self, host: "Host", op_hash: str) -> StateOperationHostData:
+        self.op_hosts[op_hash].discard(host)
+        return self.ops[host].pop(op_hash)
+
+    def get_op_hosts(self, op_hash: str) -> set["Host"]:
+        """
+        Returns the hosts an operation has been added for.
+        """
+
+        return self.op_hosts.get(op_hash, set())
 
     def activate_host(self, host: "Host"):
         """
@@ -400,8 +501,17 @@ class State:
         if not active_hosts:
             raise PyinfraError("No hosts remaining!")
 
+        # Already decided to stop, see ``check_fail_fast``
+        if self.failing_fast:
+            raise PyinfraError(
+                "Over {0}% of hosts failed ({1}%), stopped early".format(
+                    self.config.FAIL_PERCENT or 0,
+                    int(round(self.get_percent_failed(set(), activated_count))),
+                ),
+            )
+
         if self.config.FAIL_PERCENT is not None:
-            percent_failed = (1 - len(active_hosts) / activated_count) * 100
+            percent_failed = self.get_percent_failed(set(), activated_count)
 
             if percent_failed > self.config.FAIL_PERCENT:
                 if self.should_raise_failed_hosts and self.should_raise_failed_hosts(self) is False:
@@ -414,6 +524,50 @@ class State:
                     ),
                 )
 
+    def get_percent_failed(self, hosts_to_fail, activated_count=None) -> float:
+        """
+        Returns the percentage of hosts that will have failed after failing these hosts.
+        """
+
+        activated_count = activated_count or len(self.activated_hosts)
+        if not activated_count:
+            return 0
+        return (1 - len(self.active_hosts - hosts_to_fail) / activated_count) * 100
+
+    def check_fail_fast(self, hosts_to_fail, running_hosts) -> bool:
+        """
+        With ``config.FAIL_FAST`` check whether failing these hosts (once the running hosts
+        complete) will take us over ``config.FAIL_PERCENT`` (any failure if not set), in which
+        case no further operations should be started.
+        """
+
+        if self.failing_fast:
+            return True
+
+        fail_fast = self.config.FAIL_FAST or self.config.FAIL_FAST_CANCEL
+        if not fail_fast or not hosts_to_fail:
+            return False
+
+        percent_failed = self.get_percent_failed(hosts_to_fail)
+        if percent_failed <= (self.config.FAIL_PERCENT or 0) and self.active_hosts - hosts_to_fail:
+            return False
+
+        logger.warning(
+            "--> Over {0}% of hosts failed ({1}%), {2}".format(
+                self.config.FAIL_PERCENT or 0,
+                int(round(percent_failed)),
+                (
+                    "cancelling running operations"
+                    if self.config.FAIL_FAST_CANCEL
+                    else "waiting for running operations"
+                ),
+            ),
+        )
+
+        self.failing_fast = True
+        self.interrupted_hosts.update(set(running_hosts) - set(hosts_to_fail))
+        return True
+
     def is_host_in_limit(self, host: "Host"):
         """
         Returns a boolean indicating if the host is within the current state limit.
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import sys
 from functools import wraps
 from hashlib import sha1
 from inspect import getframeinfo, stack
 from io import BytesIO, StringIO
 from os import getcwd, path, stat
 from socket import error as socket_error, timeout as timeout_error
+from types import FrameType
 from typing import IO, TYPE_CHECKING, Any, Callable, Dict, List, Optional, Type, Union
 
 import click
@@ -109,13 +111,20 @@ def get_caller_frameinfo(frame_offset: int = 0):
 
 
 def get_operation_order_from_stack(state: "State"):
-    stack_items = list(reversed(stack()))
+    # Walk the raw frames rather than using inspect.stack, which reads the source lines of
+    # every frame and is very slow when called for every operation on every host.
+    stack_items: list[tuple[str, int]] = []
+    frame: Optional[FrameType] = sys._getframe()
+    while frame:
+        stack_items.append((frame.f_code.co_filename, frame.f_lineno))
+        frame = frame.f_back
+
+    stack_items.reverse()
 
     # Find the *first* occurrence of our deploy file in the reversed stack
     if state.current_deploy_filename:
-        for i, stack_item in enumerate(stack_items):
-            frame = getframeinfo(stack_item[0])
-            if frame.filename == state.current_deploy_filename:
+        for i, (filename, _) in enumerate(stack_items):
+            if filename == state.current_deploy_filename:
                 break
     else:
         i = 0
@@ -126,15 +135,11 @@ def get_operation_order_from_stack(state: "State"):
     if pyinfra.is_cli:
         line_numbers.append(state.current_op_file_number)
 
-    for stack_item in stack_items[i:]:
-        frame = getframeinfo(stack_item[0])
-
-        if frame.filename.startswith(PYINFRA_INSTALL_DIR):
+    for filename, lineno in stack_items[i:]:
+        if filename.startswith(PYINFRA_INSTALL_DIR):
             continue
 
-        line_numbers.append(frame.lineno)
-
-    del stack_items
+        line_numbers.append(lineno)
 
     return line_numbers
 
@@ -241,6 +246,26 @@ def log_error_or_warning(
     )
 
 
+def log_fail_fast(state: "State") -> None:
+    """
+    Log the hosts operations were cancelled on after failing fast, see
+    ``State.check_fail_fast``.
+    """
+
+    for hosts, description in (
+        (state.cancelled_hosts, "Operations not started on"),
+        (state.interrupted_hosts, "Mid-operation when failing fast"),
+    ):
+        if hosts:
+            logger.warning(
+                "--> {0} {1} hosts: {2}".format(
+                    description,
+                    len(hosts),
+                    ", ".join(sorted(host.name for host in hosts)),
+                ),
+            )
+
+
 def log_host_command_error(host: "Host", e: Exception, timeout: int = 0) -> None:
     if isinstance(e, timeout_error):
         logger.error(
@@ -282,41 +307,66 @@ def log_host_command_error(host: "Host", e: Exception, timeout: int = 0) -> None
         raise e
 
 
-def make_hash(obj):
-    """
-    Make a hash from an arbitrary nested dictionary, list, tuple or set, used to generate
-    ID's for operations based on their name & arguments.
-    """
+def _get_hash_string(obj) -> str:
+    return (
+        # Capture integers first (as 1 == True)
+        "{0}".format(obj)
+        if isinstance(obj, int)
+        # Constants - the values can change between hosts but we should still
+        # group them under the same operation hash.
+        else "_PYINFRA_CONSTANT"
+        if obj in (True, False, None)
+        # Objects with __name__s
+        else obj.__name__
+        if hasattr(obj, "__name__")
+        # Objects with names
+        else obj.name
+        if hasattr(obj, "name")
+        # Repr anything else
+        else repr(obj)
+    )
+
+
+def _add_hash_parts(obj, parts: list[str]) -> None:
+    # Plain strings & integers first, as these are by far the most common
+    if isinstance(obj, str):
+        parts.append(f"{len(obj)}:{obj}")
 
-    if isinstance(obj, (set, tuple, list)):
-        hash_string = "".join([make_hash(e) for e in obj])
+    elif isinstance(obj, int):
+        hash_string = "{0}".format(obj)
+        parts.append(f"{len(hash_string)}:{hash_string}")
+
+    # Sets, tuples and lists all hash the same, nested sequences are delimited
+    elif isinstance(obj, (set, tuple, list)):
+        parts.append("[")
+        for item in obj:
+            _add_hash_parts(item, parts)
+        parts.append("]")
 
     elif isinstance(obj, dict):
-        hash_string = "".join("".join((key, make_hash(value))) for key, value in obj.items())
+        parts.append("{")
+        for key, value in obj.items():
+            _add_hash_parts(key, parts)
+            _add_hash_parts(value, parts)
+        parts.append("}")
 
     else:
-        hash_string = (
-            # Capture integers first (as 1 == True)
-            "{0}".format(obj)
-            if isinstance(obj, int)
-            # Constants - the values can change between hosts but we should still
-            # group them under the same operation hash.
-            else "_PYINFRA_CONSTANT"
-            if obj in (True, False, None)
-            # Plain strings
-            else obj
-            if isinstance(obj, str)
-            # Objects with __name__s
-            else obj.__name__
-            if hasattr(obj, "__name__")
-            # Objects with names
-            else obj.name
-            if hasattr(obj, "name")
-            # Repr anything else
-            else repr(obj)
-        )
+        hash_string = _get_hash_string(obj)
+        parts.append(f"{len(hash_string)}:{hash_string}")
+
+
+def make_hash(obj):
+    """
+    Make a hash from an arbitrary nested dictionary, list, tuple or set, used to generate
+    ID's for operations based on their name & arguments.
+
+    Values are encoded into a single length prefixed string which is hashed once, rather than
+    hashing every nested value.
+    """
 
-    return sha1_hash(hash_string)
+    parts: list[str] = []
+    _add_hash_parts(obj, parts)
+    return sha1_hash("".join(parts))
 
 
 class get_file_io:
@@ -73,6 +73,8 @@ class BaseConnector(abc.ABC):
     host: "Host"
 
     handles_execution = False
+    # Whether run_shell_command accepts a ``stdout_handler`` to stream output lines to
+    supports_stdout_handler = False
 
     data_cls: Type = ConnectorData
     data_meta: dict[str, DataMeta] = {}
@@ -1,6 +1,6 @@
 import os
 from tempfile import mkstemp
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
 
 import click
 from typing_extensions import Unpack
@@ -32,6 +32,7 @@ class ChrootConnector(BaseConnector):
     """
 
     handles_execution = True
+    supports_stdout_handler = True
 
     local: LocalConnector
 
@@ -71,6 +72,7 @@ class ChrootConnector(BaseConnector):
         command,
         print_output: bool = False,
         print_input: bool = False,
+        stdout_handler: Optional[Callable[[Iterator[str]], None]] = None,
         **command_arguments: Unpack["ConnectorArguments"],
     ):
         local_arguments = extract_control_arguments(command_arguments)
@@ -94,6 +96,7 @@ class ChrootConnector(BaseConnector):
             chroot_command,
             print_output=print_output,
             print_input=print_input,
+            stdout_handler=stdout_handler,
             **local_arguments,
         )
 
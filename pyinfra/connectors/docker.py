@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 import os
 from tempfile import mkstemp
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
 
 import click
 from typing_extensions import TypedDict, Unpack
@@ -79,6 +79,7 @@ class DockerConnector(BaseConnector):
     """
 
     handles_execution = True
+    supports_stdout_handler = True
 
     data_cls = ConnectorData
     data_meta = connector_data_meta
@@ -150,6 +151,7 @@ class DockerConnector(BaseConnector):
         command: StringCommand,
         print_output: bool = False,
         print_input: bool = False,
+        stdout_handler: Optional[Callable[[Iterator[str]], None]] = None,
         **arguments: Unpack["ConnectorArguments"],
     ) -> tuple[bool, CommandOutput]:
         local_arguments = extract_control_arguments(arguments)
@@ -174,6 +176,7 @@ class DockerConnector(BaseConnector):
             docker_command,
             print_output=print_output,
             print_input=print_input,
+            stdout_handler=stdout_handler,
             **local_arguments,
         )
 
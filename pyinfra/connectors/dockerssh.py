@@ -1,6 +1,6 @@
 import os
 from tempfile import mkstemp
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
 
 import click
 from typing_extensions import Unpack
@@ -43,6 +43,7 @@ class DockerSSHConnector(BaseConnector):
     """
 
     handles_execution = True
+    supports_stdout_handler = True
 
     ssh: SSHConnector
 
@@ -123,6 +124,7 @@ class DockerSSHConnector(BaseConnector):
         command,
         print_output: bool = False,
         print_input: bool = False,
+        stdout_handler: Optional[Callable[[Iterator[str]], None]] = None,
         **arguments: Unpack["ConnectorArguments"],
     ):
         local_arguments = extract_control_arguments(arguments)
@@ -147,6 +149,7 @@ class DockerSSHConnector(BaseConnector):
             docker_command,
             print_output=print_output,
             print_input=print_input,
+            stdout_handler=stdout_handler,
             **local_arguments,
         )
 
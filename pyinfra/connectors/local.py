@@ -1,7 +1,7 @@
 import os
 from distutils.spawn import find_executable
 from tempfile import mkstemp
-from typing import TYPE_CHECKING, Tuple
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, Tuple
 
 import click
 from typing_extensions import Unpack
@@ -37,6 +37,7 @@ class LocalConnector(BaseConnector):
     """
 
     handles_execution = True
+    supports_stdout_handler = True
 
     @staticmethod
     def make_names_data(name=None):
@@ -50,6 +51,7 @@ class LocalConnector(BaseConnector):
         command: StringCommand,
         print_output: bool = False,
         print_input: bool = False,
+        stdout_handler: Optional[Callable[[Iterator[str]], None]] = None,
         **arguments: Unpack["ConnectorArguments"],
     ) -> Tuple[bool, CommandOutput]:
         """
@@ -59,6 +61,8 @@ class LocalConnector(BaseConnector):
             command (StringCommand): actual command to execute
             print_output (bool): whether to print command output
             print_input (bool): whether to print command input
+            stdout_handler (callable): passed stdout lines as they are read, instead of
+                collecting them into the returned output
             arguments: (ConnectorArguments): connector global arguments
 
         Returns:
@@ -86,6 +90,7 @@ class LocalConnector(BaseConnector):
                 timeout=_timeout,
                 print_output=print_output,
                 print_prefix=self.host.print_prefix,
+                stdout_handler=stdout_handler,
             )
 
         return_code, combined_output = execute_command_with_sudo_retry(
@@ -5,7 +5,7 @@ from distutils.spawn import find_executable
 from random import uniform
 from socket import error as socket_error, gaierror
 from time import sleep
-from typing import TYPE_CHECKING, Any, Iterable, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional, Tuple
 
 import click
 from paramiko import AuthenticationException, BadHostKeyException, SFTPClient, SSHException
@@ -133,6 +133,7 @@ class SSHConnector(BaseConnector):
     """
 
     handles_execution = True
+    supports_stdout_handler = True
 
     data_cls = ConnectorData
     data_meta = connector_data_meta
@@ -265,6 +266,7 @@ class SSHConnector(BaseConnector):
         command: StringCommand,
         print_output: bool = False,
         print_input: bool = False,
+        stdout_handler: Optional[Callable[[Iterator[str]], None]] = None,
         **arguments: Unpack["ConnectorArguments"],
     ) -> Tuple[bool, CommandOutput]:
         """
@@ -279,6 +281,8 @@ class SSHConnector(BaseConnector):
             get_pty (boolean): whether to get a PTY before executing the command
             env (dict): environment variables to set
             timeout (int): timeout for this command to complete before erroring
+            stdout_handler (callable): passed stdout lines as they are read, instead of
+                collecting them into the returned output
 
         Returns:
             tuple: (exit_code, stdout, stderr)
@@ -320,12 +324,14 @@ class SSHConnector(BaseConnector):
                 timeout=_timeout,
                 print_output=print_output,
                 print_prefix=self.host.print_prefix,
+                stdout_handler=stdout_handler,
             )
 
             logger.debug("Waiting for exit status...")
             exit_status = stdout_buffer.channel.recv_exit_status()
             logger.debug("Command exit status: %i", exit_status)
 
+            combined_output.exit_code = exit_status
             return exit_status, combined_output
 
         return_code, combined_output = execute_command_with_sudo_retry(
@@ -6,7 +6,7 @@ from getpass import getpass
 from queue import Queue
 from socket import timeout as timeout_error
 from subprocess import PIPE, Popen
-from typing import TYPE_CHECKING, Callable, Iterable, Optional, Union
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, Union
 
 import click
 import gevent
@@ -41,6 +41,7 @@ def run_local_process(
     timeout: Optional[int] = None,
     print_output: bool = False,
     print_prefix=None,
+    stdout_handler: Optional[Callable[[Iterator[str]], None]] = None,
 ) -> tuple[int, "CommandOutput"]:
     process = Popen(command, shell=True, stdout=PIPE, stderr=PIPE, stdin=PIPE)
 
@@ -56,6 +57,7 @@ def run_local_process(
         timeout=timeout,
         print_output=print_output,
         print_prefix=print_prefix,
+        stdout_handler=stdout_handler,
     )
 
     logger.debug("--> Waiting for exit status...")
@@ -66,6 +68,7 @@ def run_local_process(
     process.stdout.close()
     process.stderr.close()
 
+    combined_output.exit_code = process.returncode
     return process.returncode, combined_output
 
 
@@ -82,6 +85,7 @@ class OutputLine:
 @dataclass
 class CommandOutput:
     combined_lines: list[OutputLine]
+    exit_code: Optional[int] = None
 
     def __iter__(self):
         yield from self.combined_lines
@@ -117,9 +121,12 @@ def read_buffer(
     output_queue: Queue[OutputLine],
     print_output=False,
     print_func=None,
+    line_handler: Optional[Callable[[Iterator[str]], None]] = None,
 ) -> None:
     """
-    Reads a file-like buffer object into lines and optionally prints the output.
+    Reads a file-like buffer object into lines and optionally prints the output. If a
+    ``line_handler`` is provided the lines are passed to it as they are read rather than
+    being collected into the output queue.
     """
 
     def _print(line):
@@ -128,16 +135,31 @@ def read_buffer(
 
         click.echo(line, err=True)
 
-    for line in io:
-        # Handle local Popen shells returning list of bytes, not strings
-        if not isinstance(line, str):
-            line = line.decode("utf-8")
+    def _read_lines() -> Iterator[str]:
+        for line in io:
+            # Handle local Popen shells returning list of bytes, not strings
+            if not isinstance(line, str):
+                line = line.decode("utf-8")
 
-        line = line.rstrip("\n")
-        output_queue.put(OutputLine(name, line))
+            line = line.rstrip("\n")
+            yield line
+
+            if print_output:
+                _print(line)
+
+    lines = _read_lines()
 
-        if print_output:
-            _print(line)
+    if line_handler:
+        try:
+            line_handler(lines)
+        finally:
+            # Always read the remaining output so the command can complete
+            for _ in lines:
+                pass
+        return
+
+    for line in lines:
+        output_queue.put(OutputLine(name, line))
 
 
 def read_output_buffers(
@@ -146,6 +168,7 @@ def read_output_buffers(
     timeout: Optional[int],
     print_output: bool,
     print_prefix: str,
+    stdout_handler: Optional[Callable[[Iterator[str]], None]] = None,
 ) -> CommandOutput:
     output_queue: Queue[OutputLine] = Queue()
 
@@ -159,6 +182,7 @@ def read_output_buffers(
         output_queue,
         print_output=print_output,
         print_func=lambda line: "{0}{1}".format(print_prefix, line),
+        line_handler=stdout_handler,
     )
     stderr_reader = gevent.spawn(
         read_buffer,
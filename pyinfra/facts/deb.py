@@ -15,6 +15,7 @@ class DebArch(FactBase):
 
     command = "dpkg --print-architecture"
     requires_command = "dpkg"
+    cache_ttl = 60 * 60 * 24 * 7  # one week
 
 
 class DebPackages(FactBase):
@@ -41,6 +42,10 @@ class DebPackages(FactBase):
     def process(self, output):
         return parse_packages(self.regex, output)
 
+    def process_stream(self, output):
+        # Packages are parsed line by line, so no need to buffer the output
+        return self.process(output)
+
 
 class DebPackage(FactBase):
     """
@@ -3,13 +3,14 @@ The files facts provide information about the filesystem and it's contents on th
 """
 
 import re
+import shlex
 import stat
 from datetime import datetime
-from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
 
 from typing_extensions import Literal, NotRequired, TypedDict
 
-from pyinfra.api.command import QuoteString, make_formatted_string_command
+from pyinfra.api.command import QuoteString, StringCommand, make_formatted_string_command
 from pyinfra.api.facts import FactBase
 from pyinfra.api.util import try_int
 
@@ -22,6 +23,12 @@ STAT_REGEX = (
     r"size=([0-9]*) (.*)"
 )
 
+# Printed before the output of each path by the multi-path facts (FilesInfo, Sha1Files)
+PATHS_SEPARATOR = "--"
+# Limit on the total length of the paths passed to the multi-path facts, as the command is a
+# single argument to the remote shell (limited to 128KB by Linux)
+MAX_PATHS_LENGTH = 64 * 1024
+
 FLAG_TO_TYPE = {
     "b": "block",
     "c": "character",
@@ -84,6 +91,82 @@ class FileDict(TypedDict):
     link_target: NotRequired[str]
 
 
+class FileInfoDict(FileDict):
+    type: str
+
+
+def _parse_stat_line(line: str) -> Optional[Tuple[str, FileDict]]:
+    match = re.match(STAT_REGEX, line)
+    if not match:
+        return None
+
+    mode = match.group(3)
+    path_type = FLAG_TO_TYPE[mode[0]]
+
+    data: FileDict = {
+        "user": match.group(1),
+        "group": match.group(2),
+        "mode": _parse_mode(mode[1:]),
+        "atime": _parse_datetime(match.group(4)),
+        "mtime": _parse_datetime(match.group(5)),
+        "ctime": _parse_datetime(match.group(6)),
+        "size": try_int(match.group(7)),
+    }
+
+    if path_type == "link":
+        filename = match.group(8)
+        filename, target = filename.split(" -> ")
+        data["link_target"] = target.strip("'").lstrip("`")
+
+    return path_type, data
+
+
+def _make_paths_command(paths: List[str], path_command: str) -> StringCommand:
+    # Loop over every path in one command, printing a separator before the output of each
+    return StringCommand(
+        "for path in",
+        *[QuoteString(path) for path in paths],
+        "; do echo {0}; {1}; done".format(PATHS_SEPARATOR, path_command),
+    )
+
+
+def chunk_paths(paths: List[str], max_length: int = MAX_PATHS_LENGTH) -> List[List[str]]:
+    """
+    Split paths into chunks that can be passed to one multi-path fact (FilesInfo, Sha1Files).
+    """
+
+    chunks: List[List[str]] = []
+    chunk: List[str] = []
+    chunk_length = 0
+
+    for path in paths:
+        path_length = len(shlex.quote(path)) + 1
+        if chunk and chunk_length + path_length > max_length:
+            chunks.append(chunk)
+            chunk = []
+            chunk_length = 0
+        chunk.append(path)
+        chunk_length += path_length
+
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _split_paths_output(paths: List[str], output) -> Dict[str, List[str]]:
+    paths_output: Dict[str, List[str]] = {}
+    path_lines: Optional[List[str]] = None
+    remaining_paths = iter(paths)
+
+    for line in output:
+        if line == PATHS_SEPARATOR:
+            path_lines = paths_output[next(remaining_paths)] = []
+        elif path_lines is not None:
+            path_lines.append(line)
+
+    return paths_output
+
+
 class File(FactBase[Union[FileDict, Literal[False], None]]):
     """
     Returns information about a file on the remote system:
@@ -105,6 +188,7 @@ class File(FactBase[Union[FileDict, Literal[False], None]]):
     """
 
     type = "file"
+    agent_handler = "stat"
 
     def command(self, path):
         return make_formatted_string_command(
@@ -119,34 +203,69 @@ class File(FactBase[Union[FileDict, Literal[False], None]]):
         )
 
     def process(self, output) -> Union[FileDict, Literal[False], None]:
-        match = re.match(STAT_REGEX, output[0])
-        if not match:
+        parsed = _parse_stat_line(output[0])
+        if not parsed:
             return None
 
-        mode = match.group(3)
-        path_type = FLAG_TO_TYPE[mode[0]]
-
-        data: FileDict = {
-            "user": match.group(1),
-            "group": match.group(2),
-            "mode": _parse_mode(mode[1:]),
-            "atime": _parse_datetime(match.group(4)),
-            "mtime": _parse_datetime(match.group(5)),
-            "ctime": _parse_datetime(match.group(6)),
-            "size": try_int(match.group(7)),
-        }
-
+        path_type, data = parsed
         if path_type != self.type:
             return False
 
-        if path_type == "link":
-            filename = match.group(8)
-            filename, target = filename.split(" -> ")
-            data["link_target"] = target.strip("'").lstrip("`")
-
         return data
 
 
+class FilesInfo(FactBase[Dict[str, Optional[FileInfoDict]]]):
+    """
+    Returns information about many paths on the remote system using a single command,
+    keyed by path:
+
+    .. code:: python
+
+        {
+            "/etc/motd": {
+                "type": "file",
+                "user": "pyinfra",
+                "group": "pyinfra",
+                "mode": 644,
+                "size": 3928,
+            },
+            "/etc/missing": None,
+        }
+
+    Paths that do not exist map to ``None``. The paths are passed in the command, so large
+    lists should be split with ``chunk_paths``.
+    """
+
+    default = dict
+    agent_handler = "stat_paths"
+
+    def command(self, paths):
+        self.paths = list(paths)
+        return _make_paths_command(
+            self.paths,
+            (
+                '! (test -e "$path" || test -L "$path") || '
+                '( {0} "$path" 2> /dev/null || {1} "$path" )'
+            ).format(LINUX_STAT_COMMAND, BSD_STAT_COMMAND),
+        )
+
+    def process(self, output) -> Dict[str, Optional[FileInfoDict]]:
+        paths_output = _split_paths_output(self.paths, output)
+        files: Dict[str, Optional[FileInfoDict]] = {}
+
+        for path in self.paths:
+            lines = paths_output.get(path)
+            parsed = _parse_stat_line(lines[0]) if lines else None
+            if not parsed:
+                files[path] = None
+                continue
+
+            path_type, data = parsed
+            files[path] = {"type": path_type, **data}  # type: ignore[typeddict-item]
+
+        return files
+
+
 class Link(File):
     """
     Returns information about a link on the remote system:
@@ -225,12 +344,12 @@ class HashFileFactBase(FactBaseOptionalStr):
     def __init_subclass__(cls, digits: int, cmds: List[str], **kwargs) -> None:
         super().__init_subclass__(**kwargs)
 
-        raw_hash_cmds = ["%s {0} 2> /dev/null" % cmd for cmd in cmds]
-        raw_hash_cmd = " || ".join(raw_hash_cmds)
-        cls._raw_cmd = "test -e {0} && ( %s ) || true" % raw_hash_cmd
+        cls.preferred_commands = cmds
+        cls._raw_cmd = cls._make_raw_cmd(cmds)
 
         assert cls.__name__.endswith("File")
         hash_name = cls.__name__[:-4].upper()
+        cls.agent_handler = hash_name.lower()
         cls._regexes = (
             # GNU coreutils style:
             r"^([a-fA-F0-9]{%d})\s+%%s$" % digits,
@@ -238,9 +357,21 @@ class HashFileFactBase(FactBaseOptionalStr):
             r"^%s\s+\(%%s\)\s+=\s+([a-fA-F0-9]{%d})$" % (hash_name, digits),
         )
 
+    @staticmethod
+    def _make_raw_cmd(cmds: List[str]) -> str:
+        raw_hash_cmds = ["%s {0} 2> /dev/null" % cmd for cmd in cmds]
+        raw_hash_cmd = " || ".join(raw_hash_cmds)
+        return "test -e {0} && ( %s ) || true" % raw_hash_cmd
+
     def command(self, path):
         self.path = path
-        return make_formatted_string_command(self._raw_cmd, QuoteString(path))
+
+        # Only use the hash command known to be on the host, rather than chaining all of them
+        raw_cmd = self._raw_cmd
+        if self.preferred_command:
+            raw_cmd = self._make_raw_cmd([self.preferred_command])
+
+        return make_formatted_string_command(raw_cmd, QuoteString(path))
 
     def process(self, output) -> Optional[str]:
         output = output[0]
@@ -259,6 +390,45 @@ class Sha1File(HashFileFactBase, digits=40, cmds=["sha1sum", "shasum", "sha1"]):
     """
 
 
+class Sha1Files(FactBase[Dict[str, Optional[str]]]):
+    """
+    Returns SHA1 hashes of many files using a single command, keyed by path. Files that
+    do not exist map to ``None``. The paths are passed in the command, so large lists
+    should be split with ``chunk_paths``.
+    """
+
+    default = dict
+    preferred_commands = Sha1File.preferred_commands
+    agent_handler = "sha1_paths"
+
+    def command(self, paths):
+        self.paths = list(paths)
+
+        raw_cmd = Sha1File._raw_cmd
+        if self.preferred_command:
+            raw_cmd = Sha1File._make_raw_cmd([self.preferred_command])
+
+        return _make_paths_command(self.paths, raw_cmd.format('"$path"'))
+
+    def process(self, output) -> Dict[str, Optional[str]]:
+        paths_output = _split_paths_output(self.paths, output)
+        hashes: Dict[str, Optional[str]] = {}
+
+        for path in self.paths:
+            lines = paths_output.get(path)
+            hashes[path] = None
+
+            if lines:
+                escaped_path = re.escape(path)
+                for regex in Sha1File._regexes:
+                    matches = re.match(regex % escaped_path, lines[0])
+                    if matches:
+                        hashes[path] = matches.group(1)
+                        break
+
+        return hashes
+
+
 class Sha256File(HashFileFactBase, digits=64, cmds=["sha256sum", "shasum -a 256", "sha256"]):
     """
     Returns a SHA256 hash of a file, or ``None`` if the file does not exist.
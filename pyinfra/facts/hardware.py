@@ -11,6 +11,7 @@ class Cpus(FactBase):
     """
 
     command = "getconf NPROCESSORS_ONLN 2> /dev/null || getconf _NPROCESSORS_ONLN"
+    cache_ttl = 60 * 60 * 24 * 7  # one week
 
     @staticmethod
     def process(output):
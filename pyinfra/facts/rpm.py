@@ -27,6 +27,10 @@ class RpmPackages(FactBase):
     def process(self, output):
         return parse_packages(rpm_regex, output)
 
+    def process_stream(self, output):
+        # Packages are parsed line by line, so no need to buffer the output
+        return self.process(output)
+
 
 class RpmPackage(FactBase):
     """
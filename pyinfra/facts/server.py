@@ -71,6 +71,7 @@ class KernelVersion(FactBase):
     """
 
     command = "uname -r"
+    cache_ttl = 60 * 60 * 24  # one day
 
 
 # Deprecated/renamed -> Kernel
@@ -83,6 +84,7 @@ class Os(FactBase[str]):
     """
 
     command = "uname -s"
+    cache_ttl = 60 * 60 * 24 * 7  # one week
 
 
 # Deprecated/renamed -> KernelVersion
@@ -105,6 +107,7 @@ class Arch(FactBase[str]):
     # ``uname -p`` is not portable and returns ``unknown`` on Debian.
     # ``uname -m`` works on most Linux and BSD systems.
     command = "uname -m"
+    cache_ttl = 60 * 60 * 24 * 7  # one week
 
 
 class Command(FactBase[str]):
@@ -546,6 +549,7 @@ class LinuxDistribution(FactBase[LinuxDistributionDict]):
         'do echo "/etc/${file}"; cat "/etc/${file}"; echo ---; '
         "done"
     )
+    cache_ttl = 60 * 60 * 24  # one day
 
     name_to_pretty_name = {
         "alpine": "Alpine",
@@ -42,13 +42,16 @@ from pyinfra.facts.files import (
     Block,
     Directory,
     File,
+    FilesInfo,
     FindFiles,
     FindInFile,
     Flags,
     Link,
     Md5File,
     Sha1File,
+    Sha1Files,
     Sha256File,
+    chunk_paths,
 )
 from pyinfra.facts.server import Date, Which
 
@@ -596,6 +599,21 @@ def sync(
             )
             put_files.append((full_filename, remote_full_filename))
 
+    # Load info & hashes for all the remote files in bulk, rather than one command per
+    # file. This must happen before yielding any commands, which reset the fact cache.
+    remote_files = {}
+    remote_sums = {}
+    for paths in chunk_paths([remote_filename for _, remote_filename in put_files]):
+        remote_files.update(host.get_fact(FilesInfo, paths=paths))
+
+    existing_remote_filenames = [
+        remote_filename
+        for remote_filename, remote_file in remote_files.items()
+        if remote_file and remote_file["type"] == "file"
+    ]
+    for paths in chunk_paths(existing_remote_filenames):
+        remote_sums.update(host.get_fact(Sha1Files, paths=paths))
+
     # Ensure the destination directory - if the destination is a link, ensure
     # the link target is a directory.
     dest_to_ensure = dest
@@ -619,16 +637,32 @@ def sync(
             mode=dir_mode or dir_mode_curr,
         )
 
-    # Put each file combination
+    # Put each file combination, using the remote file info & hashes loaded up front
     for local_filename, remote_filename in put_files:
-        yield from put._inner(
-            src=local_filename,
+        remote_file = remote_files.get(remote_filename)
+
+        # Uploading to an existing directory, let put figure out the destination filename
+        if remote_file and remote_file["type"] == "directory":
+            yield from put._inner(
+                src=local_filename,
+                dest=remote_filename,
+                user=user,
+                group=group,
+                mode=mode or get_path_permissions_mode(local_filename),
+                add_deploy_dir=False,
+                create_remote_dir=False,  # handled above
+            )
+            continue
+
+        yield from _put_file(
+            local_file=local_filename,
+            local_sum=get_file_sha1(local_filename),
             dest=remote_filename,
+            remote_file=remote_file if remote_file and remote_file["type"] == "file" else None,
             user=user,
             group=group,
-            mode=mode or get_path_permissions_mode(local_filename),
-            add_deploy_dir=False,
-            create_remote_dir=False,  # handled above
+            mode=ensure_mode_int(mode or get_path_permissions_mode(local_filename)),
+            remote_sums=remote_sums,
         )
 
     # Delete any extra files
@@ -853,6 +887,29 @@ def put(
     if create_remote_dir:
         yield from _create_remote_dir(dest, user, group)
 
+    yield from _put_file(
+        local_file=local_file,
+        local_sum=local_sum,
+        dest=dest,
+        remote_file=remote_file,
+        user=user,
+        group=group,
+        mode=mode,
+        force=force,
+    )
+
+
+def _put_file(
+    local_file,
+    local_sum,
+    dest,
+    remote_file,
+    user=None,
+    group=None,
+    mode=None,
+    force=False,
+    remote_sums=None,
+):
     # No remote file, always upload and user/group/mode if supplied
     if not remote_file or force:
         yield FileUploadCommand(
@@ -869,7 +926,10 @@ def put(
 
     # File exists, check sum and check user/group/mode if supplied
     else:
-        remote_sum = host.get_fact(Sha1File, path=dest)
+        if remote_sums and dest in remote_sums:
+            remote_sum = remote_sums[dest]
+        else:
+            remote_sum = host.get_fact(Sha1File, path=dest)
 
         # Check sha1sum, upload if needed
         if local_sum != remote_sum:
@@ -902,7 +962,56 @@ def put(
                 host.noop("file {0} is already uploaded".format(dest))
 
 
-@operation()
+def _render_template(src, data):
+    if not hasattr(src, "read") and state.cwd:
+        src = os.path.join(state.cwd, src)
+
+    # Ensure host/state/inventory are available inside templates (if not set)
+    data.setdefault("host", host)
+    data.setdefault("state", state)
+    data.setdefault("inventory", state.inventory)
+
+    # Render and make file-like it's output
+    try:
+        output = get_template(src).render(data)
+    except (TemplateRuntimeError, TemplateSyntaxError, UndefinedError) as e:
+        trace_frames = [
+            frame
+            for frame in traceback.extract_tb(sys.exc_info()[2])
+            if frame[2] in ("template", "<module>", "top-level template code")
+        ]  # thank you https://github.com/saltstack/salt/blob/master/salt/utils/templates.py
+
+        line_number = trace_frames[-1][1]
+
+        # Quickly read the line in question and one above/below for nicer debugging
+        with open(src, "r") as f:
+            template_lines = f.readlines()
+
+        template_lines = [line.strip() for line in template_lines]
+        relevant_lines = template_lines[max(line_number - 2, 0) : line_number + 1]
+
+        raise OperationError(
+            "Error in template: {0} (L{1}): {2}\n...\n{3}\n...".format(
+                src,
+                line_number,
+                e,
+                "\n".join(relevant_lines),
+            ),
+        )
+
+    return src, output
+
+
+def _get_template_local_inputs(
+    src, dest, user=None, group=None, mode=None, create_remote_dir=True, **data
+):
+    # Templates are rendered with the host/inventory, so fingerprint the output
+    # rather than the template itself.
+    _, output = _render_template(src, data)
+    return [output]
+
+
+@operation(local_inputs=_get_template_local_inputs)
 def template(src, dest, user=None, group=None, mode=None, create_remote_dir=True, **data):
     '''
     Generate a template using jinja2 and write it to the remote system.
@@ -978,41 +1087,7 @@ def template(src, dest, user=None, group=None, mode=None, create_remote_dir=True
         )
     '''
 
-    if not hasattr(src, "read") and state.cwd:
-        src = os.path.join(state.cwd, src)
-
-    # Ensure host/state/inventory are available inside templates (if not set)
-    data.setdefault("host", host)
-    data.setdefault("state", state)
-    data.setdefault("inventory", state.inventory)
-
-    # Render and make file-like it's output
-    try:
-        output = get_template(src).render(data)
-    except (TemplateRuntimeError, TemplateSyntaxError, UndefinedError) as e:
-        trace_frames = [
-            frame
-            for frame in traceback.extract_tb(sys.exc_info()[2])
-            if frame[2] in ("template", "<module>", "top-level template code")
-        ]  # thank you https://github.com/saltstack/salt/blob/master/salt/utils/templates.py
-
-        line_number = trace_frames[-1][1]
-
-        # Quickly read the line in question and one above/below for nicer debugging
-        with open(src, "r") as f:
-            template_lines = f.readlines()
-
-        template_lines = [line.strip() for line in template_lines]
-        relevant_lines = template_lines[max(line_number - 2, 0) : line_number + 1]
-
-        raise OperationError(
-            "Error in template: {0} (L{1}): {2}\n...\n{3}\n...".format(
-                src,
-                line_number,
-                e,
-                "\n".join(relevant_lines),
-            ),
-        )
+    src, output = _render_template(src, data)
 
     output_file = StringIO(output)
     # Set the template attribute for nicer debugging
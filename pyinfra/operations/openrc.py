@@ -48,8 +48,6 @@ def service(
 
         if enabled and not is_enabled:
             yield "rc-update add {0}".format(service)
-            openrc_enabled[service] = True
 
         if not enabled and is_enabled:
             yield "rc-update del {0}".format(service)
-            openrc_enabled[service] = False
@@ -136,7 +136,6 @@ def port(protocol, port_num, se_type=None, present=True):
     if present and (se_type is None):
         raise ValueError("se_type must have a valid value if present is set")
 
-    new_type = se_type if present else ""
     direct_get = len(host.get_fact(Which, command=SEPort.requires_command) or "") > 0
     if direct_get:
         current = host.get_fact(SEPort, protocol=protocol, port=port_num)
@@ -155,9 +154,3 @@ def port(protocol, port_num, se_type=None, present=True):
             yield StringCommand("semanage", "port", "-d", "-p", protocol, port_num)
         else:
             host.noop(f"setype for '{protocol}/{port_num}' is already unset")
-
-    if (present and (option != "")) or (not present and (current != "")):
-        if not direct_get:
-            if protocol not in port_info:
-                port_info[protocol] = {}
-            port_info[protocol][str(port_num)] = new_type
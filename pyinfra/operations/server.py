@@ -8,7 +8,7 @@ from io import StringIO
 from itertools import filterfalse, tee
 from os import path
 from time import sleep
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 from pyinfra import host, logger, state
 from pyinfra.api import FunctionCommand, OperationError, StringCommand, operation
@@ -343,7 +343,13 @@ def mount(
         )
 
 
-@operation()
+@operation(
+    prefetch_facts=[
+        (Hostname, {}),
+        (Which, {"command": "hostnamectl"}),
+        (Os, {}),
+    ],
+)
 def hostname(hostname, hostname_file=None):
     """
     Set the system hostname using ``hostnamectl`` or ``hostname`` on older systems.
@@ -478,30 +484,50 @@ def service(
         )
     """
 
-    service_operation: "PyinfraOperation"
+    service_operation: Optional["PyinfraOperation"] = None
 
+    # Only load the checks for other init systems once systemd is ruled out, each stage of
+    # fallbacks in a single batch rather than a command per fact.
     if host.get_fact(Which, command="systemctl"):
         service_operation = systemd.service
 
-    elif host.get_fact(Which, command="rc-service"):
-        service_operation = openrc.service
+    else:
+        host.prefetch_facts(
+            [(Which, {"command": command}) for command in ("rc-service", "initctl", "service")],
+        )
+
+        if host.get_fact(Which, command="rc-service"):
+            service_operation = openrc.service
 
-    elif host.get_fact(Which, command="initctl"):
-        service_operation = upstart.service
+        elif host.get_fact(Which, command="initctl"):
+            service_operation = upstart.service
 
-    elif (
-        host.get_fact(Which, command="service")
-        or host.get_fact(Link, path="/etc/init.d")
-        or host.get_fact(Directory, path="/etc/init.d")
-    ):
-        service_operation = sysvinit.service
+        elif host.get_fact(Which, command="service"):
+            service_operation = sysvinit.service
 
-    # NOTE: important that we are not Linux here because /etc/rc.d will exist but checking it's
-    # contents may trigger things (like a reboot: https://github.com/Fizzadar/pyinfra/issues/819)
-    elif host.get_fact(Os) != "Linux" and bool(host.get_fact(Directory, path="/etc/rc.d")):
-        service_operation = bsdinit.service
+        else:
+            host.prefetch_facts(
+                [
+                    (Link, {"path": "/etc/init.d"}),
+                    (Directory, {"path": "/etc/init.d"}),
+                    (Os, {}),
+                    (Directory, {"path": "/etc/rc.d"}),
+                ],
+            )
 
-    else:
+            if host.get_fact(Link, path="/etc/init.d") or host.get_fact(
+                Directory,
+                path="/etc/init.d",
+            ):
+                service_operation = sysvinit.service
+
+            # NOTE: important that we are not Linux here because /etc/rc.d will exist but checking
+            # it's contents may trigger things (like a reboot:
+            # https://github.com/Fizzadar/pyinfra/issues/819)
+            elif host.get_fact(Os) != "Linux" and bool(host.get_fact(Directory, path="/etc/rc.d")):
+                service_operation = bsdinit.service
+
+    if service_operation is None:
         raise OperationError(
             ("No init system found " "(no systemctl, initctl, /etc/init.d or /etc/rc.d found)"),
         )
@@ -516,7 +542,23 @@ def service(
     )
 
 
-@operation()
+@operation(
+    prefetch_facts=[
+        (Which, {"command": command})
+        for command in (
+            "zypper",
+            "apk",
+            "apt",
+            "brew",
+            "dnf",
+            "pacman",
+            "xbps",
+            "yum",
+            "pkg",
+            "pkg_add",
+        )
+    ],
+)
 def packages(
     packages,
     present=True,
@@ -757,7 +799,7 @@ def crontab(
         )
 
 
-@operation()
+@operation(prefetch_facts=[(Groups, {}), (Os, {})])
 def group(group, present=True, system=False, gid=None):
     """
     Add/remove system groups.
@@ -921,7 +963,7 @@ def user_authorized_keys(
             yield from files.line._inner(path=authorized_key_file, line=key, ensure_newline=True)
 
 
-@operation()
+@operation(prefetch_facts=[(Users, {}), (Groups, {}), (Os, {})])
 def user(
     user,
     present=True,
@@ -86,7 +86,6 @@ def package(
                 # the channel is different
                 if pkg_info and "channel" in pkg_info and channel != pkg_info["channel"]:
                     refresh_packages.append(package)
-                    pkg_info["channel"] = channel
 
             else:
                 # we don't want it
@@ -3,7 +3,7 @@ import sys
 import warnings
 from fnmatch import fnmatch
 from os import chdir as os_chdir, getcwd, path
-from typing import Iterable, List, Tuple, Union
+from typing import Iterable, List, Optional, Tuple, Union
 
 import click
 
@@ -13,6 +13,7 @@ from pyinfra.api.connect import connect_all, disconnect_all
 from pyinfra.api.exceptions import NoGroupError, PyinfraError
 from pyinfra.api.facts import get_facts
 from pyinfra.api.operations import run_ops
+from pyinfra.api.shards import prepare_shards, run_shard_ops
 from pyinfra.api.state import StateStage
 from pyinfra.api.util import get_kwargs_str
 from pyinfra.context import ctx_config, ctx_inventory, ctx_state
@@ -23,6 +24,8 @@ from .exceptions import CliError, UnexpectedExternalError, UnexpectedInternalErr
 from .inventory import make_inventory
 from .log import setup_logging
 from .prints import (
+    print_concurrency,
+    print_fact_stats,
     print_facts,
     print_inventory,
     print_meta,
@@ -30,13 +33,22 @@ from .prints import (
     print_state_operations,
     print_support_info,
 )
-from .util import exec_file, load_deploy_file, load_func, parse_cli_arg
+from .util import FactStatsCallback, exec_file, load_deploy_file, load_func, parse_cli_arg
 from .virtualenv import init_virtualenv
 
 
 def _exit():
-    if ctx_state.isset() and state.failed_hosts:
-        sys.exit(1)
+    if ctx_state.isset():
+        if state.fact_stats:
+            logger.info("--> Slowest facts:")
+            print_fact_stats(state.fact_stats)
+
+        if state.pool.get_limits():
+            logger.info("--> Concurrency:")
+            print_concurrency(state)
+
+        if state.failed_hosts:
+            sys.exit(1)
     sys.exit(0)
 
 
@@ -79,6 +91,18 @@ def _print_support(ctx, param, value):
     multiple=True,
 )
 @click.option("--fail-percent", type=int, help="% of hosts that need to fail before exiting early.")
+@click.option(
+    "--fail-fast",
+    is_flag=True,
+    default=False,
+    help="Stop starting operations as soon as --fail-percent (or any) hosts fail.",
+)
+@click.option(
+    "--fail-fast-cancel",
+    is_flag=True,
+    default=False,
+    help="As --fail-fast, also cancelling running operations between commands.",
+)
 @click.option(
     "--data",
     multiple=True,
@@ -117,6 +141,12 @@ def _print_support(ctx, param, value):
 @click.option("--shell-executable", help='Shell to use (ex: "sh", "cmd", "ps").')
 # Operation flow args
 @click.option("--parallel", type=int, help="Number of operations to run in parallel.")
+@click.option(
+    "--adaptive-parallel",
+    is_flag=True,
+    default=False,
+    help="Adjust the number of hosts run in parallel (up to --parallel) as the run progresses.",
+)
 @click.option(
     "--no-wait",
     is_flag=True,
@@ -129,6 +159,72 @@ def _print_support(ctx, param, value):
     default=False,
     help="Run operations in serial, host by host.",
 )
+@click.option(
+    "--processes",
+    type=int,
+    default=1,
+    help="Split the inventory over this many processes to connect & prepare operations.",
+)
+# Fact cache args
+@click.option(
+    "--fact-cache",
+    type=click.Path(dir_okay=False),
+    help="Persist rarely changing facts between runs in this file.",
+    envvar="PYINFRA_FACT_CACHE",
+    show_envvar=True,
+)
+@click.option(
+    "--no-fact-cache",
+    is_flag=True,
+    default=False,
+    help="Disable the persistent fact cache for this run.",
+)
+@click.option(
+    "--refresh-fact-cache",
+    is_flag=True,
+    default=False,
+    help="Clear the persistent fact cache before running.",
+)
+@click.option(
+    "--fact-agent",
+    is_flag=True,
+    default=False,
+    help="Upload a helper script to hosts to answer batched facts in a single process.",
+)
+@click.option(
+    "--record-facts",
+    type=click.Path(dir_okay=False),
+    help="Record every fact loaded while preparing operations to this file.",
+)
+@click.option(
+    "--replay-facts",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Prepare operations using facts recorded with --record-facts, without connecting.",
+)
+@click.option(
+    "--group-equivalent-hosts",
+    is_flag=True,
+    default=False,
+    help="Check operations once for hosts with the same arguments, data & facts.",
+)
+@click.option(
+    "--pipeline-commands",
+    is_flag=True,
+    default=False,
+    help="Execute consecutive shell commands of each operation as a single script.",
+)
+@click.option(
+    "--concurrent-ops",
+    type=int,
+    help="Execute up to this many independent operations at once on each host.",
+)
+@click.option(
+    "--plan-cache",
+    type=click.Path(dir_okay=False),
+    help="Skip operations that made no changes on previous runs while their inputs are unchanged.",
+    envvar="PYINFRA_PLAN_CACHE",
+    show_envvar=True,
+)
 # SSH connector args
 # TODO: remove the non-ssh-prefixed variants
 @click.option("--ssh-user", "--user", "ssh_user", help="SSH user to connect as.")
@@ -180,6 +276,12 @@ def _print_support(ctx, param, value):
     default=False,
     help="Print operations after generating and exit.",
 )
+@click.option(
+    "--fact-stats",
+    is_flag=True,
+    default=False,
+    help="Print the slowest facts to load at the end of the run.",
+)
 @click.version_option(
     version=__version__,
     prog_name="pyinfra",
@@ -279,6 +381,21 @@ def _main(
     debug_all: bool,
     debug_facts: bool,
     debug_operations: bool,
+    fact_cache: Optional[str] = None,
+    no_fact_cache: bool = False,
+    refresh_fact_cache: bool = False,
+    fact_agent: bool = False,
+    record_facts: Optional[str] = None,
+    replay_facts: Optional[str] = None,
+    plan_cache: Optional[str] = None,
+    group_equivalent_hosts: bool = False,
+    pipeline_commands: bool = False,
+    concurrent_ops: Optional[int] = None,
+    adaptive_parallel: bool = False,
+    fail_fast: bool = False,
+    fail_fast_cancel: bool = False,
+    fact_stats: bool = False,
+    processes: int = 1,
     support: bool = False,
 ):
     # Setup working directory
@@ -314,6 +431,18 @@ def _main(
         shell_executable,
         fail_percent,
         yes,
+        fact_cache,
+        no_fact_cache,
+        fact_agent,
+        record_facts,
+        replay_facts,
+        plan_cache,
+        group_equivalent_hosts,
+        pipeline_commands,
+        concurrent_ops,
+        adaptive_parallel,
+        fail_fast,
+        fail_fast_cancel,
     )
     override_data = _set_override_data(
         data,
@@ -344,21 +473,44 @@ def _main(
     # Initialise the state
     state.init(inventory, config, initial_limit=initial_limit)
 
+    if fact_stats:
+        state.add_callback_handler(FactStatsCallback())
+
+    if refresh_fact_cache and state.fact_store:
+        state.fact_store.clear()
+
     if command == CliCommands.DEBUG_INVENTORY:
         print_inventory(state)
         _exit()
 
     # Connect to the hosts & start handling the user commands
     #
-    logger.info("--> Connecting to hosts...")
     state.set_stage(StateStage.Connect)
-    connect_all(state)
+    if replay_facts:
+        logger.info("--> Replaying facts from: {0}".format(replay_facts))
 
-    logger.info("--> Preparing operations...")
-    state.set_stage(StateStage.Prepare)
-    can_diff, state, config = _handle_commands(
-        state, config, command, original_operations, operations
-    )
+    # Facts are printed as they are gathered so cannot be split over processes
+    if processes > 1 and command != CliCommands.FACT:
+        logger.info(
+            "--> Connecting to hosts & preparing operations in {0} processes...".format(processes),
+        )
+
+        def prepare(state):
+            state.set_stage(StateStage.Prepare)
+            _handle_commands(state, config, command, original_operations, operations)
+
+        prepare_shards(state, lambda state: _connect_hosts(state, replay_facts), prepare, processes)
+        state.set_stage(StateStage.Prepare)
+        can_diff = command != CliCommands.SHELL
+
+    else:
+        _connect_hosts(state, replay_facts)
+
+        logger.info("--> Preparing operations...")
+        state.set_stage(StateStage.Prepare)
+        can_diff, state, config = _handle_commands(
+            state, config, command, original_operations, operations
+        )
 
     # Print proposed changes, execute unless --dry, and exit
     #
@@ -376,7 +528,8 @@ def _main(
 
         _exit()
 
-    if dry:
+    # Nothing can be executed without connecting to the hosts
+    if dry or replay_facts:
         _exit()
 
     if (
@@ -388,7 +541,10 @@ def _main(
 
     logger.info("--> Beginning operation run...")
     state.set_stage(StateStage.Execute)
-    run_ops(state, serial=serial, no_wait=no_wait)
+    if state.shards:
+        run_shard_ops(state, serial=serial, no_wait=no_wait)
+    else:
+        run_ops(state, serial=serial, no_wait=no_wait)
 
     logger.info("--> Results:")
     state.set_stage(StateStage.Disconnect)
@@ -396,6 +552,17 @@ def _main(
     _exit()
 
 
+def _connect_hosts(state: State, replay_facts: Optional[str]) -> None:
+    if replay_facts:
+        # Facts are read from the recording so there's no need to connect to any hosts
+        for host in state.inventory:
+            if state.is_host_in_limit(host):
+                state.activate_host(host)
+    else:
+        logger.info("--> Connecting to hosts...")
+        connect_all(state)
+
+
 def _do_confirm(msg: str) -> bool:
     click.echo(err=True)
     click.echo(f"    {msg}", err=True)
@@ -544,6 +711,18 @@ def _set_config(
     shell_executable,
     fail_percent,
     yes,
+    fact_cache,
+    no_fact_cache,
+    fact_agent=False,
+    record_facts=None,
+    replay_facts=None,
+    plan_cache=None,
+    group_equivalent_hosts=False,
+    pipeline_commands=False,
+    concurrent_ops=None,
+    adaptive_parallel=False,
+    fail_fast=False,
+    fail_fast_cancel=False,
 ):
     logger.info("--> Loading config...")
 
@@ -572,12 +751,48 @@ def _set_config(
     if parallel:
         config.PARALLEL = parallel
 
+    if adaptive_parallel:
+        config.ADAPTIVE_PARALLEL = True
+
     if shell_executable:
         config.SHELL = None if shell_executable in ("None", "null") else shell_executable
 
     if fail_percent is not None:
         config.FAIL_PERCENT = fail_percent
 
+    if fail_fast:
+        config.FAIL_FAST = True
+
+    if fail_fast_cancel:
+        config.FAIL_FAST_CANCEL = True
+
+    if fact_cache:
+        config.FACT_CACHE = fact_cache
+
+    if no_fact_cache:
+        config.FACT_CACHE = None
+
+    if fact_agent:
+        config.FACT_AGENT = True
+
+    if record_facts:
+        config.FACT_RECORD = record_facts
+
+    if replay_facts:
+        config.FACT_REPLAY = replay_facts
+
+    if plan_cache:
+        config.PLAN_CACHE = plan_cache
+
+    if group_equivalent_hosts:
+        config.GROUP_EQUIVALENT_HOSTS = True
+
+    if pipeline_commands:
+        config.PIPELINE_COMMANDS = True
+
+    if concurrent_ops:
+        config.CONCURRENT_OPS = concurrent_ops
+
     return config
 
 
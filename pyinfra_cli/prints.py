@@ -14,6 +14,7 @@ from pyinfra.api.host import Host
 from .util import json_encode
 
 if TYPE_CHECKING:
+    from pyinfra.api.facts import FactStats
     from pyinfra.api.state import State
 
 
@@ -67,7 +68,7 @@ def print_state_operations(state: "State"):
     click.echo(err=True)
     for op_hash in state.get_op_order():
         meta = state.op_meta[op_hash]
-        hosts = set(host for host, operations in state.ops.items() if op_hash in operations)
+        hosts = state.get_op_hosts(op_hash)
 
         click.echo(
             "    {0} (names={1}, hosts={2})".format(
@@ -223,14 +224,16 @@ def print_meta(state: "State"):
     for op_hash in state.get_op_order():
         hosts_in_op = []
         hosts_maybe_in_op = []
-        for host in state.inventory.iter_activated_hosts():
-            if op_hash in state.ops[host]:
-                op_data = state.get_op_data_for_host(host, op_hash)
-                if op_data.operation_meta._maybe_is_change:
-                    if op_data.global_arguments["_if"]:
-                        hosts_maybe_in_op.append(host.name)
-                    else:
-                        hosts_in_op.append(host.name)
+        for host in state.get_op_hosts(op_hash):
+            if host not in state.activated_hosts:
+                continue
+
+            op_data = state.get_op_data_for_host(host, op_hash)
+            if op_data.operation_meta._maybe_is_change:
+                if op_data.global_arguments["_if"]:
+                    hosts_maybe_in_op.append(host.name)
+                else:
+                    hosts_in_op.append(host.name)
 
         rows.append(
             (
@@ -266,8 +269,8 @@ def print_results(state: "State"):
         hosts_in_op_success: list[str] = []
         hosts_in_op_error: list[str] = []
         hosts_in_op_no_attempt: list[str] = []
-        for host in state.inventory.iter_activated_hosts():
-            if op_hash not in state.ops[host]:
+        for host in state.get_op_hosts(op_hash):
+            if host not in state.activated_hosts:
                 continue
 
             hosts_in_op += 1
@@ -306,6 +309,115 @@ def print_results(state: "State"):
     print_rows(rows)
 
 
+def print_concurrency(state: "State"):
+    """
+    Print the concurrency chosen for each stage with ``Config.ADAPTIVE_PARALLEL``.
+    """
+
+    rows: List[Tuple[Callable, Union[List[str], str]]] = [
+        (logger.info, ["Stage", "Concurrency", "Peak", "Samples", "Errors"]),
+    ]
+
+    for stage in state.pool.get_limits():
+        controller = state.pool.controllers[stage]
+        rows.append(
+            (
+                logger.info,
+                [
+                    stage,
+                    str(controller.limit),
+                    str(controller.peak_limit),
+                    str(controller.samples),
+                    str(controller.errors),
+                ],
+            ),
+        )
+
+    print_rows(rows)
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def print_fact_stats(fact_stats: List[Tuple[Host, "FactStats"]], limit: int = 10):
+    """
+    Print the facts that took the longest to load across all hosts. Facts loaded together in
+    a batch are each counted as an equal share of the batch time.
+    """
+
+    totals: Dict[str, Dict] = {}
+
+    for host, stats in fact_stats:
+        total = totals.setdefault(
+            stats.name,
+            {
+                "calls": 0,
+                "hosts": set(),
+                "wall_time": 0.0,
+                "max_wall_time": 0.0,
+                "process_time": 0.0,
+                "stdout_bytes": 0,
+                "stderr_bytes": 0,
+                "errors": 0,
+            },
+        )
+        wall_time = stats.wall_time / stats.batch_size
+
+        total["calls"] += 1
+        total["hosts"].add(host.name)
+        total["wall_time"] += wall_time
+        total["max_wall_time"] = max(total["max_wall_time"], wall_time)
+        total["process_time"] += stats.process_time
+        total["stdout_bytes"] += stats.stdout_bytes
+        total["stderr_bytes"] += stats.stderr_bytes
+        if stats.exit_code:
+            total["errors"] += 1
+
+    rows: List[Tuple[Callable, Union[List[str], str]]] = [
+        (
+            logger.info,
+            [
+                "Fact",
+                "Calls",
+                "Hosts",
+                "Time",
+                "Max Time",
+                "Process Time",
+                "Stdout",
+                "Stderr",
+                "Non-zero Exit",
+            ],
+        ),
+    ]
+
+    slowest_facts = sorted(totals.items(), key=lambda item: item[1]["wall_time"], reverse=True)
+
+    for name, total in slowest_facts[:limit]:
+        rows.append(
+            (
+                logger.info,
+                [
+                    name,
+                    str(total["calls"]),
+                    str(len(total["hosts"])),
+                    "{0:.3f}s".format(total["wall_time"]),
+                    "{0:.3f}s".format(total["max_wall_time"]),
+                    "{0:.3f}s".format(total["process_time"]),
+                    _format_bytes(total["stdout_bytes"]),
+                    _format_bytes(total["stderr_bytes"]),
+                    str(total["errors"]) if total["errors"] else "-",
+                ],
+            ),
+        )
+
+    print_rows(rows)
+
+
 def get_fucked(state: "State"):
     group_combinations = _get_group_combinations(state.inventory.iter_activated_hosts())
     rows: List[Tuple[Callable, Union[List[str], str]]] = []
@@ -16,10 +16,13 @@ import gevent
 
 from pyinfra import logger, state
 from pyinfra.api.command import PyinfraCommand
+from pyinfra.api.concurrency import FACTS_STAGE
 from pyinfra.api.exceptions import PyinfraError
-from pyinfra.api.host import HostData
+from pyinfra.api.facts import FactStats
+from pyinfra.api.host import Host, HostData
 from pyinfra.api.operation import OperationMeta
 from pyinfra.api.state import (
+    BaseStateCallback,
     State,
     StateHostMeta,
     StateHostResults,
@@ -35,6 +38,16 @@ from .exceptions import CliError, UnexpectedExternalError
 PYTHON_CODES: dict[str, CodeType] = {}
 
 
+class FactStatsCallback(BaseStateCallback):
+    """
+    Collects the stats of every fact loaded during the run on the state, for ``--fact-stats``.
+    """
+
+    @staticmethod
+    def fact_end(state: "State", host: Host, fact_stats: FactStats):
+        state.fact_stats.append((host, fact_stats))
+
+
 def is_subdir(child, parent):
     child = path.realpath(child)
     parent = path.realpath(parent)
@@ -206,17 +219,19 @@ def _parallel_load_hosts(state: "State", callback: Callable, name: str):
         except Exception as e:
             return e
 
-    greenlet_to_host = {
-        state.pool.spawn(load_file, host): host for host in state.inventory.iter_active_hosts()
-    }
-
-    with progress_spinner(greenlet_to_host.values()) as progress:
-        for greenlet in gevent.iwait(greenlet_to_host.keys()):
-            host = greenlet_to_host[greenlet]
-            result = greenlet.get()
-            if isinstance(result, Exception):
-                raise result
-            progress(host)
+    with state.pool.use_stage(FACTS_STAGE):
+        greenlet_to_host = {
+            state.pool.spawn(load_file, host): host
+            for host in state.inventory.iter_active_hosts()
+        }
+
+        with progress_spinner(greenlet_to_host.values()) as progress:
+            for greenlet in gevent.iwait(greenlet_to_host.keys()):
+                host = greenlet_to_host[greenlet]
+                result = greenlet.get()
+                if isinstance(result, Exception):
+                    raise result
+                progress(host)
 
 
 def load_deploy_file(state: "State", filename):
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+"""
+Microbenchmark of ``pyinfra.api.util.make_hash`` over typical operation order, fact and
+operation argument shapes, compared with the previous (hash every nested value) version.
+"""
+
+from hashlib import sha1
+from timeit import repeat
+
+from pyinfra.api.util import make_hash
+from pyinfra.facts.files import File
+
+NUMBER = 20000
+
+EXECUTOR_KWARGS = {
+    "_sudo": True,
+    "_sudo_user": None,
+    "_su_user": None,
+    "_use_sudo_password": False,
+    "_preserve_sudo_env": False,
+    "_shell_executable": "sh",
+    "_chdir": None,
+    "_env": {},
+    "_timeout": None,
+    "_get_pty": False,
+    "_stdin": None,
+    "_success_exit_codes": [0],
+}
+
+CASES = {
+    "op order": (3, 12, 4, 7),
+    "fact": (File, {"path": "/etc/nginx/nginx.conf"}, EXECUTOR_KWARGS),
+    "op kwargs": {
+        "packages": ["nginx", "curl", "git", "htop", "vim"] * 4,
+        "present": True,
+        "latest": False,
+        "update": True,
+        "cache_time": 3600,
+    },
+}
+
+
+def nested_make_hash(obj):
+    if isinstance(obj, (set, tuple, list)):
+        hash_string = "".join([nested_make_hash(e) for e in obj])
+    elif isinstance(obj, dict):
+        hash_string = "".join("".join((key, nested_make_hash(value))) for key, value in obj.items())
+    else:
+        hash_string = (
+            "{0}".format(obj)
+            if isinstance(obj, int)
+            else "_PYINFRA_CONSTANT"
+            if obj in (True, False, None)
+            else obj
+            if isinstance(obj, str)
+            else obj.__name__
+            if hasattr(obj, "__name__")
+            else obj.name
+            if hasattr(obj, "name")
+            else repr(obj)
+        )
+    return sha1(hash_string.encode("utf-8")).hexdigest()
+
+
+def benchmark():
+    for name, obj in CASES.items():
+        timings = []
+        for func in (nested_make_hash, make_hash):
+            best = min(repeat(lambda: func(obj), number=NUMBER, repeat=5))
+            timings.append(best / NUMBER * 1_000_000)
+
+        print(
+            "{0:<10} nested: {1:6.2f}us  make_hash: {2:6.2f}us  ({3:.1f}x)".format(
+                name,
+                timings[0],
+                timings[1],
+                timings[0] / timings[1],
+            ),
+        )
+
+
+if __name__ == "__main__":
+    benchmark()
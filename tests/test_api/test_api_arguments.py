@@ -2,6 +2,7 @@ from unittest import TestCase
 
 from pyinfra.api import Config, Inventory, State
 from pyinfra.api.arguments import pop_global_arguments
+from pyinfra.api.exceptions import ArgumentTypeError
 
 
 class TestOperationKwargs(TestCase):
@@ -53,3 +54,20 @@ class TestOperationKwargs(TestCase):
         assert kwargs["_sudo"] is True
         assert kwargs["_sudo_user"] == "deploy-kwarg-user"
         assert "_sudo" in keys
+
+    def test_invalid_type(self):
+        inventory = Inventory((("somehost",), {}))
+        state = State(config=Config(), inventory=inventory)
+        somehost = inventory.get_host("somehost")
+
+        # Valid values are only type checked once, invalid ones must always raise
+        for _ in range(2):
+            pop_global_arguments({"_sudo_user": "someuser"}, state=state, host=somehost)
+
+            with self.assertRaises(ArgumentTypeError):
+                pop_global_arguments({"_sudo_user": 1}, state=state, host=somehost)
+
+        # Container values are always checked as the type alone doesn't validate the items
+        pop_global_arguments({"_env": {"key": "value"}}, state=state, host=somehost)
+        with self.assertRaises(ArgumentTypeError):
+            pop_global_arguments({"_env": {"key": 1}}, state=state, host=somehost)
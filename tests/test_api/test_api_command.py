@@ -1,3 +1,4 @@
+from subprocess import run
 from unittest import TestCase
 
 try:
@@ -19,6 +20,8 @@ from pyinfra.api import (
     StringCommand,
 )
 from pyinfra.api.command import PyinfraCommand
+from pyinfra.api.command_pipeline import CommandPipeline, iter_command_batches
+from pyinfra.connectors.util import OutputLine
 
 
 class TestBaseCommand(TestCase):
@@ -100,3 +103,93 @@ class TestFunctionCommand(TestCase):
 
         cmd = FunctionCommand(some_function, (), {})
         assert repr(cmd) == "FunctionCommand(some_function, (), {})"
+
+
+class TestCommandPipeline(TestCase):
+    def _run_pipeline(self, pipeline):
+        process = run(
+            pipeline.command.get_raw_value(),
+            shell=True,
+            capture_output=True,
+            text=True,
+        )
+        output = [OutputLine("stdout", line) for line in process.stdout.splitlines()]
+        output.extend(OutputLine("stderr", line) for line in process.stderr.splitlines())
+        return [
+            (status, command_output.exit_code, command_output.output_lines)
+            for status, command_output in pipeline.get_results(output)
+        ]
+
+    def test_iter_command_batches(self):
+        upload = FileUploadCommand("src", "dest")
+        commands = [
+            StringCommand("echo", "one"),
+            StringCommand("echo", "two"),
+            upload,
+            StringCommand("echo", "three"),
+            StringCommand("echo", "four", _sudo=True),
+            StringCommand("echo", "five", _stdin="input"),
+        ]
+
+        batches = list(iter_command_batches(commands, {"_sudo": False}))
+        assert batches == [
+            commands[:2],
+            [upload],
+            [commands[3]],
+            [commands[4]],
+            [commands[5]],
+        ]
+
+    def test_command_pipeline(self):
+        pipeline = CommandPipeline(
+            [
+                StringCommand("echo one && echo error >&2"),
+                StringCommand("exit 3"),
+                StringCommand("echo three"),
+            ],
+        )
+
+        assert self._run_pipeline(pipeline) == [
+            (True, 0, ["one", "error"]),
+            (False, 3, []),
+        ]
+
+    def test_command_pipeline_continue_on_error(self):
+        pipeline = CommandPipeline(
+            [
+                StringCommand("exit 3"),
+                StringCommand("false"),
+                StringCommand("echo three"),
+            ],
+            success_exit_codes=[0, 3],
+            continue_on_error=True,
+        )
+
+        assert self._run_pipeline(pipeline) == [
+            (True, 3, []),
+            (False, 1, []),
+            (True, 0, ["three"]),
+        ]
+
+    def test_command_pipeline_no_trailing_newline(self):
+        pipeline = CommandPipeline(
+            [
+                StringCommand("printf one && printf error >&2"),
+                StringCommand("echo two"),
+            ],
+        )
+
+        assert self._run_pipeline(pipeline) == [
+            (True, 0, ["one", "error"]),
+            (True, 0, ["two"]),
+        ]
+
+    def test_command_pipeline_no_markers(self):
+        pipeline = CommandPipeline([StringCommand("echo one"), StringCommand("echo two")])
+
+        # Ie the command timed out
+        results = pipeline.get_results([OutputLine("stdout", "one")])
+
+        assert len(results) == 1
+        assert results[0][0] is False
+        assert results[0][1].output_lines == ["one"]
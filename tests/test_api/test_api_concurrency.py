@@ -0,0 +1,125 @@
+from unittest import TestCase
+
+import gevent
+
+from pyinfra.api import Config, State
+from pyinfra.api.concurrency import (
+    CONNECT_STAGE,
+    EXECUTE_STAGE,
+    FACTS_STAGE,
+    AdaptivePool,
+    ConcurrencyController,
+)
+from pyinfra.api.connect import connect_all
+from pyinfra.api.facts import get_facts
+from pyinfra.facts.server import Arch, Os
+
+from ..paramiko_util import PatchSSHTestCase
+from ..util import make_inventory
+
+
+class TestConcurrencyController(TestCase):
+    def test_increase_when_limited(self):
+        controller = ConcurrencyController(EXECUTE_STAGE, 8, 100)
+
+        controller.update(1.0, 0, 0.1, limited=True)
+        assert controller.limit == 10
+
+        # Only increase when the pool was full
+        controller.update(1.0, 0, 0.1, limited=False)
+        assert controller.limit == 10
+
+    def test_decrease(self):
+        controller = ConcurrencyController(EXECUTE_STAGE, 40, 100)
+
+        # Latency increased
+        controller.update(3.0, 0, 0.1, limited=True)
+        assert controller.limit == 30
+
+        # CPU saturated
+        controller.update(1.0, 0, 1.0, limited=True)
+        assert controller.limit == 22
+
+        # Connection errors
+        controller.update(1.0, 1, 0.1, limited=True)
+        assert controller.limit == 11
+        assert controller.peak_limit == 40
+
+    def test_limits(self):
+        controller = ConcurrencyController(CONNECT_STAGE, 200, 50, minimum=2)
+        assert controller.limit == 50
+
+        controller.update(1.0, 0, 0.1, limited=True)
+        assert controller.limit == 50
+
+        for _ in range(10):
+            controller.update(1.0, 1, 0.1, limited=True)
+        assert controller.limit == 2
+
+    def test_add_sample_latency_per_key(self):
+        controller = ConcurrencyController(EXECUTE_STAGE, 20, 100)
+
+        # Slow & fast operations at their usual latency
+        for _ in range(5):
+            controller.add_sample(10.0, key="slow")
+            controller.add_sample(0.1, key="fast")
+        assert controller.limit == 20
+
+        for _ in range(10):
+            controller.add_sample(1.0, key="fast")
+        assert controller.limit == 15
+        assert controller.samples == 20
+
+
+class TestAdaptivePool(TestCase):
+    def test_pool_stage_limit(self):
+        pool = AdaptivePool(10, {EXECUTE_STAGE: ConcurrencyController(EXECUTE_STAGE, 2, 10)})
+        running = []
+        max_running = []
+
+        def work():
+            running.append(1)
+            max_running.append(len(running))
+            gevent.sleep(0.01)
+            running.pop()
+
+        with pool.use_stage(EXECUTE_STAGE):
+            greenlets = [pool.spawn(work) for _ in range(6)]
+        gevent.joinall(greenlets)
+        assert max(max_running) == 2
+        assert pool.controllers[EXECUTE_STAGE].window_limited
+
+        # Other stages are only limited by the pool size
+        max_running.clear()
+        with pool.use_stage(FACTS_STAGE):
+            greenlets = [pool.spawn(work) for _ in range(6)]
+        gevent.joinall(greenlets)
+        assert max(max_running) == 6
+
+
+class TestAdaptiveParallelState(PatchSSHTestCase):
+    def test_adaptive_parallel(self):
+        inventory = make_inventory()
+        state = State(inventory, Config(ADAPTIVE_PARALLEL=True))
+
+        # The pool is sized for every host, each stage starting from the default
+        assert state.config.PARALLEL == len(inventory)
+        assert set(state.pool.controllers) == {CONNECT_STAGE, FACTS_STAGE, EXECUTE_STAGE}
+
+        connect_all(state)
+        assert state.pool.get_limits() == {CONNECT_STAGE: len(inventory)}
+        assert state.pool.controllers[CONNECT_STAGE].samples == len(inventory)
+
+    def test_adaptive_parallel_fact_latency_keys(self):
+        inventory = make_inventory()
+        state = State(inventory, Config(ADAPTIVE_PARALLEL=True))
+        connect_all(state)
+
+        get_facts(state, Os)
+        get_facts(state, Arch)
+
+        # Fact latencies are compared per fact rather than all together
+        assert set(state.pool.controllers[FACTS_STAGE].min_latencies) == {
+            Os.name,
+            Arch.name,
+        }
@@ -122,3 +122,27 @@ class TestDeploysApi(PatchSSHTestCase):
         assert state.ops[somehost][third_op_hash].operation_meta._commands == [
             StringCommand("echo second command"),
         ]
+
+    def test_deploy_data_defaults(self):
+        inventory = make_inventory(hosts=("somehost",))
+        somehost = inventory.get_host("somehost")
+        state = State(inventory, Config())
+        connect_all(state)
+
+        data_values = []
+
+        @deploy(data_defaults={"deploy_value": "nested"})
+        def test_nested_deploy():
+            data_values.append(somehost.data.get("deploy_value"))
+
+        @deploy(data_defaults={"deploy_value": "outer"})
+        def test_deploy():
+            data_values.append(somehost.data.get("deploy_value"))
+            test_nested_deploy()
+            data_values.append(somehost.data.get("deploy_value"))
+
+        data_values.append(somehost.data.get("deploy_value"))
+        add_deploy(state, test_deploy)
+        data_values.append(somehost.data.get("deploy_value"))
+
+        assert data_values == [None, "outer", "nested", "outer", None]
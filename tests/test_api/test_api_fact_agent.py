@@ -0,0 +1,97 @@
+import hashlib
+import json
+import sys
+from os import path, symlink
+from subprocess import run
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from pyinfra.api.fact_agent import AGENT_SCRIPT, make_agent_command, make_agent_query
+from pyinfra.facts.files import Directory, File, FilesInfo, Link, Sha1File, Sha1Files
+
+
+def _run_agent(queries):
+    with TemporaryDirectory() as temp_dir:
+        agent_filename = path.join(temp_dir, "agent.py")
+        with open(agent_filename, "w", encoding="utf-8") as f:
+            f.write(AGENT_SCRIPT)
+
+        process = run(
+            [sys.executable, agent_filename, "MARKER"],
+            input="\n".join(json.dumps([i, *query]) for i, query in enumerate(queries)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+    outputs = []
+    for line in process.stdout.splitlines():
+        if line.startswith("MARKER"):
+            if len(line.split()) == 2:
+                outputs.append([])
+            continue
+        outputs[-1].append(line)
+    return outputs
+
+
+class TestFactAgent(TestCase):
+    def test_make_agent_query(self):
+        fact = FilesInfo()
+        fact_kwargs = {"paths": ["/a", "/b"]}
+        assert make_agent_query(fact, fact_kwargs) == ["stat_paths", "/a", "/b"]
+
+    def test_make_agent_command(self):
+        command = make_agent_command("/tmp/agent", "MARKER", [(1, ["stat", "/a b"])])
+        assert command.get_raw_value() == (
+            "python3 /tmp/agent MARKER <<'PYINFRA_FACT_AGENT_EOF'\n"
+            '[1, "stat", "/a b"]\n'
+            "PYINFRA_FACT_AGENT_EOF"
+        )
+
+    def test_agent_output_matches_facts(self):
+        with TemporaryDirectory() as temp_dir:
+            filename = path.join(temp_dir, "my file")
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write("hello")
+
+            link_filename = path.join(temp_dir, "link")
+            symlink("my file", link_filename)
+            missing_filename = path.join(temp_dir, "missing")
+
+            outputs = _run_agent(
+                [
+                    ["stat", filename],
+                    ["stat", link_filename],
+                    ["stat", temp_dir],
+                    ["stat", missing_filename],
+                    ["sha1", filename],
+                    ["sha1", missing_filename],
+                    ["stat_paths", filename, missing_filename],
+                    ["sha1_paths", filename, missing_filename],
+                ],
+            )
+
+        expected_sha1 = hashlib.sha1(b"hello").hexdigest()
+
+        assert File().process(outputs[0])["size"] == 5
+        assert Link().process(outputs[1])["link_target"] == "my file"
+        assert Directory().process(outputs[2]) is not None
+        assert outputs[3] == []
+
+        sha1_fact = Sha1File()
+        sha1_fact.command(filename)
+        assert sha1_fact.process(outputs[4]) == expected_sha1
+        assert outputs[5] == []
+
+        files_info_fact = FilesInfo()
+        files_info_fact.command([filename, missing_filename])
+        files_info = files_info_fact.process(outputs[6])
+        assert files_info[filename]["type"] == "file"
+        assert files_info[missing_filename] is None
+
+        sha1_files_fact = Sha1Files()
+        sha1_files_fact.command([filename, missing_filename])
+        assert sha1_files_fact.process(outputs[7]) == {
+            filename: expected_sha1,
+            missing_filename: None,
+        }
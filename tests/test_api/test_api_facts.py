@@ -1,17 +1,33 @@
+from os import path
+from tempfile import TemporaryDirectory
+from time import time
 from unittest.mock import MagicMock, patch
 
-from pyinfra.api import Config, State
+from pyinfra.api import BaseStateCallback, Config, FactBase, State
 from pyinfra.api.arguments import CONNECTOR_ARGUMENT_KEYS, pop_global_arguments
 from pyinfra.api.connect import connect_all
 from pyinfra.api.exceptions import PyinfraError
 from pyinfra.api.facts import get_facts
 from pyinfra.connectors.util import CommandOutput, OutputLine
-from pyinfra.facts.server import Arch, Command
+from pyinfra.facts.deb import DebPackages
+from pyinfra.facts.files import Sha1File
+from pyinfra.facts.rpm import RpmPackages
+from pyinfra.facts.server import Arch, Command, Hostname
 
 from ..paramiko_util import PatchSSHTestCase
 from ..util import make_inventory
 
 
+class StreamedLines(FactBase):
+    command = "cat lines"
+
+    def process(self, output):
+        return [line.upper() for line in output]
+
+    def process_stream(self, output):
+        return self.process(output)
+
+
 def _get_executor_defaults(state, host):
     global_argument_defaults, _ = pop_global_arguments({}, state=state, host=host)
     return {
@@ -314,3 +330,426 @@ class TestHostFactsApi(PatchSSHTestCase):
             print_output=False,
             **defaults,
         )
+
+    def test_get_host_fact_cached(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config())
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            fake_run_command.return_value = True, CommandOutput(
+                [OutputLine("stdout", "some-output")]
+            )
+            assert host_1.get_fact(Arch) == "some-output"
+            assert host_1.get_fact(Arch) == "some-output"
+            assert fake_run_command.call_count == 1
+
+            # Different executor arguments are cached separately
+            assert host_1.get_fact(Arch, _sudo=True) == "some-output"
+            assert fake_run_command.call_count == 2
+
+            host_1.reset_fact_cache()
+            assert host_1.get_fact(Arch) == "some-output"
+            assert fake_run_command.call_count == 3
+
+    def test_get_host_fact_streamed(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config())
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+
+        def fake_run_shell_command(command, stdout_handler=None, **kwargs):
+            stdout_handler(iter(["first", "second"]))
+            return True, CommandOutput([])
+
+        with patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+            side_effect=fake_run_shell_command,
+        ):
+            assert host_1.get_fact(StreamedLines) == ["FIRST", "SECOND"]
+
+    def test_get_host_fact_stream_not_supported(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config())
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+        host_1.connector.supports_stdout_handler = False
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            fake_run_command.return_value = True, CommandOutput(
+                [OutputLine("stdout", "first")]
+            )
+            assert host_1.get_fact(StreamedLines) == ["FIRST"]
+            assert "stdout_handler" not in fake_run_command.call_args.kwargs
+
+    def test_get_host_fact_available_commands(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config())
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            fake_run_command.side_effect = [
+                (True, CommandOutput([OutputLine("stdout", "dpkg"), OutputLine("stdout", "sha1")])),
+                (True, CommandOutput([OutputLine("stdout", "ii  pyinfra  1.0  all  desc")])),
+                (True, CommandOutput([OutputLine("stdout", "SHA1 (myfile) = " + "a" * 40)])),
+            ]
+
+            assert host_1.get_fact(DebPackages) == {"pyinfra": {"1.0"}}
+            assert host_1.get_fact(Sha1File, path="myfile") == "a" * 40
+            # Missing required command, no need to run anything
+            assert host_1.get_fact(RpmPackages) == {}
+
+            assert fake_run_command.call_count == 3
+            probe_command = fake_run_command.call_args_list[0][0][0]
+            assert "command -v" in str(probe_command)
+            assert fake_run_command.call_args_list[1][0][0] == "dpkg -l"
+            assert str(fake_run_command.call_args_list[2][0][0]) == (
+                "test -e myfile && ( sha1 myfile 2> /dev/null ) || true"
+            )
+
+    def test_get_host_fact_available_commands_not_probed_when_executing(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config())
+        state.is_executing = True
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            fake_run_command.return_value = True, CommandOutput([])
+            assert host_1.get_fact(DebPackages) == {}
+            assert fake_run_command.call_count == 1
+            assert str(fake_run_command.call_args[0][0]) == (
+                "! command -v dpkg >/dev/null || dpkg -l"
+            )
+
+    def test_get_host_fact_error_not_cached(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config(IGNORE_ERRORS=True))
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            fake_run_command.return_value = False, CommandOutput([])
+            assert host_1.get_fact(Arch) is None
+            assert host_1.get_fact(Arch) is None
+            assert fake_run_command.call_count == 2
+
+    def test_get_host_facts_batched(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config())
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+        marker = "PYINFRA_FACT_abc"
+
+        with patch("pyinfra.api.facts.uuid4", lambda: MagicMock(hex="abc")), patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+        ) as fake_run_command:
+            fake_run_command.return_value = True, CommandOutput(
+                [
+                    OutputLine("stdout", f"{marker} 0"),
+                    OutputLine("stderr", f"{marker} 0"),
+                    OutputLine("stdout", "x86_64"),
+                    OutputLine("stdout", f"{marker} 0 0"),
+                    OutputLine("stdout", f"{marker} 1"),
+                    OutputLine("stderr", f"{marker} 1"),
+                    OutputLine("stderr", "some-error"),
+                    OutputLine("stdout", f"some-output{marker} 1 0"),
+                ],
+            )
+            fact_data = host_1.get_facts(
+                [
+                    (Arch, {}),
+                    (Command, {"command": "echo some-output"}),
+                ],
+            )
+
+        assert fact_data == ["x86_64", "some-output"]
+        assert fake_run_command.call_count == 1
+
+        command = fake_run_command.call_args[0][0].get_raw_value()
+        assert Arch.command in command
+        assert "echo some-output" in command
+
+        # Both facts are now cached
+        assert host_1.get_fact(Arch) == "x86_64"
+        assert fake_run_command.call_count == 1
+
+    def test_get_host_facts_batched_fact_agent(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config(FACT_AGENT=True, TEMP_DIR="/tmp"))
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+        marker = "PYINFRA_FACT_abc"
+
+        with patch("pyinfra.api.facts.uuid4", lambda: MagicMock(hex="abc")), patch(
+            "pyinfra.connectors.ssh.SSHConnector.put_file",
+            return_value=True,
+        ) as fake_put_file, patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+        ) as fake_run_command:
+            fake_run_command.side_effect = [
+                # command -v python3
+                (True, CommandOutput([])),
+                (
+                    True,
+                    CommandOutput(
+                        [
+                            OutputLine("stdout", f"{marker} 0"),
+                            OutputLine("stderr", f"{marker} 0"),
+                            OutputLine("stdout", "x86_64"),
+                            OutputLine("stdout", f"{marker} 0 0"),
+                            OutputLine("stdout", f"{marker} 1"),
+                            OutputLine("stderr", f"{marker} 1"),
+                            OutputLine("stdout", "a" * 40 + "  myfile"),
+                            OutputLine("stdout", f"{marker} 1 0"),
+                        ],
+                    ),
+                ),
+            ]
+            fact_data = host_1.get_facts([(Arch, {}), (Sha1File, {"path": "myfile"})])
+
+        assert fact_data == ["x86_64", "a" * 40]
+        assert fake_put_file.call_count == 1
+
+        agent_path = fake_put_file.call_args[0][1]
+        command = fake_run_command.call_args[0][0].get_raw_value()
+        assert Arch.command in command
+        assert f"python3 {agent_path} {marker}" in command
+        assert '[1, "sha1", "myfile"]' in command
+
+    def test_get_host_facts_batch_failure_loads_individually(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config())
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            fake_run_command.side_effect = [
+                (False, CommandOutput([])),
+                (True, CommandOutput([OutputLine("stdout", "x86_64")])),
+                (True, CommandOutput([OutputLine("stdout", "some-output")])),
+            ]
+            fact_data = host_1.get_facts(
+                [
+                    (Arch, {}),
+                    (Command, {"command": "echo some-output"}),
+                ],
+            )
+
+        assert fact_data == ["x86_64", "some-output"]
+        assert fake_run_command.call_count == 3
+
+    def test_prefetch_host_facts_ignores_errors(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config())
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+        marker = "PYINFRA_FACT_abc"
+
+        with patch("pyinfra.api.facts.uuid4", lambda: MagicMock(hex="abc")), patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+        ) as fake_run_command:
+            fake_run_command.return_value = True, CommandOutput(
+                [
+                    OutputLine("stdout", f"{marker} 0"),
+                    OutputLine("stdout", "x86_64"),
+                    OutputLine("stdout", f"{marker} 0 0"),
+                    OutputLine("stdout", f"{marker} 1"),
+                    OutputLine("stdout", f"{marker} 1 1"),
+                ],
+            )
+            host_1.prefetch_facts([(Arch, {}), (Command, {"command": "false"})])
+
+        assert fake_run_command.call_count == 1
+        # Only the successful fact is cached, the host is not failed
+        assert len(host_1.fact_cache) == 1
+        assert state.failed_hosts == set()
+
+    def test_get_host_fact_callbacks(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config())
+
+        callback = MagicMock(spec=BaseStateCallback)
+        state.add_callback_handler(callback)
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            fake_run_command.return_value = True, CommandOutput(
+                [OutputLine("stdout", "some-output"), OutputLine("stderr", "é")],
+                exit_code=0,
+            )
+            host_1.get_fact(Command, command="echo hello world")
+            # Cached facts are not loaded again
+            host_1.get_fact(Command, command="echo hello world")
+
+        callback.fact_start.assert_called_once_with(
+            state,
+            host_1,
+            "server.Command",
+            {"command": "echo hello world"},
+        )
+        callback.fact_end.assert_called_once()
+
+        stats = callback.fact_end.call_args[0][2]
+        assert stats.name == "server.Command"
+        assert stats.exit_code == 0
+        assert stats.stdout_bytes == len("some-output\n")
+        assert stats.stderr_bytes == 3
+        assert stats.batch_size == 1
+        assert stats.wall_time >= 0
+        assert stats.process_time >= 0
+
+    def test_get_host_facts_batched_callbacks(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config())
+
+        callback = MagicMock(spec=BaseStateCallback)
+        state.add_callback_handler(callback)
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+        marker = "PYINFRA_FACT_abc"
+
+        with patch("pyinfra.api.facts.uuid4", lambda: MagicMock(hex="abc")), patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+        ) as fake_run_command:
+            fake_run_command.return_value = True, CommandOutput(
+                [
+                    OutputLine("stdout", f"{marker} 0"),
+                    OutputLine("stdout", "x86_64"),
+                    OutputLine("stdout", f"{marker} 0 0"),
+                    OutputLine("stdout", f"{marker} 1"),
+                    OutputLine("stdout", f"{marker} 1 1"),
+                ],
+            )
+            host_1.prefetch_facts([(Arch, {}), (Command, {"command": "false"})])
+
+        assert callback.fact_start.call_count == 2
+        assert callback.fact_end.call_count == 2
+
+        arch_stats, command_stats = (call[0][2] for call in callback.fact_end.call_args_list)
+        assert arch_stats.name == "server.Arch"
+        assert arch_stats.exit_code == 0
+        assert arch_stats.stdout_bytes == len("x86_64\n")
+        assert arch_stats.batch_size == 2
+        assert command_stats.exit_code == 1
+        assert command_stats.wall_time == arch_stats.wall_time
+
+
+class TestFactStoreApi(PatchSSHTestCase):
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = TemporaryDirectory()
+        self.fact_cache = path.join(self.temp_dir.name, "facts.db")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        super().tearDown()
+
+    def _get_host_facts(self, output, *facts):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config(FACT_CACHE=self.fact_cache))
+
+        connect_all(state)
+
+        host_1 = inventory.get_host("host-1")
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            fake_run_command.return_value = True, CommandOutput([OutputLine("stdout", output)])
+            fact_data = [host_1.get_fact(fact) for fact in facts]
+
+        state.fact_store.close()
+        return fact_data, fake_run_command.call_count
+
+    def test_get_fact_stored_between_states(self):
+        fact_data, call_count = self._get_host_facts("x86_64", Arch)
+        assert fact_data == ["x86_64"]
+        assert call_count == 1
+
+        fact_data, call_count = self._get_host_facts("aarch64", Arch)
+        assert fact_data == ["x86_64"]
+        assert call_count == 0
+
+    def test_get_fact_stored_expired(self):
+        self._get_host_facts("x86_64", Arch)
+
+        with patch("pyinfra.api.fact_store.time", lambda: time() + Arch.cache_ttl + 1):
+            fact_data, call_count = self._get_host_facts("aarch64", Arch)
+
+        assert fact_data == ["aarch64"]
+        assert call_count == 1
+
+    def test_get_fact_stored_not_read_after_commands(self):
+        self._get_host_facts("x86_64", Arch)
+
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config(FACT_CACHE=self.fact_cache))
+        connect_all(state)
+        host_1 = inventory.get_host("host-1")
+
+        # Ie an operation has changed the host
+        host_1.executed_command_count += 1
+        host_1.reset_fact_cache()
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            fake_run_command.return_value = True, CommandOutput([OutputLine("stdout", "aarch64")])
+            assert host_1.get_fact(Arch) == "aarch64"
+
+        assert fake_run_command.call_count == 1
+        state.fact_store.close()
+
+    def test_get_fact_without_ttl_not_stored(self):
+        self._get_host_facts("some-output", Hostname)
+
+        fact_data, call_count = self._get_host_facts("other-output", Hostname)
+        assert fact_data == ["other-output"]
+        assert call_count == 1
+
+    def test_get_fact_record_and_replay(self):
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config(FACT_RECORD=self.fact_cache))
+        connect_all(state)
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            fake_run_command.return_value = True, CommandOutput([OutputLine("stdout", "host-1")])
+            inventory.get_host("host-1").get_fact(Hostname)
+
+        state.fact_recorder.close()
+
+        inventory = make_inventory(hosts=("host-1",))
+        state = State(inventory, Config(FACT_REPLAY=self.fact_cache))
+        host_1 = inventory.get_host("host-1")
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run_command:
+            assert host_1.get_fact(Hostname) == "host-1"
+            # Facts missing from the recording use the fact default
+            assert host_1.get_fact(Command, command="echo hi") is None
+
+        fake_run_command.assert_not_called()
+        assert not host_1.connected
@@ -34,3 +34,36 @@ class TestHostData(TestCase):
 
         assert context.exception.args[0] == "Host `somehost` has no data `not-a-key`"
         assert data.get("not-a-key") is None
+
+    def test_host_data_get_keys(self):
+        data = HostData(
+            "somehost",
+            {"hello": "world"},
+            lambda: {"hello": "not-world", "another": "thing"},
+        )
+        data.override = "override-value"
+
+        assert data.get_keys(["hello", "another", "override", "not-a-key"]) == {
+            "hello": "world",
+            "another": "thing",
+            "override": "override-value",
+        }
+
+    def test_host_data_cached(self):
+        calls = []
+
+        def get_data():
+            calls.append(True)
+            return {"hello": "not-world", "another": "thing"}
+
+        data = HostData("somehost", {"hello": "world"}, get_data)
+        assert data.hello == "world"
+        assert data.another == "thing"
+        assert data.get("not-a-key") is None
+        assert len(calls) == 1
+
+        # Setting override data resets the cache
+        data.another = "override-thing"
+        assert data.another == "override-thing"
+        assert data.dict() == {"hello": "world", "another": "override-thing"}
+        assert len(calls) == 2
@@ -1,8 +1,15 @@
 from collections import defaultdict
+from graphlib import TopologicalSorter
+from io import StringIO
 from os import path
+from subprocess import run
+from tempfile import TemporaryDirectory
+from time import time
 from unittest import TestCase
 from unittest.mock import mock_open, patch
 
+import gevent
+
 import pyinfra
 from pyinfra.api import (
     BaseStateCallback,
@@ -16,11 +23,20 @@ from pyinfra.api import (
 )
 from pyinfra.api.connect import connect_all, disconnect_all
 from pyinfra.api.exceptions import PyinfraError
-from pyinfra.api.operation import OperationMeta, add_op
+from pyinfra.api.op_dependencies import (
+    get_host_op_dependencies,
+    get_operation_resources,
+    resources_overlap,
+)
+from pyinfra.api.operation import OperationMeta, add_op, operation
 from pyinfra.api.operations import run_ops
+from pyinfra.api.plan_store import get_operation_inputs_hash
 from pyinfra.api.state import StateOperationMeta
+from pyinfra.connectors.util import CommandOutput, OutputLine
 from pyinfra.context import ctx_host, ctx_state
-from pyinfra.operations import files, python, server
+from pyinfra.facts.files import File
+from pyinfra.facts.server import Arch, Hostname
+from pyinfra.operations import apt, files, python, server
 
 from ..paramiko_util import FakeBuffer, FakeChannel, PatchSSHTestCase
 from ..util import make_inventory
@@ -275,6 +291,141 @@ class TestOperationsApi(PatchSSHTestCase):
 
         assert (state.results[somehost].success_ops + state.results[anotherhost].success_ops) == 1
 
+    def test_parallel_op_sliding_window(self):
+        inventory = make_inventory(hosts=("somehost", "anotherhost", "thirdhost", "fourthhost"))
+        state = State(inventory, Config())
+        connect_all(state)
+
+        add_op(state, server.shell, 'echo "hi"', _parallel=2)
+
+        events = []
+        in_flight = set()
+
+        def run_host_op(state, host, op_hash):
+            in_flight.add(host.name)
+            assert len(in_flight) <= 2
+            events.append(("start", host.name))
+            # The first host started is slow
+            gevent.sleep(0.2 if len(events) == 1 else 0.01)
+            in_flight.remove(host.name)
+            events.append(("end", host.name))
+            return host.name != "fourthhost"
+
+        with patch("pyinfra.api.operations.run_host_op", run_host_op):
+            run_ops(state)
+
+        # The slow host doesn't stop the remaining hosts from starting
+        slow_host_name = events[0][1]
+        assert len(events) == 8
+        assert events[-1] == ("end", slow_host_name)
+
+        assert state.failed_hosts == {inventory.get_host("fourthhost")}
+
+    def test_parallel_op_fail_fast(self):
+        inventory = make_inventory(hosts=("somehost", "anotherhost", "thirdhost", "fourthhost"))
+        state = State(inventory, Config(FAIL_FAST=True))
+        connect_all(state)
+
+        add_op(state, server.shell, 'echo "hi"', _parallel=2)
+
+        started = []
+
+        def run_host_op(state, host, op_hash):
+            started.append(host)
+            # The first host started fails while the second is still running
+            if len(started) == 1:
+                gevent.sleep(0.01)
+                return False
+            gevent.sleep(0.1)
+            return True
+
+        with patch("pyinfra.api.operations.run_host_op", run_host_op):
+            with self.assertRaises(PyinfraError) as context:
+                run_ops(state)
+
+        assert context.exception.args[0] == "Over 0% of hosts failed (25%), stopped early"
+        assert len(started) == 2
+        assert state.failed_hosts == {started[0]}
+        assert state.interrupted_hosts == {started[1]}
+        assert state.cancelled_hosts == set(inventory) - set(started)
+
+    def test_op_fail_fast_cancel(self):
+        inventory = make_inventory(hosts=("somehost", "anotherhost"))
+        anotherhost = inventory.get_host("anotherhost")
+        state = State(inventory, Config(FAIL_FAST_CANCEL=True))
+        connect_all(state)
+
+        @operation(is_idempotent=False)
+        def multiple_commands_op():
+            yield StringCommand("first")
+            yield StringCommand("second")
+            yield StringCommand("third")
+
+        add_op(state, multiple_commands_op)
+
+        def run_shell_command(command, **kwargs):
+            if ctx_host.get().name == "somehost":
+                gevent.sleep(0.01)
+                return False, CommandOutput([])
+            gevent.sleep(0.05)
+            return True, CommandOutput([])
+
+        with patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+            side_effect=run_shell_command,
+        ):
+            with self.assertRaises(PyinfraError):
+                run_ops(state)
+
+        # The running host is cancelled after the command that was executing
+        op_meta = state.ops[anotherhost][state.get_op_order()[0]].operation_meta
+        assert not op_meta.did_succeed()
+        assert len(op_meta._commands) == 1
+        assert state.interrupted_hosts == {anotherhost}
+        assert state.results[anotherhost].partial_ops == 1
+
+    def test_no_wait_ops_fail_fast(self):
+        inventory = make_inventory(hosts=("somehost", "anotherhost", "thirdhost"))
+        somehost = inventory.get_host("somehost")
+        state = State(inventory, Config(FAIL_FAST=True))
+        connect_all(state)
+
+        add_op(state, server.shell, "first")
+        add_op(state, server.shell, "second")
+
+        def run_shell_command(command, **kwargs):
+            if ctx_host.get() is somehost:
+                return False, CommandOutput([])
+            gevent.sleep(0.05)
+            return True, CommandOutput([])
+
+        with patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+            side_effect=run_shell_command,
+        ) as fake_run_command:
+            with self.assertRaises(PyinfraError):
+                run_ops(state, no_wait=True)
+
+        # The other hosts complete the first operation but do not start the second
+        assert fake_run_command.call_count == 3
+        assert state.failed_hosts == {somehost}
+        assert state.cancelled_hosts == set(inventory) - {somehost}
+        assert state.interrupted_hosts == set(inventory) - {somehost}
+
+    def test_run_once_op_many_hosts(self):
+        inventory = make_inventory(hosts=[f"host-{i}" for i in range(10000)])
+        state = State(inventory, Config())
+        for host in inventory:
+            state.activate_host(host)
+
+        start = time()
+        add_op(state, server.shell, 'echo "hi"', _run_once=True)
+        assert time() - start < 10
+
+        op_hash = state.get_op_order()[0]
+        assert len(state.get_op_hosts(op_hash)) == 1
+        assert sum(len(ops) for ops in state.ops.values()) == 1
+
     @patch("pyinfra.connectors.ssh.SSHConnector.check_can_rsync", lambda _: True)
     def test_rsync_op(self):
         inventory = make_inventory(hosts=("somehost",))
@@ -416,6 +567,352 @@ class TestOperationsApi(PatchSSHTestCase):
 
         assert context.exception.args[0] == "Cannot have different values for `_serial`."
 
+    def test_op_execution_resets_fact_cache(self):
+        inventory = make_inventory(hosts=("somehost",))
+        somehost = inventory.get_host("somehost")
+
+        state = State(inventory, Config())
+        connect_all(state)
+
+        add_op(state, server.shell, "echo hi")
+
+        somehost.fact_cache["some-fact-hash"] = "some-fact-data"
+        run_ops(state)
+
+        assert somehost.fact_cache == {}
+
+    def test_op_no_change_not_generated_again(self):
+        inventory = make_inventory(hosts=("somehost",))
+        somehost = inventory.get_host("somehost")
+        state = State(inventory, Config())
+        connect_all(state)
+
+        generated = []
+
+        @operation()
+        def noop_op():
+            generated.append(pyinfra.host.get_fact(Arch))
+            return
+            yield
+
+        first_op = add_op(state, noop_op)[somehost]
+        add_op(state, server.shell, "echo hi")
+        second_op = add_op(state, noop_op)[somehost]
+        assert len(generated) == 2
+
+        first_op_hash = state.get_op_order()[0]
+        assert state.ops[somehost][first_op_hash].prepared_fact_hosts == {somehost: 0}
+
+        run_ops(state)
+
+        # Only the op after the shell command needs generating again
+        assert len(generated) == 3
+        assert first_op.did_succeed() and second_op.did_succeed()
+        assert somehost.executed_command_count == 1
+
+    def test_op_pipeline_commands(self):
+        inventory = make_inventory(hosts=("somehost",))
+        somehost = inventory.get_host("somehost")
+        state = State(inventory, Config(PIPELINE_COMMANDS=True))
+        connect_all(state)
+
+        @operation(is_idempotent=False)
+        def multiple_commands_op():
+            yield StringCommand("echo first")
+            yield StringCommand("echo second && false")
+            yield StringCommand("echo third")
+
+        add_op(state, multiple_commands_op, _continue_on_error=True, _ignore_errors=True)
+
+        def run_shell_command(command, **kwargs):
+            process = run(command.get_raw_value(), shell=True, capture_output=True, text=True)
+            return True, CommandOutput(
+                [OutputLine("stdout", line) for line in process.stdout.splitlines()],
+            )
+
+        with patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+            side_effect=run_shell_command,
+        ) as fake_run_command:
+            run_ops(state)
+
+        # All three commands executed as a single script
+        fake_run_command.assert_called_once()
+
+        op_meta = state.ops[somehost][state.get_op_order()[0]].operation_meta
+        assert not op_meta.did_succeed()
+        assert len(op_meta._commands) == 3
+        assert [line.line for line in op_meta._combined_output_lines] == [
+            "first",
+            "second",
+            "third",
+        ]
+        assert somehost.executed_command_count == 3
+        assert state.results[somehost].partial_ops == 1
+
+    def test_op_dependencies(self):
+        inventory = make_inventory(hosts=("somehost",))
+        somehost = inventory.get_host("somehost")
+        state = State(inventory, Config(CONCURRENT_OPS=4))
+        connect_all(state)
+
+        first = add_op(state, files.directory, path="/opt/app")
+        second = add_op(state, files.directory, path="/opt/other", _depends_on=[])
+        third = add_op(state, files.directory, path="/opt/app/data", _depends_on=[])
+        fourth = add_op(state, server.shell, commands="echo", _depends_on=[second[somehost]])
+        fifth = add_op(state, server.shell, commands="echo")
+
+        op_order = state.get_op_order()
+        dependencies = get_host_op_dependencies(state, somehost, op_order)
+        first_hash, second_hash, third_hash, fourth_hash, fifth_hash = (
+            op[somehost]._hash for op in (first, second, third, fourth, fifth)
+        )
+
+        assert dependencies[first_hash] == set()
+        assert dependencies[second_hash] == set()
+        # Overlapping paths
+        assert dependencies[third_hash] == {first_hash}
+        assert dependencies[fourth_hash] == {second_hash}
+        assert dependencies[fifth_hash] == {first_hash, second_hash, third_hash, fourth_hash}
+
+    def test_op_dependencies_packages(self):
+        assert resources_overlap(
+            get_operation_resources(apt.packages, (), {"packages": ["nginx"]}),
+            get_operation_resources(apt.update, (), {}),
+        )
+        assert not resources_overlap(
+            get_operation_resources(apt.packages, (), {"packages": ["nginx"]}),
+            get_operation_resources(files.file, (), {"path": "/etc/nginx.conf"}),
+        )
+
+    def test_op_concurrent_ops(self):
+        inventory = make_inventory(hosts=("somehost",))
+        state = State(inventory, Config(CONCURRENT_OPS=2))
+        connect_all(state)
+
+        @operation(is_idempotent=False)
+        def command_op(command):
+            yield StringCommand(command)
+
+        slow = add_op(state, command_op, "slow")
+        add_op(state, command_op, "fast", _depends_on=[])
+        add_op(state, command_op, "last")
+
+        events = []
+
+        def run_shell_command(command, **kwargs):
+            command = command.get_raw_value()
+            events.append(("start", command))
+            if command == "slow":
+                gevent.sleep(0.1)
+            events.append(("end", command))
+            return True, CommandOutput([])
+
+        with patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+            side_effect=run_shell_command,
+        ):
+            run_ops(state)
+
+        # The independent op executes alongside the slow one, the last op waits for both
+        assert events == [
+            ("start", "slow"),
+            ("start", "fast"),
+            ("end", "fast"),
+            ("end", "slow"),
+            ("start", "last"),
+            ("end", "last"),
+        ]
+        assert all(op_meta.did_succeed() for op_meta in slow.values())
+
+    def test_op_concurrent_ops_error(self):
+        inventory = make_inventory(hosts=("somehost",))
+        somehost = inventory.get_host("somehost")
+        state = State(inventory, Config(CONCURRENT_OPS=2))
+        connect_all(state)
+
+        @operation(is_idempotent=False)
+        def command_op(command):
+            yield StringCommand(command)
+
+        add_op(state, command_op, "fail")
+        add_op(state, command_op, "fast", _depends_on=[])
+        last = add_op(state, command_op, "last")
+
+        def run_shell_command(command, **kwargs):
+            return command.get_raw_value() != "fail", CommandOutput([])
+
+        with patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+            side_effect=run_shell_command,
+        ):
+            with self.assertRaises(PyinfraError):
+                run_ops(state)
+
+        # The running op completes but no further ops are started after the failure
+        assert state.results[somehost].success_ops == 1
+        assert state.results[somehost].error_ops == 1
+        assert not last[somehost].is_complete()
+
+    def test_op_plan_cache(self):
+        generated = []
+
+        @operation()
+        def hostname_op(hostname):
+            generated.append(hostname)
+            if pyinfra.host.get_fact(Hostname) != hostname:
+                yield StringCommand("hostname", hostname)
+
+        with TemporaryDirectory() as temp_dir:
+            plan_cache = path.join(temp_dir, "plans.db")
+
+            # Unchanged ops are only skipped once stored & while the facts they read match
+            for remote_hostname, is_generated in (
+                ("host-1", True),
+                ("host-1", False),
+                ("host-2", True),
+            ):
+                inventory = make_inventory(hosts=("somehost",))
+                state = State(inventory, Config(PLAN_CACHE=plan_cache))
+                connect_all(state)
+                generated.clear()
+
+                with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run:
+                    fake_run.return_value = True, CommandOutput(
+                        [OutputLine("stdout", remote_hostname)],
+                    )
+                    add_op(state, hostname_op, "host-1")
+
+                assert bool(generated) is is_generated
+                state.plan_store.close()
+
+    def test_op_plan_cache_swapped_op(self):
+        @operation()
+        def noop_op(path):
+            if False:
+                yield
+
+        @operation()
+        def touch_op(path):
+            yield StringCommand("touch", path)
+
+        with TemporaryDirectory() as temp_dir:
+            plan_cache = path.join(temp_dir, "plans.db")
+
+            # Different operations at the same position are not skipped as unchanged
+            op_hashes = []
+            for op, is_change in ((noop_op, False), (touch_op, True)):
+                inventory = make_inventory(hosts=("somehost",))
+                state = State(inventory, Config(PLAN_CACHE=plan_cache))
+                connect_all(state)
+
+                op_meta = add_op(state, op, "/some/path")
+                op_hashes.append(state.get_op_order()[0])
+                assert op_meta[inventory.get_host("somehost")]._maybe_is_change is is_change
+                state.plan_store.close()
+
+            assert op_hashes[0] == op_hashes[1]
+
+    def test_op_plan_cache_inputs_hash(self):
+        inventory = make_inventory(hosts=(("somehost", {"value": "a"}), ("anotherhost", {})))
+        state = State(inventory, Config())
+        somehost = inventory.get_host("somehost")
+        anotherhost = inventory.get_host("anotherhost")
+
+        def get_inputs_hash(op, host, *args, **kwargs):
+            with ctx_state.use(state), ctx_host.use(host):
+                return get_operation_inputs_hash(state, op._inner, args, kwargs, {})
+
+        # Only the src argument is read as a local file
+        assert get_inputs_hash(files.directory, somehost, path="/") is not None
+        assert get_inputs_hash(files.put, somehost, src="/", dest="/dest") is None
+
+        # Templates are fingerprinted by their rendered output
+        template = StringIO("{{ host.data.get('value') }}")
+        somehost_hash = get_inputs_hash(files.template, somehost, template, "/dest")
+        anotherhost_hash = get_inputs_hash(files.template, anotherhost, template, "/dest")
+        assert somehost_hash is not None
+        assert somehost_hash != anotherhost_hash
+
+    def test_op_group_equivalent_hosts(self):
+        inventory = make_inventory(hosts=("somehost", "anotherhost", ("thirdhost", {"role": "db"})))
+        state = State(inventory, Config(GROUP_EQUIVALENT_HOSTS=True))
+        connect_all(state)
+
+        generated = []
+
+        @operation()
+        def hostname_op(hostname):
+            generated.append(pyinfra.host.name)
+            if pyinfra.host.data.get("role") == "db":
+                return
+            if pyinfra.host.get_fact(Hostname) != hostname:
+                yield StringCommand("hostname", hostname)
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run:
+            fake_run.return_value = True, CommandOutput([OutputLine("stdout", "host-1")])
+            add_op(state, hostname_op, "host-2")
+
+        # Only called once for somehost & anotherhost, which have the same data & facts
+        assert len(generated) == 2
+        assert "thirdhost" in generated
+
+        op_hash = state.get_op_order()[0]
+        assert state.ops[inventory.get_host("somehost")][op_hash].operation_meta.changed
+        assert state.ops[inventory.get_host("anotherhost")][op_hash].operation_meta.changed
+        assert not state.ops[inventory.get_host("thirdhost")][op_hash].operation_meta.changed
+
+    def test_op_group_equivalent_hosts_different_ops(self):
+        inventory = make_inventory(hosts=("somehost", "anotherhost"))
+        state = State(inventory, Config(GROUP_EQUIVALENT_HOSTS=True))
+        connect_all(state)
+
+        @operation()
+        def noop_op(path):
+            if False:
+                yield
+
+        @operation()
+        def touch_op(path):
+            yield StringCommand("touch", path)
+
+        # Different operations at the same position on each host are not grouped
+        results = {}
+        for host, op in zip(inventory, (noop_op, touch_op)):
+            results.update(add_op(state, op, "/some/path", host=host))
+
+        assert len(state.get_op_order()) == 1
+        assert [op_meta._maybe_is_change for op_meta in results.values()] == [False, True]
+
+    def test_op_group_equivalent_hosts_templates(self):
+        inventory = make_inventory(hosts=("somehost", "anotherhost"))
+        state = State(inventory, Config(GROUP_EQUIVALENT_HOSTS=True))
+        connect_all(state)
+
+        with patch("pyinfra.connectors.ssh.SSHConnector.run_shell_command") as fake_run:
+            fake_run.return_value = True, CommandOutput([])
+            add_op(state, files.template, src=StringIO("static"), dest="/static")
+            add_op(state, files.template, src=StringIO("{{ host.name }}"), dest="/name")
+
+        # Templates rendered differently on each host are not grouped
+        static_hash, name_hash = state.get_op_order()
+        assert len([key for key in state.equivalent_op_results if key[0] == static_hash]) == 1
+        assert len([key for key in state.equivalent_op_results if key[0] == name_hash]) == 2
+
+    def test_op_prefetch_facts(self):
+        inventory = make_inventory(hosts=("somehost",))
+        state = State(inventory, Config())
+        connect_all(state)
+
+        @operation(prefetch_facts=lambda path: [(Arch, {}), (File, {"path": path})])
+        def prefetch_op(path):
+            yield StringCommand("touch", path)
+
+        with patch("pyinfra.api.host.Host.prefetch_facts") as fake_prefetch_facts:
+            add_op(state, prefetch_op, "/some/path")
+
+        fake_prefetch_facts.assert_called_once_with([(Arch, {}), (File, {"path": "/some/path"})])
+
 
 class TestNestedOperationsApi(PatchSSHTestCase):
     def test_nested_op_api(self):
@@ -576,5 +1073,27 @@ class TestOperationOrdering(PatchSSHTestCase):
         assert op_order[0] == first_op_hash
         assert op_order[1] == second_op_hash
 
+    def test_op_order_cached(self):
+        inventory = make_inventory()
+        state = State(inventory, Config())
+        connect_all(state)
+
+        another_host = inventory.get_host("anotherhost")
+
+        first_op_hash = add_op(state, server.shell, "echo first-op")[another_host]._hash
+
+        with patch("pyinfra.api.state.TopologicalSorter", wraps=TopologicalSorter) as fake_ts:
+            assert state.get_op_order() == [first_op_hash]
+            assert state.get_op_order() == [first_op_hash]
+            assert fake_ts.call_count == 1
+
+            # Adding an operation invalidates the cached order
+            second_op_hash = add_op(state, server.shell, "echo second-op")[another_host]._hash
+            assert state.get_op_order() == [first_op_hash, second_op_hash]
+            assert fake_ts.call_count == 2
+
+        # Each host adds the same edge to the DAG once
+        assert state.op_dependencies == {first_op_hash: set(), second_op_hash: {first_op_hash}}
+
 
 this_filename = path.join("tests", "test_api", "test_api_operations.py")
@@ -0,0 +1,195 @@
+from unittest.mock import patch
+
+import pyinfra
+from pyinfra.api import Config, OperationValueError, State, StringCommand
+from pyinfra.api.connect import connect_all
+from pyinfra.api.exceptions import PyinfraError
+from pyinfra.api.operation import add_op, operation
+from pyinfra.api.shards import (
+    Shard,
+    _drop_run_once_ops,
+    _is_sequential_op,
+    _merge_summary,
+    prepare_shards,
+    run_shard_ops,
+)
+from pyinfra.connectors.util import CommandOutput
+from pyinfra.operations import server
+
+from ..paramiko_util import PatchSSHTestCase
+from ..util import make_inventory
+
+HOSTS = ("somehost", "anotherhost", "thirdhost", "fourthhost")
+
+
+@operation(is_idempotent=False)
+def host_command_op():
+    yield StringCommand("fail" if pyinfra.host.name == "anotherhost" else "ok")
+
+
+def _run_shell_command(command, **kwargs):
+    return command.get_raw_value() != "fail", CommandOutput([])
+
+
+class FakeShard(Shard):
+    def __init__(self, hosts):
+        super().__init__(hosts, None, None)
+        self.sent = []
+
+    def send(self, command, *args):
+        self.sent.append((command, args))
+
+    def receive(self):
+        return None
+
+
+def _make_op_meta_summary(global_arguments, names=("server.shell",)):
+    return ((1,), set(names), ["echo hi"], global_arguments, set())
+
+
+def _make_summary(host_names, global_arguments, op_hash="op-hash"):
+    return {
+        "op_meta": {op_hash: _make_op_meta_summary(global_arguments)},
+        "hosts": {
+            host_name: {
+                "op_hash_order": [op_hash],
+                "ops": [(op_hash, True, global_arguments, None)],
+                "meta": (1, 1, 0),
+            }
+            for host_name in host_names
+        },
+    }
+
+
+class TestShardOps(PatchSSHTestCase):
+    def _make_state(self, **config):
+        inventory = make_inventory(hosts=HOSTS)
+        state = State(inventory, Config(**config))
+        return inventory, state
+
+    def test_sequential_ops(self):
+        inventory = make_inventory(hosts=("somehost", "anotherhost", "thirdhost"))
+        state = State(inventory, Config(PARALLEL=2))
+        connect_all(state)
+
+        add_op(state, server.shell, "echo default")
+        add_op(state, server.shell, "echo serial", _serial=True)
+        add_op(state, server.shell, "echo batched", _parallel=1)
+        add_op(state, server.shell, "echo config", _parallel=2)
+        add_op(state, server.shell, "echo unbatched", _parallel=10)
+
+        # Only serial & batched operations (by arguments passed, not the default) run one
+        # shard at a time.
+        assert [_is_sequential_op(state, op_hash) for op_hash in state.get_op_order()] == [
+            False,
+            True,
+            True,
+            True,
+            False,
+        ]
+
+    def test_merge_summary(self):
+        inventory, state = self._make_state()
+        global_arguments = {"_run_once": False, "_serial": False, "_parallel": 5}
+
+        shard = FakeShard([inventory.get_host("somehost"), inventory.get_host("thirdhost")])
+        _merge_summary(state, shard, _make_summary(["somehost", "thirdhost"], global_arguments))
+
+        somehost = inventory.get_host("somehost")
+        assert shard.op_hashes == {"op-hash"}
+        assert state.op_meta["op-hash"].names == {"server.shell"}
+        assert state.op_meta["op-hash"].args == ["echo hi"]
+        assert state.get_op_order() == ["op-hash"]
+        assert state.get_op_hosts("op-hash") == {somehost, inventory.get_host("thirdhost")}
+        assert state.ops[somehost]["op-hash"].operation_meta._maybe_is_change is True
+        assert state.get_meta_for_host(somehost).ops_change == 1
+
+        # Operations executed in the shard cannot be run by the parent
+        with self.assertRaises(PyinfraError):
+            list(state.ops[somehost]["op-hash"].command_generator())
+
+        # Execution arguments must match across shards
+        other_shard = FakeShard([inventory.get_host("anotherhost")])
+        with self.assertRaises(OperationValueError):
+            _merge_summary(
+                state,
+                other_shard,
+                _make_summary(["anotherhost"], dict(global_arguments, _parallel=1)),
+            )
+
+    def test_drop_run_once_ops(self):
+        inventory, state = self._make_state()
+        global_arguments = {"_run_once": True, "_serial": False, "_parallel": 5}
+
+        hosts = list(inventory)
+        state.shards = [FakeShard(hosts[0::2]), FakeShard(hosts[1::2])]
+        for shard in state.shards:
+            host_names = [host.name for host in shard.hosts]
+            _merge_summary(state, shard, _make_summary(host_names, global_arguments))
+
+        _drop_run_once_ops(state)
+
+        # Only the first host in the inventory keeps the operation, every shard is told
+        assert state.get_op_hosts("op-hash") == {hosts[0]}
+        assert state.shards[0].sent == [("drop_ops", ([(hosts[2].name, "op-hash")],))]
+        assert state.shards[1].sent == [
+            ("drop_ops", ([(hosts[1].name, "op-hash"), (hosts[3].name, "op-hash")],)),
+        ]
+        assert state.get_meta_for_host(hosts[1]).ops == 0
+        assert state.get_meta_for_host(hosts[1]).ops_change == 0
+
+    def _run_shards(self, state, prepare):
+        with patch(
+            "pyinfra.connectors.ssh.SSHConnector.run_shell_command",
+            side_effect=_run_shell_command,
+        ):
+            prepare_shards(state, connect_all, prepare, 2)
+            try:
+                run_shard_ops(state)
+            finally:
+                for shard in state.shards:
+                    shard.close()
+
+    def test_worker_failed_hosts(self):
+        inventory, state = self._make_state()
+
+        def prepare(state):
+            add_op(state, host_command_op)
+            add_op(state, server.shell, "echo after")
+
+        self._run_shards(state, prepare)
+
+        # The host failing in its shard fails in the parent & skips the later operation
+        anotherhost = inventory.get_host("anotherhost")
+        assert state.failed_hosts == {anotherhost}
+        assert state.results[anotherhost].error_ops == 1
+        assert state.results[anotherhost].success_ops == 0
+        assert state.results[inventory.get_host("somehost")].success_ops == 2
+        first_op_hash = state.get_op_order()[0]
+        assert state.ops[anotherhost][first_op_hash].operation_meta.did_succeed() is False
+
+    def test_worker_fail_percent(self):
+        inventory, state = self._make_state(FAIL_PERCENT=10)
+
+        def prepare(state):
+            add_op(state, host_command_op)
+
+        # One of four hosts failed in one shard is over the percentage for all shards
+        with self.assertRaises(PyinfraError) as context:
+            self._run_shards(state, prepare)
+
+        assert "Over 10% of hosts failed (25%)" in context.exception.args[0]
+
+    def test_worker_error(self):
+        inventory, state = self._make_state()
+
+        def prepare(state):
+            raise ValueError("broken deploy")
+
+        with self.assertRaises(PyinfraError) as context:
+            prepare_shards(state, connect_all, prepare, 2)
+
+        assert "Error in shard process" in context.exception.args[0]
+        assert "broken deploy" in context.exception.args[0]
+        for shard in state.shards:
+            shard.close()
@@ -1,7 +1,17 @@
+from inspect import stack
 from io import BytesIO, StringIO
 from unittest import TestCase
+from unittest.mock import MagicMock
 
-from pyinfra.api.util import format_exception, get_caller_frameinfo, get_file_io, try_int
+from pyinfra.api.util import (
+    PYINFRA_INSTALL_DIR,
+    format_exception,
+    get_caller_frameinfo,
+    get_file_io,
+    get_operation_order_from_stack,
+    make_hash,
+    try_int,
+)
 
 
 class TestApiUtil(TestCase):
@@ -16,7 +26,43 @@ class TestApiUtil(TestCase):
             return get_caller_frameinfo()
 
         frameinfo = _get_caller_frameinfo()
-        assert frameinfo.lineno == 18  # called by the line above
+        assert frameinfo.lineno == 28  # called by the line above
+
+    def test_get_operation_order_from_stack(self):
+        state = MagicMock(current_deploy_filename=__file__)
+
+        def _get_order():
+            # Both on the same line so the orders match
+            return get_operation_order_from_stack(state), stack()
+
+        op_order, stack_items = _get_order()
+
+        expected_order = [
+            frame.lineno
+            for frame in reversed(stack_items)
+            if not frame.filename.startswith(PYINFRA_INSTALL_DIR)
+        ]
+        # Starting at the first frame in the deploy file, ie this test
+        while stack_items and stack_items[-1].filename != __file__:
+            stack_items.pop()
+            expected_order.pop(0)
+
+        assert op_order == expected_order
+
+    def test_make_hash(self):
+        # Sequence types are interchangeable but nesting is not
+        assert make_hash(["a", "b"]) == make_hash(("a", "b"))
+        assert make_hash(["a", "b"]) != make_hash(["ab"])
+        assert make_hash(["a", "b"]) != make_hash([["a"], "b"])
+        assert make_hash({"a": "b"}) != make_hash({"ab": ""})
+
+        # None is hashed as a constant, integers & booleans by value
+        assert make_hash({"a": None}) != make_hash({"a": "None"})
+        assert make_hash({"a": True}) != make_hash({"a": False})
+        assert make_hash(1) == make_hash("1")
+
+        # Classes & functions use their names
+        assert make_hash(StringIO) == make_hash("StringIO")
 
     def test_format_exception(self):
         exception = Exception("I am a message", 1)
@@ -1,6 +1,9 @@
 from os import path
+from tempfile import TemporaryDirectory
 from unittest import TestCase
+from unittest.mock import patch
 
+from pyinfra.api.fact_store import FactStore
 from pyinfra_cli.main import _main
 
 from ..paramiko_util import PatchSSHTestCase
@@ -51,6 +54,18 @@ class TestOperationCli(PatchSSHTestCase):
         )
         assert result.exit_code == 0, result.stdout
 
+    def test_deploy_operation_meta_and_results(self):
+        inventory = path.join("tests", "test_cli", "deploy", "inventories", "inventory.py")
+
+        result = run_cli("--dry", inventory, "files.file", "path=/tmp/pyinfra-test")
+        assert result.exit_code == 0, result.stdout
+        assert "2 (anotherhost, somehost)" in result.stdout
+
+        result = run_cli("-y", inventory, "files.file", "path=/tmp/pyinfra-test")
+        assert result.exit_code == 0, result.stdout
+        results = result.stdout.split("--> Results:", 1)[1]
+        assert "files.file (path=/tmp/pyinfra-test)   2       2" in results
+
     def test_deploy_operation_json_args(self):
         result = run_cli(
             "-y",
@@ -81,6 +96,63 @@ class TestFactCli(PatchSSHTestCase):
         assert result.exit_code == 0, result.stdout
         assert '"somehost": null' in result.stdout
 
+    def test_get_fact_with_fact_cache(self):
+        with TemporaryDirectory() as temp_dir:
+            fact_cache = path.join(temp_dir, "facts.db")
+            result = run_cli(
+                path.join("tests", "test_cli", "deploy", "inventories", "inventory.py"),
+                "--fact-cache",
+                fact_cache,
+                "--refresh-fact-cache",
+                "fact",
+                "server.Os",
+            )
+            assert result.exit_code == 0, result.stdout
+            assert path.exists(fact_cache)
+
+    def test_get_fact_with_fact_stats(self):
+        result = run_cli(
+            path.join("tests", "test_cli", "deploy", "inventories", "inventory.py"),
+            "--fact-stats",
+            "fact",
+            "server.Os",
+        )
+        assert result.exit_code == 0, result.stdout
+        assert "Slowest facts" in result.stdout
+        assert "server.Os" in result.stdout
+
+    def test_record_and_replay_facts(self):
+        with TemporaryDirectory() as temp_dir:
+            facts_filename = path.join(temp_dir, "facts.db")
+            result = run_cli(
+                "--dry",
+                "--record-facts",
+                facts_filename,
+                path.join("tests", "test_cli", "deploy", "inventories", "inventory.py"),
+                "files.file",
+                "path=/tmp/pyinfra-test",
+            )
+            assert result.exit_code == 0, result.stdout
+
+            fact_store = FactStore(facts_filename)
+            assert fact_store.connection.execute(
+                "SELECT COUNT(*) FROM facts WHERE fact = 'files.File'",
+            ).fetchone()[0] > 0
+            fact_store.close()
+
+            with patch("pyinfra.connectors.ssh.SSHConnector.connect") as fake_connect:
+                result = run_cli(
+                    "--replay-facts",
+                    facts_filename,
+                    path.join("tests", "test_cli", "deploy", "inventories", "inventory.py"),
+                    "files.file",
+                    "path=/tmp/pyinfra-test",
+                )
+            assert result.exit_code == 0, result.stdout
+            assert "Replaying facts" in result.stdout
+            assert "not found in replayed facts" not in result.stdout
+            fake_connect.assert_not_called()
+
 
 class TestExecCli(PatchSSHTestCase):
     def test_exec_command(self):
@@ -130,6 +202,27 @@ class TestExecCli(PatchSSHTestCase):
         )
         assert result.exit_code == 0, result.stdout
 
+    def test_exec_command_with_adaptive_parallel(self):
+        result = run_cli(
+            path.join("tests", "test_cli", "deploy", "inventories", "inventory.py"),
+            "exec",
+            "--adaptive-parallel",
+            "--",
+            "echo hi",
+        )
+        assert result.exit_code == 0, result.stdout
+        assert "--> Concurrency:" in result.stdout
+
+    def test_exec_command_with_fail_fast(self):
+        result = run_cli(
+            path.join("tests", "test_cli", "deploy", "inventories", "inventory.py"),
+            "exec",
+            "--fail-fast-cancel",
+            "--",
+            "echo hi",
+        )
+        assert result.exit_code == 0, result.stdout
+
     def test_exec_command_with_debug_operations(self):
         result = run_cli(
             path.join("tests", "test_cli", "deploy", "inventories", "inventory.py"),
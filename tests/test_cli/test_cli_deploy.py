@@ -9,9 +9,10 @@ from .util import run_cli
 
 
 class TestCliDeployState(PatchSSHTestCase):
-    def _run_cli(self, hosts, filename):
+    def _run_cli(self, hosts, filename, *args):
         return run_cli(
             "-y",
+            *args,
             ",".join(hosts),
             path.join("tests", "test_cli", "deploy", filename),
             f'--chdir={path.join("tests", "test_cli", "deploy")}',
@@ -39,6 +40,20 @@ class TestCliDeployState(PatchSSHTestCase):
                     self.assertNotIn(op_hash, host.op_hash_order)
 
     def test_deploy(self):
+        for _ in range(3):
+            self._test_deploy()
+
+    def test_deploy_processes(self):
+        self._test_deploy("--processes", "2")
+
+        # Every operation was executed by the shard processes & merged back into the state
+        for host in state.inventory:
+            for op_data in state.ops[host].values():
+                assert op_data.operation_meta.did_succeed()
+            assert state.results[host].success_ops == len(state.ops[host])
+        assert not state.shards
+
+    def _test_deploy(self, *args):
         task_file_path = path.join("tasks", "a_task.py")
         nested_task_path = path.join("tasks", "another_task.py")
         correct_op_name_and_host_names = [
@@ -74,18 +89,17 @@ class TestCliDeployState(PatchSSHTestCase):
             ("Final limited operation", ("somehost",)),
         ]
 
-        # Run 3 iterations of the test - each time shuffling the order of the
-        # hosts - ensuring that the ordering has no effect on the operation order.
-        for _ in range(3):
-            ctx_state.reset()
+        # Shuffle the order of the hosts, ensuring that the ordering has no effect on the
+        # operation order.
+        ctx_state.reset()
 
-            hosts = ["somehost", "anotherhost", "someotherhost"]
-            shuffle(hosts)
+        hosts = ["somehost", "anotherhost", "someotherhost"]
+        shuffle(hosts)
 
-            result = self._run_cli(hosts, "deploy.py")
-            assert result.exit_code == 0, result.stdout
+        result = self._run_cli(hosts, "deploy.py", *args)
+        assert result.exit_code == 0, result.stdout
 
-            self._assert_op_data(correct_op_name_and_host_names)
+        self._assert_op_data(correct_op_name_and_host_names)
 
     def test_random_deploy(self):
         correct_op_name_and_host_names = [
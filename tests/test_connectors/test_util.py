@@ -3,7 +3,11 @@
 from unittest import TestCase
 
 from pyinfra.api import Config, State
-from pyinfra.connectors.util import make_unix_command, make_unix_command_for_host
+from pyinfra.connectors.util import (
+    make_unix_command,
+    make_unix_command_for_host,
+    read_output_buffers,
+)
 
 from ..util import make_inventory
 
@@ -110,3 +114,35 @@ class TestMakeUnixCommandConnectorUtil(TestCase):
         host = state.inventory.get_host("somehost")
         command = make_unix_command_for_host(state, host, "echo Šablony")
         assert command.get_raw_value() == "sh -c 'echo Šablony'"
+
+
+class TestReadOutputBuffersConnectorUtil(TestCase):
+    def test_read_output_buffers(self):
+        output = read_output_buffers(
+            ["line 1\n", b"line 2\n"],
+            ["error\n"],
+            timeout=None,
+            print_output=False,
+            print_prefix="",
+        )
+        assert output.stdout_lines == ["line 1", "line 2"]
+        assert output.stderr_lines == ["error"]
+
+    def test_read_output_buffers_stdout_handler(self):
+        handled_lines = []
+
+        def stdout_handler(lines):
+            # Stop early, the remaining output should still be read
+            handled_lines.append(next(lines))
+
+        output = read_output_buffers(
+            ["line 1\n", "line 2\n"],
+            ["error\n"],
+            timeout=None,
+            print_output=False,
+            print_prefix="",
+            stdout_handler=stdout_handler,
+        )
+        assert handled_lines == ["line 1"]
+        assert output.stdout_lines == []
+        assert output.stderr_lines == ["error"]
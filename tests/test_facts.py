@@ -6,6 +6,7 @@ from unittest import TestCase
 
 from pyinfra.api import StringCommand
 from pyinfra.api.facts import ShortFactBase
+from pyinfra.facts.files import FilesInfo, chunk_paths
 from pyinfra_cli.util import json_encode
 
 from .util import JsonTest, get_command_string
@@ -102,3 +103,20 @@ fact_tests = sorted(
 # Generate the classes, attaching to local
 for fact_name in fact_tests:
     locals()[fact_name] = make_fact_tests(fact_name)
+
+
+class TestChunkPaths(TestCase):
+    def test_chunk_paths(self):
+        paths = ["/path/{0}".format(i) for i in range(10000)]
+
+        chunks = chunk_paths(paths)
+        assert len(chunks) > 1
+        assert [path for chunk in chunks for path in chunk] == paths
+
+        # Every chunk fits in a single command argument
+        for chunk in chunks:
+            command = FilesInfo().command(chunk)
+            assert len(command.get_raw_value()) < 128 * 1024
+
+    def test_chunk_paths_quoted(self):
+        assert chunk_paths(["a", "b'c", "d"], max_length=8) == [["a"], ["b'c"], ["d"]]
@@ -8,6 +8,7 @@ from pathlib import Path
 from unittest.mock import patch
 
 from pyinfra.api import Config, Inventory
+from pyinfra.api.host import HostData
 from pyinfra.api.util import get_kwargs_str
 
 
@@ -173,7 +174,7 @@ class FakeHost:
     def __init__(self, name, facts, data):
         self.name = name
         self.fact = FakeFacts(facts)
-        self.data = data
+        self.data = HostData(self, data)
         self.connector_data = {}
 
     @property
@@ -214,6 +215,10 @@ class FakeHost:
             return fact_ordered_keys.get(kwargs_str)
         return fact
 
+    def prefetch_facts(self, facts):
+        # Test facts are all loaded up front
+        pass
+
 
 class FakeFile:
     _read = False